@@ -0,0 +1,72 @@
+"""Compare latency and throughput of the PyTorch, ONNX Runtime and OpenVINO backends.
+
+Usage (from the ai-detection directory):
+
+    python benchmarks/bench_backends.py --weights models/yolov8n.pt \
+        --images 'samples/*.jpg' --backends pytorch onnx openvino --threads 4
+
+Every backend runs on the same images. Exports are cached next to the weights,
+so only the first run pays for the export.
+"""
+import argparse
+import glob
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from shared.model_backends import SUPPORTED_BACKENDS, load_model
+
+def load_images(pattern: str, count: int):
+    paths = sorted(glob.glob(pattern)) if pattern else []
+    images = [img for img in (cv2.imread(p) for p in paths) if img is not None]
+    if not images:
+        rng = np.random.default_rng(0)
+        images = [rng.integers(0, 255, (720, 1280, 3), dtype=np.uint8) for _ in range(8)]
+    return (images * (count // len(images) + 1))[:count]
+
+def bench(model, images, batch_size):
+    latencies = []
+    start = time.perf_counter()
+    for i in range(0, len(images), batch_size):
+        batch = images[i:i + batch_size]
+        t0 = time.perf_counter()
+        model(batch if batch_size > 1 else batch[0], verbose=False)
+        latencies.append((time.perf_counter() - t0) / len(batch))
+    wall = time.perf_counter() - start
+    return latencies, len(images) / wall
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--weights', default='models/yolov8n.pt')
+    parser.add_argument('--images', help='Glob of images to run (defaults to synthetic frames)')
+    parser.add_argument('--count', type=int, default=100, help='Images per backend')
+    parser.add_argument('--backends', nargs='+', default=list(SUPPORTED_BACKENDS), choices=SUPPORTED_BACKENDS)
+    parser.add_argument('--threads', type=int, default=None)
+    parser.add_argument('--batch', type=int, default=1, help='Images per forward pass')
+    parser.add_argument('--imgsz', type=int, default=640)
+    args = parser.parse_args()
+
+    images = load_images(args.images, args.count)
+    print(f"{len(images)} images, batch {args.batch}, threads {args.threads or 'default'}")
+    print(f"{'backend':<10}{'load s':>9}{'mean ms':>10}{'p50 ms':>9}{'p99 ms':>9}{'img/s':>9}")
+    for backend in args.backends:
+        t0 = time.perf_counter()
+        model = load_model(args.weights, backend=backend, threads=args.threads, imgsz=args.imgsz)
+        load_time = time.perf_counter() - t0
+
+        latencies, throughput = bench(model, images, args.batch)
+        ordered = sorted(latencies)
+        p99 = ordered[min(len(ordered) - 1, int(0.99 * len(ordered)))]
+        print(
+            f"{backend:<10}{load_time:>9.1f}{statistics.mean(latencies) * 1000:>10.1f}"
+            f"{statistics.median(latencies) * 1000:>9.1f}{p99 * 1000:>9.1f}{throughput:>9.1f}"
+        )
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""Accuracy/latency tradeoff of full-frame, ROI and tiled inference on high-resolution frames.
+
+Usage (from the ai-detection directory):
+
+    python benchmarks/bench_tiling.py --weights models/yolov8n.pt \
+        --images 'samples/4k/*.jpg' --labels samples/4k/labels --tile-size 640 960
+
+With --labels (YOLO txt format, one file per image) recall at IoU 0.5 is
+reported overall and for small objects (< 32 px on the short side). Without
+labels only latency and detection counts are shown.
+"""
+import argparse
+import glob
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from geometry import iou_matrix
+from shared.detections import extract_detections
+from shared.model_backends import load_model
+from tiling import TilePlan
+
+def load_labels(label_dir: Path, image_path: Path, shape) -> np.ndarray:
+    path = label_dir / f"{image_path.stem}.txt"
+    if not path.exists():
+        return np.zeros((0, 4), dtype=np.float32)
+    h, w = shape[:2]
+    rows = np.loadtxt(path, ndmin=2)
+    if rows.size == 0:
+        return np.zeros((0, 4), dtype=np.float32)
+    cx, cy, bw, bh = rows[:, 1] * w, rows[:, 2] * h, rows[:, 3] * w, rows[:, 4] * h
+    return np.stack([cx - bw / 2, cy - bh / 2, cx + bw / 2, cy + bh / 2], axis=1).astype(np.float32)
+
+def run_config(model, images, plan_options, conf):
+    plans = {}
+    latencies, counts, predictions = [], [], []
+    for image in images:
+        plan = None
+        if plan_options:
+            plan = plans.get(image.shape)
+            if plan is None:
+                plan = plans[image.shape] = TilePlan(image.shape, **plan_options)
+
+        start = time.perf_counter()
+        inputs = plan.inputs(image) if plan else image
+        results = model(inputs, conf=conf, verbose=False)
+        per_input = [extract_detections(r, model.names)[0] for r in results]
+        detections = plan.merge(per_input) if plan else per_input[0]
+        latencies.append(time.perf_counter() - start)
+
+        counts.append(len(detections))
+        predictions.append(np.array([d['bbox'] for d in detections], dtype=np.float32).reshape(-1, 4))
+    return latencies, counts, predictions
+
+def recall(predictions, truths, small_only=False):
+    found = total = 0
+    for pred, truth in zip(predictions, truths):
+        if small_only:
+            sizes = np.minimum(truth[:, 2] - truth[:, 0], truth[:, 3] - truth[:, 1])
+            truth = truth[sizes < 32]
+        total += len(truth)
+        if len(truth) and len(pred):
+            found += int((iou_matrix(truth, pred).max(axis=1) >= 0.5).sum())
+    return found / total if total else float('nan')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--weights', default='models/yolov8n.pt')
+    parser.add_argument('--images', required=True, help='Glob of high-resolution frames')
+    parser.add_argument('--labels', help='Directory of YOLO-format label files')
+    parser.add_argument('--roi', type=float, nargs=4, metavar=('X1', 'Y1', 'X2', 'Y2'))
+    parser.add_argument('--tile-size', type=int, nargs='+', default=[640])
+    parser.add_argument('--overlap', type=float, default=0.2)
+    parser.add_argument('--conf', type=float, default=0.5)
+    args = parser.parse_args()
+
+    paths = [Path(p) for p in sorted(glob.glob(args.images))]
+    images = [cv2.imread(str(p)) for p in paths]
+    model = load_model(args.weights)
+
+    configs = [('full frame', None)]
+    if args.roi:
+        configs.append(('roi', {'roi': args.roi}))
+    for tile_size in args.tile_size:
+        for full_frame in (False, True):
+            label = f"tiles {tile_size}{' + full' if full_frame else ''}"
+            configs.append((label, {'roi': args.roi, 'tile_size': tile_size,
+                                    'overlap': args.overlap, 'full_frame': full_frame}))
+
+    truths = None
+    if args.labels:
+        truths = [load_labels(Path(args.labels), p, img.shape) for p, img in zip(paths, images)]
+
+    print(f"{len(images)} frames, {images[0].shape[1]}x{images[0].shape[0]}")
+    print(f"{'config':<20}{'inputs':>7}{'mean ms':>10}{'p99 ms':>9}{'dets':>7}{'recall':>8}{'small':>8}")
+    for label, options in configs:
+        latencies, counts, predictions = run_config(model, images, options, args.conf)
+        inputs = TilePlan(images[0].shape, **options).num_inputs if options else 1
+        ordered = sorted(latencies)
+        p99 = ordered[min(len(ordered) - 1, int(0.99 * len(ordered)))]
+        overall = small = float('nan')
+        if truths is not None:
+            overall = recall(predictions, truths)
+            small = recall(predictions, truths, small_only=True)
+        print(
+            f"{label:<20}{inputs:>7}{statistics.mean(latencies) * 1000:>10.1f}{p99 * 1000:>9.1f}"
+            f"{statistics.mean(counts):>7.1f}{overall:>8.2f}{small:>8.2f}"
+        )
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,265 @@
+import json
+import time
+import queue
+import random
+import logging
+import threading
+from pathlib import Path
+from typing import List
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from pipeline_metrics import STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ALERTS_CONFIG = {
+    'queue_size': 1000,  # alerts held in memory before spilling to disk
+    'max_batch_size': 20,  # alerts taken off the queue per send when they pile up
+    'send_arrays': False,  # POST those as one JSON array; the endpoint must accept arrays
+    'batch_wait': 0.2,  # seconds to wait for more alerts before sending
+    'timeout': 5.0,  # seconds per HTTP request
+    'max_retries': 3,
+    'backoff': 0.5,  # initial retry delay in seconds, doubled per attempt
+    'max_backoff': 60.0,
+    'pool_size': 2,  # keep-alive connections to the alert endpoint
+    'spool_dir': 'alert_spool',
+    'spool_max_files': 1000,  # oldest spooled batches are dropped beyond this
+}
+
+class AlertDispatcher:
+    """Queues alerts and delivers them from a background thread.
+
+    Each alert is POSTed as a JSON object, as before. With `send_arrays`, alerts
+    that pile up are sent together as one JSON array instead; if the endpoint
+    rejects the array they are posted one by one. Failed sends are retried
+    with jittered exponential backoff. Once the retries are used up, or the
+    in-memory queue is full, batches are written to a bounded spool directory
+    and replayed when the endpoint recovers.
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        queue_size: int = 1000,
+        max_batch_size: int = 20,
+        batch_wait: float = 0.2,
+        timeout: float = 5.0,
+        max_retries: int = 3,
+        backoff: float = 0.5,
+        max_backoff: float = 60.0,
+        pool_size: int = 2,
+        spool_dir: str = 'alert_spool',
+        spool_max_files: int = 1000,
+        send_arrays: bool = False,
+    ):
+        self.endpoint = endpoint
+        self.max_batch_size = max_batch_size
+        self.batch_wait = batch_wait
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.spool_dir = Path(spool_dir)
+        self.spool_max_files = spool_max_files
+        self.send_arrays = send_arrays
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({'Content-Type': 'application/json'})
+
+        self.sent = 0
+        self.failed = 0
+        self.spooled = 0
+        self.dropped = 0
+        self.spool_files_dropped = 0
+
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._spool_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._retry_at = 0.0
+        self._current_backoff = backoff
+        self._spool_pending = False
+        self._thread = threading.Thread(target=self._worker, name='alert-dispatcher', daemon=True)
+
+    def start(self) -> 'AlertDispatcher':
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        self._spool_pending = any(self.spool_dir.glob('alerts-*.json'))
+        self._thread.start()
+        return self
+
+    def submit(self, alert: dict) -> None:
+        """Queue an alert for delivery; never blocks on the network."""
+        try:
+            self._queue.put_nowait(alert)
+        except queue.Full:
+            self._spool([alert])
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def _next_batch(self) -> List[dict]:
+        try:
+            batch = [self._queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+
+        deadline = time.time() + self.batch_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _send(self, payload, count: int) -> bool:
+        """POST one payload; False if the endpoint rejected it."""
+        with STAGE_SECONDS.time('alert_send'):
+            response = self.session.post(self.endpoint, data=json.dumps(payload), timeout=self.timeout)
+        if 400 <= response.status_code < 500 and response.status_code != 429:
+            # The backend rejected the payload itself; retrying won't help
+            logger.error(f"Alert endpoint rejected {count} alerts: HTTP {response.status_code}")
+            return False
+        response.raise_for_status()
+        return True
+
+    def _post(self, batch: List[dict]) -> None:
+        """POST a batch, removing alerts from it as they are sent or dropped.
+
+        If a send raises, `batch` holds only the alerts still to deliver, so a
+        retry or the spool never repeats the ones the endpoint already has.
+        """
+        if self.send_arrays and len(batch) > 1:
+            if self._send(batch, len(batch)):
+                self.sent += len(batch)
+                batch.clear()
+                return
+            logger.warning(f"Posting {len(batch)} alerts one by one instead")
+        while batch:
+            if self._send(batch[0], 1):
+                self.sent += 1
+            else:
+                self.dropped += 1
+            batch.pop(0)
+
+    def _deliver(self, batch: List[dict]) -> bool:
+        """Send a batch with retries; returns False if the endpoint is unreachable."""
+        delay = self.backoff
+        for attempt in range(self.max_retries + 1):
+            try:
+                self._post(batch)
+                return True
+            except Exception as e:
+                logger.warning(
+                    f"Error sending {len(batch)} alerts (attempt {attempt + 1}/{self.max_retries + 1}): {e}"
+                )
+                if attempt < self.max_retries and not self._stopped.is_set():
+                    self._stopped.wait(delay * random.uniform(0.5, 1.5))
+                    delay = min(delay * 2, self.max_backoff)
+        self.failed += len(batch)
+        return False
+
+    def _mark_down(self):
+        self._retry_at = time.time() + self._current_backoff * random.uniform(0.5, 1.5)
+        self._current_backoff = min(self._current_backoff * 2, self.max_backoff)
+
+    def _mark_up(self):
+        self._retry_at = 0.0
+        self._current_backoff = self.backoff
+
+    def _spool(self, batch: List[dict]) -> None:
+        with self._spool_lock:
+            path = self.spool_dir / f"alerts-{time.time_ns()}.json"
+            try:
+                path.write_text(json.dumps(batch))
+            except (OSError, TypeError, ValueError) as e:
+                logger.error(f"Error spooling {len(batch)} alerts: {e}")
+                self.dropped += len(batch)
+                return
+            self.spooled += len(batch)
+            self._spool_pending = True
+
+            files = sorted(self.spool_dir.glob('alerts-*.json'))
+            for old in files[:max(0, len(files) - self.spool_max_files)]:
+                logger.warning(f"Alert spool full, dropping {old.name}")
+                old.unlink(missing_ok=True)
+                self.spool_files_dropped += 1
+
+    def _replay_spool(self, limit: int = 10) -> None:
+        """Resend spooled batches, oldest first, while the endpoint stays up."""
+        with self._spool_lock:
+            files = sorted(self.spool_dir.glob('alerts-*.json'))[:limit]
+            if not files:
+                self._spool_pending = False
+                return
+        for path in files:
+            try:
+                batch = json.loads(path.read_text())
+            except (OSError, ValueError) as e:
+                logger.error(f"Discarding unreadable spool file {path.name}: {e}")
+                path.unlink(missing_ok=True)
+                continue
+            count = len(batch)
+            if not self._deliver_once(batch):
+                if len(batch) < count:
+                    # Keep only the alerts the endpoint doesn't have yet
+                    try:
+                        path.write_text(json.dumps(batch))
+                    except OSError as e:
+                        logger.error(f"Error updating spool file {path.name}: {e}")
+                self._mark_down()
+                return
+            path.unlink(missing_ok=True)
+
+    def _deliver_once(self, batch: List[dict]) -> bool:
+        try:
+            self._post(batch)
+            return True
+        except Exception as e:
+            logger.warning(f"Alert endpoint still unavailable: {e}")
+            return False
+
+    def _worker(self):
+        while not self._stopped.is_set() or not self._queue.empty():
+            batch = self._next_batch()
+
+            if time.time() < self._retry_at:
+                # Endpoint is known to be down; don't hold batches in memory
+                if batch:
+                    self._spool(batch)
+                continue
+
+            if batch:
+                if self._deliver(batch):
+                    self._mark_up()
+                else:
+                    self._spool(batch)
+                    self._mark_down()
+                    continue
+
+            if self._retry_at == 0.0 and self._spool_pending:
+                self._replay_spool()
+            elif self._retry_at and time.time() >= self._retry_at:
+                # Probe the endpoint with the oldest spooled batch
+                self._retry_at = 0.0
+                self._replay_spool(limit=1)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Flush queued alerts (spooling what can't be sent) and stop the worker."""
+        self._stopped.set()
+        self._thread.join(timeout=timeout)
+        remaining = []
+        while True:
+            try:
+                remaining.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if remaining:
+            self._spool(remaining)
+        self.session.close()
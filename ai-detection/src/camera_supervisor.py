@@ -0,0 +1,265 @@
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SUPERVISOR_CONFIG = {
+    'connect_workers': 16,  # cameras opened (or reopened) in parallel
+    'stall_timeout': 10.0,  # seconds without a frame before a camera is reconnected
+    'backoff': 1.0,  # first reconnect delay in seconds, doubled per failed attempt
+    'max_backoff': 60.0,
+    'jitter': 0.3,  # +/- fraction applied to every delay so cameras don't retry in lockstep
+    'quarantine_after': 6,  # failed reconnects before a camera is quarantined
+    'quarantine_period': 600.0,  # seconds between attempts while quarantined
+}
+
+# Camera states
+CONNECTING = 'connecting'
+CONNECTED = 'connected'
+RECONNECTING = 'reconnecting'
+QUARANTINED = 'quarantined'
+
+class CameraHealth:
+    """Connection state and read statistics for one camera."""
+
+    def __init__(self):
+        self.state = CONNECTING
+        self.connected_since = 0.0
+        self.last_frame_time = 0.0
+        self.last_read_time = 0.0
+        self.frames = 0
+        self.reconnects = 0
+        self.failed_attempts = 0
+        self.next_attempt = 0.0
+        self.last_error: Optional[str] = None
+        self.read_ms = 0.0  # moving average of get_frame() time for delivered frames
+        self.fps = 0.0
+        self._window_start = time.time()
+        self._window_frames = 0
+
+    def record_frame(self, now: float, read_ms: float, fps_window: float = 5.0) -> None:
+        self.frames += 1
+        self.last_frame_time = now
+        self.read_ms = read_ms if self.frames == 1 else 0.9 * self.read_ms + 0.1 * read_ms
+        self._window_frames += 1
+        elapsed = now - self._window_start
+        if elapsed >= fps_window:
+            self.fps = self._window_frames / elapsed
+            self._window_frames = 0
+            self._window_start = now
+
+    def to_dict(self) -> dict:
+        return {
+            'state': self.state,
+            'fps': round(self.fps, 2),
+            'read_ms': round(self.read_ms, 2),
+            'frames': self.frames,
+            'last_frame_age': round(time.time() - self.last_frame_time, 1) if self.last_frame_time else None,
+            'reconnects': self.reconnects,
+            'failed_attempts': self.failed_attempts,
+            'last_error': self.last_error,
+        }
+
+class CameraSupervisor:
+    """Keeps a set of camera connectors connected.
+
+    Connectors are anything with `connect() -> bool`, `get_frame()` and
+    `disconnect()`. They are opened in parallel on a small thread pool.
+    `read()` never blocks on a reconnect: a camera that delivers no frame for
+    `stall_timeout` seconds is handed back to the pool, which retries with
+    jittered exponential backoff. After `quarantine_after` failed attempts the
+    camera is quarantined and only retried every `quarantine_period` seconds.
+    State changes are logged once instead of on every failed read.
+
+    A connector may expose `last_frame_time` (e.g. a background grabber) so
+    stalls are measured from its own reads rather than from `read()` calls.
+    """
+
+    def __init__(
+        self,
+        connect_workers: int = 16,
+        stall_timeout: float = 10.0,
+        backoff: float = 1.0,
+        max_backoff: float = 60.0,
+        jitter: float = 0.3,
+        quarantine_after: int = 6,
+        quarantine_period: float = 600.0,
+    ):
+        self.stall_timeout = stall_timeout
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.quarantine_after = quarantine_after
+        self.quarantine_period = quarantine_period
+        self.connectors: Dict[str, Any] = {}
+        self.health: Dict[str, CameraHealth] = {}
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=connect_workers, thread_name_prefix='camera-connect')
+
+    def add(self, camera_id: str, connector: Any) -> None:
+        """Register a camera without connecting it yet."""
+        self.connectors[camera_id] = connector
+        self.health[camera_id] = CameraHealth()
+
+    def connect_all(self, timeout: Optional[float] = None) -> Dict[str, bool]:
+        """Open every registered camera that is not connected yet, in parallel.
+
+        Cameras that fail are left to the reconnect schedule rather than dropped.
+        """
+        futures = {
+            camera_id: self._schedule(camera_id)
+            for camera_id, health in self.health.items()
+            if health.state == CONNECTING
+        }
+        wait([f for f in futures.values() if f is not None], timeout=timeout)
+        return {camera_id: self.is_connected(camera_id) for camera_id in futures}
+
+    def connect(self, camera_id: str) -> bool:
+        """Open one registered camera and wait for the result."""
+        future = self._schedule(camera_id)
+        if future is not None:
+            future.result()
+        return self.is_connected(camera_id)
+
+    def _schedule(self, camera_id: str):
+        with self._lock:
+            if camera_id in self._pending:
+                return None
+            self._pending.add(camera_id)
+        return self._executor.submit(self._open, camera_id)
+
+    def _open(self, camera_id: str) -> None:
+        with self._lock:
+            connector = self.connectors.get(camera_id)
+            health = self.health.get(camera_id)
+            if connector is None:
+                self._pending.discard(camera_id)
+                return
+        try:
+            if health.state != CONNECTING:
+                connector.disconnect()
+            ok = connector.connect()
+            error = None if ok else 'connect() returned False'
+        except Exception as e:
+            ok, error = False, str(e)
+
+        now = time.time()
+        with self._lock:
+            self._pending.discard(camera_id)
+            removed = self.connectors.get(camera_id) is not connector
+        if removed:
+            # remove() or shutdown() already ran; close what this attempt opened
+            if ok:
+                connector.disconnect()
+            return
+
+        with self._lock:
+            if ok:
+                if health.failed_attempts or health.state != CONNECTING:
+                    health.reconnects += 1
+                    logger.info(f"Camera {camera_id} reconnected after {health.failed_attempts} failed attempts")
+                else:
+                    logger.info(f"Connected to camera {camera_id}")
+                health.state = CONNECTED
+                health.connected_since = now
+                health.failed_attempts = 0
+                health.last_error = None
+                return
+
+            health.failed_attempts += 1
+            health.last_error = error
+            if health.failed_attempts >= self.quarantine_after:
+                delay = self.quarantine_period
+                if health.state != QUARANTINED:
+                    logger.error(
+                        f"Camera {camera_id} quarantined after {health.failed_attempts} failed "
+                        f"connection attempts ({error}); retrying every {delay:.0f}s"
+                    )
+                health.state = QUARANTINED
+            else:
+                delay = self._backoff_delay(health.failed_attempts)
+                logger.warning(
+                    f"Failed to connect to camera {camera_id} ({error}), "
+                    f"attempt {health.failed_attempts}, retrying in {delay:.1f}s"
+                )
+                health.state = RECONNECTING
+            health.next_attempt = now + delay
+
+    def _backoff_delay(self, attempt: int) -> float:
+        delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def read(self, camera_id: str) -> Optional[np.ndarray]:
+        """Return the camera's next frame, or None if it has none or is down."""
+        health = self.health[camera_id]
+        now = time.time()
+        if health.state != CONNECTED:
+            if health.state != CONNECTING and now >= health.next_attempt:
+                self._schedule(camera_id)
+            return None
+
+        start = time.perf_counter()
+        try:
+            frame = self.connectors[camera_id].get_frame()
+        except Exception as e:
+            frame = None
+            health.last_error = str(e)
+        health.last_read_time = now = time.time()
+
+        if frame is not None:
+            health.record_frame(now, (time.perf_counter() - start) * 1000)
+            return frame
+
+        last_frame = getattr(self.connectors[camera_id], 'last_frame_time', None) or health.last_frame_time
+        if now - max(last_frame, health.connected_since) >= self.stall_timeout:
+            self._mark_stalled(camera_id, now)
+        return None
+
+    def _mark_stalled(self, camera_id: str, now: float) -> None:
+        health = self.health[camera_id]
+        with self._lock:
+            if health.state != CONNECTED:
+                return
+            health.state = RECONNECTING
+            health.fps = 0.0
+            health.next_attempt = now + self._backoff_delay(1)
+        logger.warning(
+            f"Camera {camera_id} stalled (no frame for {self.stall_timeout:.0f}s), "
+            f"reconnecting in {health.next_attempt - now:.1f}s"
+        )
+
+    def is_connected(self, camera_id: str) -> bool:
+        health = self.health.get(camera_id)
+        return health is not None and health.state == CONNECTED
+
+    def remove(self, camera_id: str) -> None:
+        """Disconnect and forget a camera."""
+        with self._lock:
+            connector = self.connectors.pop(camera_id, None)
+            self.health.pop(camera_id, None)
+        if connector is not None:
+            connector.disconnect()
+
+    def stats(self) -> Dict[str, dict]:
+        """Per-camera state, fps, read latency and reconnect counters."""
+        return {camera_id: health.to_dict() for camera_id, health in list(self.health.items())}
+
+    def summary(self) -> str:
+        counts: Dict[str, int] = {}
+        for health in list(self.health.values()):
+            counts[health.state] = counts.get(health.state, 0) + 1
+        fps = sum(health.fps for health in list(self.health.values()))
+        states = ", ".join(f"{count} {state}" for state, count in sorted(counts.items()))
+        return f"Cameras: {states or 'none'}; {fps:.1f} frames/s read"
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        for camera_id in list(self.connectors):
+            self.remove(camera_id)
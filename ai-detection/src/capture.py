@@ -0,0 +1,86 @@
+import logging
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from frame_grabber import FrameGrabber
+from pipeline_metrics import STAGE_SECONDS
+from shared.decode import DEFAULT_DECODE_OPTIONS, open_capture, read_frame
+
+logger = logging.getLogger(__name__)
+
+class DecodedCapture:
+    """cv2.VideoCapture look-alike that applies frame skipping and resizing on read()."""
+
+    def __init__(self, url: str, decode: Optional[Dict[str, Any]] = None):
+        self.decode = {**DEFAULT_DECODE_OPTIONS, **(decode or {})}
+        self.cap = open_capture(url, self.decode)
+
+    def read(self) -> Tuple[bool, Optional[np.ndarray]]:
+        frame = read_frame(self.cap, self.decode, STAGE_SECONDS)
+        return frame is not None, frame
+
+    def isOpened(self) -> bool:
+        return self.cap.isOpened()
+
+    def release(self):
+        self.cap.release()
+
+class CaptureConnector:
+    """Camera connector (connect/get_frame/disconnect) over a DecodedCapture.
+
+    With `threaded=True` the capture is read on a FrameGrabber thread, so
+    get_frame() returns the newest unread frame or None without blocking.
+    `on_frame` is called with every decoded frame: on the grabber thread when
+    threaded, otherwise for each frame get_frame() returns.
+    """
+
+    def __init__(self, camera_id: str, url: str, decode: Optional[Dict[str, Any]] = None, threaded: bool = False,
+                 on_frame: Optional[Callable[[np.ndarray], None]] = None):
+        self.camera_id = camera_id
+        self.url = url
+        self.decode = decode
+        self.threaded = threaded
+        self.on_frame = on_frame
+        self.cap = None
+
+    def connect(self) -> bool:
+        cap = DecodedCapture(self.url, self.decode)
+        if not cap.isOpened():
+            cap.release()
+            return False
+        if self.threaded:
+            self.cap = FrameGrabber(cap, self.camera_id, on_frame=self.on_frame).start()
+        else:
+            self.cap = cap
+        return True
+
+    def get_frame(self) -> Optional[np.ndarray]:
+        if self.cap is None:
+            return None
+        ret, frame = self.cap.read()
+        if not ret:
+            return None
+        if self.on_frame is not None and not self.threaded:
+            self.on_frame(frame)
+        return frame
+
+    @property
+    def last_frame_time(self) -> Optional[float]:
+        # Only a grabber reads on its own; otherwise the supervisor tracks reads itself
+        return self.cap.last_frame_time if isinstance(self.cap, FrameGrabber) else None
+
+    @property
+    def frames_dropped(self) -> int:
+        return self.cap.frames_dropped if isinstance(self.cap, FrameGrabber) else 0
+
+    def disconnect(self) -> None:
+        if self.cap is not None:
+            if isinstance(self.cap, FrameGrabber):
+                logger.info(
+                    f"Camera {self.camera_id}: {self.cap.frames_read} frames read, "
+                    f"{self.cap.frames_dropped} dropped"
+                )
+            self.cap.release()
+            self.cap = None
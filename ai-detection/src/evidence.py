@@ -0,0 +1,411 @@
+import math
+import os
+import queue
+import struct
+import time
+import logging
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from pipeline_metrics import STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EVIDENCE_CONFIG = {
+    'enabled': False,
+    'dir': 'evidence',
+    'pre_seconds': 10.0,  # footage kept from before the triggering frame
+    'post_seconds': 5.0,  # footage recorded after it before the clip is written
+    'fps': 5.0,  # frames per second kept in the buffer
+    'buffer_mb': 8.0,  # preallocated per camera for compressed frames
+    'width': 640,  # buffered frames are downscaled to this width (None keeps full size)
+    'quality': 70,  # JPEG quality of buffered frames
+    'snapshot_quality': 90,  # JPEG quality of the keyframe snapshot
+    'max_pending': 32,  # clips waiting for their post-event footage
+    'max_clips': 500,  # per camera; the oldest clips are deleted beyond this
+}
+
+class FrameRingBuffer:
+    """Recent JPEG frames of one camera, in one preallocated block of memory.
+
+    Frames are appended back to back into a fixed byte arena and indexed by
+    fixed-size offset, size and timestamp arrays, so recording a frame only
+    copies its bytes; nothing is allocated or freed per frame. When a new frame
+    doesn't fit, the oldest frames are overwritten. Memory is bounded by
+    `capacity_bytes` regardless of frame rate or JPEG size.
+    """
+
+    def __init__(self, capacity_bytes: int, max_frames: int):
+        self.data = np.empty(capacity_bytes, dtype=np.uint8)
+        self.offsets = np.zeros(max_frames, dtype=np.int64)
+        self.sizes = np.zeros(max_frames, dtype=np.int64)
+        self.timestamps = np.zeros(max_frames, dtype=np.float64)
+        self.shapes = np.zeros((max_frames, 2), dtype=np.int32)  # width, height
+        self.max_frames = max_frames
+        self.head = 0  # index of the oldest frame
+        self.count = 0
+        self.write_pos = 0
+        self.frames_oversized = 0
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self) -> int:
+        return (self.data.nbytes + self.offsets.nbytes + self.sizes.nbytes
+                + self.timestamps.nbytes + self.shapes.nbytes)
+
+    def _pop_oldest(self) -> None:
+        self.head = (self.head + 1) % self.max_frames
+        self.count -= 1
+
+    def append(self, jpeg: np.ndarray, timestamp: float, width: int, height: int) -> bool:
+        """Store an encoded frame; False if it is larger than the whole buffer."""
+        jpeg = jpeg.reshape(-1)
+        size = jpeg.size
+        if size > self.data.size:
+            self.frames_oversized += 1
+            return False
+
+        with self._lock:
+            start = self.write_pos
+            if start + size > self.data.size:
+                # Wrap around; frames still in the unused tail are from the previous lap
+                while self.count and self.offsets[self.head] >= start:
+                    self._pop_oldest()
+                start = 0
+            end = start + size
+            # Live frames at or after `start` are from the previous lap, oldest first
+            while self.count and (self.count == self.max_frames or start <= self.offsets[self.head] < end):
+                self._pop_oldest()
+
+            index = (self.head + self.count) % self.max_frames
+            self.data[start:end] = jpeg
+            self.offsets[index] = start
+            self.sizes[index] = size
+            self.timestamps[index] = timestamp
+            self.shapes[index] = (width, height)
+            self.count += 1
+            self.write_pos = end
+        return True
+
+    def frames(self, since: float, until: float) -> List[Tuple[float, bytes, int, int]]:
+        """Copies of the buffered (timestamp, jpeg, width, height) in [since, until], oldest first."""
+        with self._lock:
+            frames = []
+            for i in range(self.count):
+                index = (self.head + i) % self.max_frames
+                timestamp = self.timestamps[index]
+                if since <= timestamp <= until:
+                    start = self.offsets[index]
+                    width, height = self.shapes[index]
+                    frames.append((float(timestamp), self.data[start:start + self.sizes[index]].tobytes(),
+                                   int(width), int(height)))
+            return frames
+
+    def span(self) -> float:
+        """Seconds of footage currently buffered."""
+        with self._lock:
+            if self.count < 2:
+                return 0.0
+            newest = (self.head + self.count - 1) % self.max_frames
+            return float(self.timestamps[newest] - self.timestamps[self.head])
+
+def _chunk(f: BinaryIO, fourcc: bytes, payload: bytes) -> None:
+    f.write(fourcc + struct.pack('<I', len(payload)) + payload)
+    if len(payload) % 2:
+        f.write(b'\0')
+
+def write_mjpeg_avi(path: Path, frames: List[bytes], fps: float, width: int, height: int) -> None:
+    """Mux already-encoded JPEG frames into an MJPEG AVI without decoding them.
+
+    The file is written under a temporary name and renamed into place, so a
+    path handed out in an alert never points at a half-written clip.
+    """
+    scale, rate = 1000, max(1, int(round(fps * 1000)))
+    padded = [len(jpeg) + len(jpeg) % 2 for jpeg in frames]
+    largest = max(len(jpeg) for jpeg in frames)
+
+    avih = struct.pack(
+        '<14I',
+        int(1e6 / fps), int(largest * fps), 0, 0x10,  # us per frame, max bytes/s, padding, AVIF_HASINDEX
+        len(frames), 0, 1, largest, width, height, 0, 0, 0, 0,
+    )
+    strh = struct.pack(
+        '<4s4sIHHIIIIIIiIhhhh',
+        b'vids', b'MJPG', 0, 0, 0, 0, scale, rate, 0, len(frames), largest, -1, 0, 0, 0, width, height,
+    )
+    strf = struct.pack('<IiiHH4sIiiII', 40, width, height, 1, 24, b'MJPG', width * height * 3, 0, 0, 0, 0)
+    strl = b'strl' + b'strh' + struct.pack('<I', len(strh)) + strh + b'strf' + struct.pack('<I', len(strf)) + strf
+    hdrl = b'hdrl' + b'avih' + struct.pack('<I', len(avih)) + avih + b'LIST' + struct.pack('<I', len(strl)) + strl
+
+    movi_size = 4 + sum(8 + size for size in padded)
+    index = bytearray()
+    offset = 4  # idx1 offsets count from the 'movi' fourcc
+    for jpeg, size in zip(frames, padded):
+        index += struct.pack('<4sIII', b'00dc', 0x10, offset, len(jpeg))  # AVIIF_KEYFRAME
+        offset += 8 + size
+    riff_size = 4 + (8 + len(hdrl)) + (8 + movi_size) + (8 + len(index))
+
+    tmp = path.with_name(path.name + '.tmp')
+    with open(tmp, 'wb') as f:
+        f.write(b'RIFF' + struct.pack('<I', riff_size) + b'AVI ')
+        f.write(b'LIST' + struct.pack('<I', len(hdrl)) + hdrl)
+        f.write(b'LIST' + struct.pack('<I', movi_size) + b'movi')
+        for jpeg in frames:
+            _chunk(f, b'00dc', jpeg)
+        _chunk(f, b'idx1', bytes(index))
+    os.replace(tmp, path)
+
+def clip_paths(dir: Path, camera_id: str, timestamp: float, pre_seconds: float, post_seconds: float) -> dict:
+    """Clip and snapshot paths and the footage window for a detection at `timestamp`."""
+    stamp = datetime.fromtimestamp(timestamp).strftime('%Y%m%d-%H%M%S')
+    stem = f"{camera_id}-{stamp}-{int(timestamp * 1000) % 1000:03d}"
+    camera_dir = Path(dir) / camera_id
+    return {
+        'clip': str(camera_dir / f"{stem}.avi"),
+        'snapshot': str(camera_dir / f"{stem}.jpg"),
+        'start': timestamp - pre_seconds,
+        'end': timestamp + post_seconds,
+    }
+
+class EvidenceRecorder:
+    """Keeps recent footage per camera and writes evidence clips around detections.
+
+    `record()` is fed decoded frames (from a capture thread or the main loop),
+    keeps at most `fps` of them per second, downscales and JPEG-encodes them
+    into the camera's FrameRingBuffer. `trigger()` returns the clip and
+    snapshot paths right away, so they can go into the alert. A background
+    writer waits `post_seconds`, then muxes the buffered JPEGs into an MJPEG AVI
+    (no re-encoding) and writes the keyframe snapshot. A trigger while the same
+    camera's clip is still pending shares that clip.
+
+    Memory per camera is `buffer_mb` plus small index arrays; the buffer must
+    hold (pre_seconds + post_seconds) * fps frames, or clips start later than
+    asked. Encoding and writing are timed as the 'evidence_encode' and
+    'evidence_write' pipeline stages.
+    """
+
+    def __init__(
+        self,
+        dir: str = 'evidence',
+        pre_seconds: float = 10.0,
+        post_seconds: float = 5.0,
+        fps: float = 5.0,
+        buffer_mb: float = 8.0,
+        width: Optional[int] = 640,
+        quality: int = 70,
+        snapshot_quality: int = 90,
+        max_pending: int = 32,
+        max_clips: int = 500,
+    ):
+        self.dir = Path(dir)
+        self.pre_seconds = pre_seconds
+        self.post_seconds = post_seconds
+        self.fps = fps
+        self.buffer_bytes = int(buffer_mb * 1024 * 1024)
+        # A little headroom beyond the clip window, since the writer runs slightly late
+        self.max_frames = int(math.ceil((pre_seconds + post_seconds + 2.0) * fps))
+        self.width = width
+        self.quality = quality
+        self.snapshot_quality = snapshot_quality
+        self.max_clips = max_clips
+
+        self.buffers: Dict[str, FrameRingBuffer] = {}
+        self.clips_written = 0
+        self.clips_dropped = 0
+        self.clips_failed = 0
+        self._last_recorded: Dict[str, float] = {}
+        self._pending: Dict[str, Tuple[float, dict]] = {}  # camera -> (post-event end, evidence)
+        self._lock = threading.Lock()
+        self._queue: queue.Queue = queue.Queue(maxsize=max_pending)
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._writer, name='evidence-writer', daemon=True)
+
+    def start(self) -> 'EvidenceRecorder':
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self._thread.start()
+        return self
+
+    def _buffer(self, camera_id: str) -> FrameRingBuffer:
+        buffer = self.buffers.get(camera_id)
+        if buffer is None:
+            with self._lock:
+                buffer = self.buffers.get(camera_id)
+                if buffer is None:
+                    buffer = self.buffers[camera_id] = FrameRingBuffer(self.buffer_bytes, self.max_frames)
+        return buffer
+
+    def record(self, camera_id: str, frame: np.ndarray, now: Optional[float] = None) -> None:
+        """Buffer a frame if the camera's recording rate allows another one."""
+        now = now if now is not None else time.time()
+        # Slightly early frames still count, so a camera at exactly `fps` isn't halved
+        if now - self._last_recorded.get(camera_id, 0.0) < 0.9 / self.fps:
+            return
+        self._last_recorded[camera_id] = now
+
+        with STAGE_SECONDS.time('evidence_encode'):
+            if self.width and frame.shape[1] > self.width:
+                height = int(frame.shape[0] * self.width / frame.shape[1])
+                frame = cv2.resize(frame, (self.width, height), interpolation=cv2.INTER_AREA)
+            ok, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+            if ok:
+                self._buffer(camera_id).append(jpeg, now, frame.shape[1], frame.shape[0])
+
+    def trigger(self, camera_id: str, timestamp: float, frame: Optional[np.ndarray] = None) -> Optional[dict]:
+        """Schedule a clip around `timestamp`; returns the paths to attach to the alert.
+
+        `frame` is the frame the detection was made on, saved as the snapshot
+        at full size; without it the closest buffered frame is used. Returns
+        None if too many clips are already pending.
+        """
+        with self._lock:
+            pending = self._pending.get(camera_id)
+            if pending is not None and timestamp <= pending[0]:
+                return pending[1]
+        # Encoded before queueing, so a pending clip holds a JPEG rather than a raw frame
+        jpeg = self._encode_snapshot(frame)
+        with self._lock:
+            pending = self._pending.get(camera_id)
+            if pending is not None and timestamp <= pending[0]:
+                return pending[1]
+            evidence = clip_paths(self.dir, camera_id, timestamp, self.pre_seconds, self.post_seconds)
+            return evidence if self._schedule(camera_id, timestamp, jpeg, evidence) else None
+
+    def write(self, camera_id: str, timestamp: float, evidence: dict, frame: Optional[np.ndarray] = None) -> bool:
+        """Schedule a clip whose paths were already chosen, by EvidenceClaims in a worker process."""
+        jpeg = self._encode_snapshot(frame)
+        with self._lock:
+            return self._schedule(camera_id, timestamp, jpeg, evidence)
+
+    def _encode_snapshot(self, frame: Optional[np.ndarray]) -> Optional[bytes]:
+        if frame is None:
+            return None
+        with STAGE_SECONDS.time('evidence_encode'):
+            ok, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.snapshot_quality])
+        return jpeg.tobytes() if ok else None
+
+    def _schedule(self, camera_id: str, timestamp: float, jpeg: Optional[bytes], evidence: dict) -> bool:
+        try:
+            self._queue.put_nowait((camera_id, timestamp, jpeg, evidence))
+        except queue.Full:
+            self.clips_dropped += 1
+            logger.warning(f"Evidence writer is behind, no clip for camera {camera_id}")
+            return False
+        self._pending[camera_id] = (evidence['end'], evidence)
+        return True
+
+    def _writer(self):
+        while True:
+            try:
+                job = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                if self._stopped.is_set():
+                    return
+                continue
+
+            camera_id, timestamp, jpeg, evidence = job
+            # Clips are queued in trigger order and all wait the same post_seconds,
+            # so waiting for the head of the queue never delays a later clip
+            delay = evidence['end'] - time.time()
+            if delay > 0:
+                self._stopped.wait(delay)
+            try:
+                with STAGE_SECONDS.time('evidence_write'):
+                    self._write(camera_id, timestamp, jpeg, evidence)
+                self.clips_written += 1
+            except Exception as e:
+                self.clips_failed += 1
+                logger.error(f"Error writing evidence clip for camera {camera_id}: {e}")
+            with self._lock:
+                if self._pending.get(camera_id, (None, None))[1] is evidence:
+                    del self._pending[camera_id]
+
+    def _write(self, camera_id: str, timestamp: float, jpeg: Optional[bytes], evidence: dict) -> None:
+        buffer = self._buffer(camera_id)
+        frames = buffer.frames(evidence['start'], evidence['end'])
+        if not frames:
+            raise IOError("no buffered frames in the clip window")
+        clip, snapshot = Path(evidence['clip']), Path(evidence['snapshot'])
+        clip.parent.mkdir(parents=True, exist_ok=True)
+
+        if jpeg is None:
+            jpeg = min(frames, key=lambda f: abs(f[0] - timestamp))[1]
+        snapshot.write_bytes(jpeg)
+
+        # Play back at the rate the frames were actually buffered
+        span = frames[-1][0] - frames[0][0]
+        fps = (len(frames) - 1) / span if len(frames) > 1 and span > 0 else self.fps
+        _, _, width, height = frames[-1]
+        write_mjpeg_avi(clip, [jpeg for _, jpeg, w, h in frames if (w, h) == (width, height)], fps, width, height)
+        self._prune(clip.parent)
+
+    def _prune(self, camera_dir: Path) -> None:
+        clips = sorted(camera_dir.glob('*.avi'))
+        for old in clips[:max(0, len(clips) - self.max_clips)]:
+            old.unlink(missing_ok=True)
+            old.with_suffix('.jpg').unlink(missing_ok=True)
+
+    def remove(self, camera_id: str) -> None:
+        """Free a camera's buffer once its pending clips are written."""
+        with self._lock:
+            if camera_id not in self._pending:
+                self.buffers.pop(camera_id, None)
+            self._last_recorded.pop(camera_id, None)
+
+    def memory_bytes(self) -> int:
+        return sum(buffer.nbytes for buffer in list(self.buffers.values()))
+
+    def stats(self) -> Dict[str, dict]:
+        """Per-camera buffered seconds and memory."""
+        return {
+            camera_id: {
+                'frames': buffer.count,
+                'seconds': round(buffer.span(), 1),
+                'memory_mb': round(buffer.nbytes / 1024 / 1024, 1),
+                'frames_oversized': buffer.frames_oversized,
+            }
+            for camera_id, buffer in list(self.buffers.items())
+        }
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Write the pending clips with whatever post-event footage there is, then stop."""
+        self._stopped.set()
+        self._thread.join(timeout)
+
+class EvidenceClaims:
+    """Stands in for an EvidenceRecorder where the cameras aren't read (a detection worker).
+
+    `trigger()` picks the clip paths exactly as EvidenceRecorder would, so
+    they can go into the alert, and remembers them; `take()` hands the new
+    ones to the process that buffers the footage, which passes each to
+    EvidenceRecorder.write().
+    """
+
+    def __init__(self, dir: str = 'evidence', pre_seconds: float = 10.0, post_seconds: float = 5.0, **_):
+        self.dir = Path(dir)
+        self.pre_seconds = pre_seconds
+        self.post_seconds = post_seconds
+        self._pending: Dict[str, dict] = {}
+        self._claimed: List[Tuple[str, float, dict]] = []
+
+    def trigger(self, camera_id: str, timestamp: float, frame: Optional[np.ndarray] = None) -> dict:
+        pending = self._pending.get(camera_id)
+        if pending is not None and timestamp <= pending['end']:
+            return pending
+        evidence = self._pending[camera_id] = clip_paths(
+            self.dir, camera_id, timestamp, self.pre_seconds, self.post_seconds
+        )
+        self._claimed.append((camera_id, timestamp, evidence))
+        return evidence
+
+    def take(self) -> List[Tuple[str, float, dict]]:
+        """The (camera_id, timestamp, evidence) claimed since the last call."""
+        claimed, self._claimed = self._claimed, []
+        return claimed
+
+    def remove(self, camera_id: str) -> None:
+        self._pending.pop(camera_id, None)
@@ -0,0 +1,98 @@
+import threading
+import time
+import logging
+from typing import Callable, Optional, Tuple
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class FrameGrabber:
+    """Background reader that keeps decoding a capture and holds only the newest frame.
+
+    `read()` never blocks on network I/O: it returns the latest frame that has not
+    been handed out yet, or `(False, None)` when no new frame has arrived since the
+    previous call. Frames that are overwritten before anyone reads them are counted
+    in `frames_dropped`. `on_frame`, if given, sees every decoded frame on the
+    grabber thread (e.g. to buffer footage at the camera's full rate).
+    """
+
+    def __init__(self, cap: cv2.VideoCapture, camera_id: str, retry_delay: float = 0.1,
+                 on_frame: Optional[Callable[[np.ndarray], None]] = None):
+        self.cap = cap
+        self.camera_id = camera_id
+        self.retry_delay = retry_delay
+        self.on_frame = on_frame
+        self.frames_read = 0
+        self.frames_dropped = 0
+        self.failed = False
+        self.last_frame_time = 0.0
+
+        self._lock = threading.Lock()
+        self._frame: Optional[np.ndarray] = None
+        self._fresh = False
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name=f"grabber-{camera_id}", daemon=True
+        )
+
+    def start(self) -> 'FrameGrabber':
+        self._thread.start()
+        return self
+
+    def _run(self):
+        try:
+            self._reader()
+        finally:
+            # Released only here, once the last read has returned
+            self.cap.release()
+
+    def _reader(self):
+        while not self._stopped.is_set():
+            ret, frame = self.cap.read()
+            if not ret:
+                if not self.failed:
+                    logger.warning(f"Frame grabber for camera {self.camera_id} failed to read")
+                self.failed = True
+                self._stopped.wait(self.retry_delay)
+                continue
+
+            with self._lock:
+                if self._fresh:
+                    self.frames_dropped += 1
+                self._frame = frame
+                self._fresh = True
+                self.frames_read += 1
+                self.failed = False
+                self.last_frame_time = time.time()
+
+            if self.on_frame is not None:
+                try:
+                    self.on_frame(frame)
+                except Exception as e:
+                    logger.error(f"Frame callback for camera {self.camera_id} failed: {e}")
+
+    def read(self) -> Tuple[bool, Optional[np.ndarray]]:
+        """Return the newest unread frame, mirroring `cv2.VideoCapture.read()`."""
+        with self._lock:
+            if not self._fresh:
+                return False, None
+            frame = self._frame
+            self._fresh = False
+            return True, frame
+
+    def isOpened(self) -> bool:
+        return self.cap.isOpened()
+
+    def release(self):
+        self._stopped.set()
+        if self._thread.ident is None:
+            self.cap.release()
+            return
+        self._thread.join(timeout=2.0)
+        if self._thread.is_alive():
+            logger.warning(
+                f"Frame grabber for camera {self.camera_id} is still blocked in a read; "
+                f"the capture is released once the read returns"
+            )
@@ -0,0 +1,67 @@
+from typing import List, Tuple
+
+import numpy as np
+
+def iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU between two sets of [x1, y1, x2, y2] boxes (N x 4 and M x 4)."""
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)), dtype=np.float32)
+    top_left = np.maximum(a[:, None, :2], b[None, :, :2])
+    bottom_right = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+def greedy_match(scores: np.ndarray, threshold: float) -> Tuple[List[Tuple[int, int]], List[int], List[int]]:
+    """Match rows to columns by descending score; returns (matches, unmatched rows, unmatched cols)."""
+    matches = []
+    if scores.size:
+        rows, cols = np.nonzero(scores >= threshold)
+        order = np.argsort(-scores[rows, cols])
+        used_rows, used_cols = set(), set()
+        for k in order:
+            row, col = int(rows[k]), int(cols[k])
+            if row in used_rows or col in used_cols:
+                continue
+            matches.append((row, col))
+            used_rows.add(row)
+            used_cols.add(col)
+    matched_rows = {row for row, _ in matches}
+    matched_cols = {col for _, col in matches}
+    return (
+        matches,
+        [row for row in range(scores.shape[0]) if row not in matched_rows],
+        [col for col in range(scores.shape[1]) if col not in matched_cols],
+    )
+
+def nms(boxes: np.ndarray, scores: np.ndarray, iou_threshold: float) -> List[int]:
+    """Greedy non-maximum suppression; returns the indices of the boxes to keep."""
+    order = np.argsort(-scores)
+    keep = []
+    while order.size:
+        best = int(order[0])
+        keep.append(best)
+        if order.size == 1:
+            break
+        overlaps = iou_matrix(boxes[best:best + 1], boxes[order[1:]])[0]
+        order = order[1:][overlaps < iou_threshold]
+    return keep
+
+def distance_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise Euclidean distance between two sets of [x, y] points (N x 2 and M x 2)."""
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)), dtype=np.float32)
+    return np.linalg.norm(a[:, None, :] - b[None, :, :], axis=2)
+
+def points_in_polygon(points: np.ndarray, polygon: np.ndarray) -> np.ndarray:
+    """Even-odd containment of N [x, y] points in a polygon of P vertices, all edges at once."""
+    if len(points) == 0:
+        return np.zeros(0, dtype=bool)
+    x, y = points[:, 0:1], points[:, 1:2]
+    x1, y1 = polygon[:, 0], polygon[:, 1]
+    x2, y2 = np.roll(x1, -1), np.roll(y1, -1)
+    crosses = (y1 > y) != (y2 > y)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x_cross = x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+    return np.count_nonzero(crosses & (x < x_cross), axis=1) % 2 == 1
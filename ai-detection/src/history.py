@@ -0,0 +1,374 @@
+import json
+import math
+import os
+import time
+import logging
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from pipeline_metrics import STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HISTORY_CONFIG = {
+    'enabled': False,
+    'dir': 'history',
+    'partition_seconds': 3600,  # one raw segment file per partition
+    'buffer_records': 4096,  # detections held in memory between writes
+    'flush_interval': 5.0,  # seconds between writes
+    'retention_days': 30,  # raw detections are deleted after this; rollups are kept
+}
+
+# 40 bytes per detection
+RECORD_DTYPE = np.dtype([
+    ('timestamp', '<f8'),
+    ('camera', '<u2'),
+    ('cls', '<u2'),
+    ('confidence', '<f4'),
+    ('bbox', '<f4', (4,)),  # x1, y1, x2, y2 in pixels
+    ('track_id', '<i4'),  # -1 without tracking
+    ('_pad', '<u4'),
+])
+
+# One row per (bucket, camera, class); rows with cls == FRAMES_CLASS count the
+# frames processed, with or without detections
+ROLLUP_DTYPE = np.dtype([
+    ('timestamp', '<i8'),  # bucket start
+    ('camera', '<u2'),
+    ('cls', '<u2'),
+    ('count', '<u4'),
+    ('confidence_sum', '<f4'),
+    ('confidence_max', '<f4'),
+])
+FRAMES_CLASS = 0xFFFF
+
+RESOLUTIONS = {'minute': 60, 'hour': 3600}
+ROLLUP_PARTITIONS = {'minute': 86400, 'hour': 30 * 86400}  # seconds of data per rollup segment
+
+def _partition(timestamp: float, seconds: int) -> int:
+    return int(timestamp // seconds * seconds)
+
+def _append(path: Path, records: np.ndarray) -> None:
+    """Append records to a segment, dropping a torn trailing record left by a crash."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'ab') as f:
+        torn = f.tell() % records.dtype.itemsize
+        if torn:
+            f.truncate(f.tell() - torn)
+            f.seek(0, os.SEEK_END)
+        f.write(records.tobytes())
+
+def _append_partitioned(directory: Path, records: np.ndarray, seconds: int) -> None:
+    partitions = records['timestamp'] // seconds * seconds
+    for start in np.unique(partitions):
+        _append(directory / f"{int(start)}.bin", records[partitions == start])
+
+def _read(path: Path, dtype: np.dtype) -> np.ndarray:
+    """Memory-map a segment; records still being appended past the last whole one are ignored."""
+    count = path.stat().st_size // dtype.itemsize
+    if count == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', shape=(count,))
+
+def _segments(directory: Path, start: float, end: float, seconds: int) -> List[Path]:
+    """Segment files whose partition overlaps [start, end), in time order."""
+    if not directory.is_dir():
+        return []
+    found = []
+    for path in directory.glob('*.bin'):
+        try:
+            partition = int(path.stem)
+        except ValueError:
+            continue
+        if partition < end and partition + seconds > start:
+            found.append((partition, path))
+    return [path for _, path in sorted(found)]
+
+def merge_rollups(rows: np.ndarray, bucket_seconds: Optional[int] = None) -> np.ndarray:
+    """Combine rollup rows sharing (bucket, camera, class), optionally into coarser buckets."""
+    if bucket_seconds:
+        rows = rows.copy()
+        rows['timestamp'] = rows['timestamp'] // bucket_seconds * bucket_seconds
+    if len(rows) == 0:
+        return np.empty(0, dtype=ROLLUP_DTYPE)
+    rows = rows[np.lexsort((rows['cls'], rows['camera'], rows['timestamp']))]
+    changed = np.ones(len(rows), dtype=bool)
+    changed[1:] = (
+        (np.diff(rows['timestamp']) != 0)
+        | (rows['camera'][1:] != rows['camera'][:-1])
+        | (rows['cls'][1:] != rows['cls'][:-1])
+    )
+    starts = np.flatnonzero(changed)
+    merged = np.empty(len(starts), dtype=ROLLUP_DTYPE)
+    for field in ('timestamp', 'camera', 'cls'):
+        merged[field] = rows[field][starts]
+    merged['count'] = np.add.reduceat(rows['count'], starts)
+    merged['confidence_sum'] = np.add.reduceat(rows['confidence_sum'], starts)
+    merged['confidence_max'] = np.maximum.reduceat(rows['confidence_max'], starts)
+    return merged
+
+class Catalog:
+    """Append-only name <-> id tables for the cameras and classes of one shard."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        data = json.loads(path.read_text()) if path.exists() else {}
+        self.names: Dict[str, List[str]] = {
+            'cameras': data.get('cameras', []),
+            'classes': data.get('classes', []),
+        }
+        self.partition_seconds = data.get('partition_seconds')
+        self._ids = {kind: {name: i for i, name in enumerate(names)} for kind, names in self.names.items()}
+        self.dirty = False
+
+    def id(self, kind: str, name: str) -> int:
+        ids = self._ids[kind]
+        value = ids.get(name)
+        if value is None:
+            value = ids[name] = len(self.names[kind])
+            self.names[kind].append(name)
+            self.dirty = True
+        return value
+
+    def save(self) -> None:
+        """Written before the records that use new ids, atomically."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix('.tmp')
+        tmp.write_text(json.dumps({'partition_seconds': self.partition_seconds, **self.names}))
+        os.replace(tmp, self.path)
+        self.dirty = False
+
+class HistoryWriter:
+    """Append-only columnar store of every detection, with per-minute and per-hour rollups.
+
+    Detections are packed into fixed-width RECORD_DTYPE rows in a preallocated
+    buffer and appended to one segment file per time partition every
+    `flush_interval` seconds. Camera and class names are stored once in the
+    shard's catalog and referenced by id. Per-minute counts and confidences
+    per camera and class (plus frames processed) are aggregated at each write
+    and appended to rollup segments once their minute is over; hours are
+    rolled up from closed minutes. Raw partitions older than `retention_days`
+    are deleted; rollups are kept.
+
+    Each writing process owns a shard directory under `dir`, so worker
+    processes never append to the same file; HistoryReader merges all shards.
+    """
+
+    def __init__(self, dir: str = 'history', shard: str = 'main', partition_seconds: int = 3600,
+                 buffer_records: int = 4096, flush_interval: float = 5.0, retention_days: Optional[float] = 30):
+        self.root = Path(dir) / shard
+        self.catalog = Catalog(self.root / 'catalog.json')
+        # Partitioning is fixed when the shard is created
+        self.partition_seconds = int(self.catalog.partition_seconds or partition_seconds)
+        self.catalog.partition_seconds = self.partition_seconds
+        self.flush_interval = flush_interval
+        self.retention = retention_days * 86400 if retention_days else None
+        self._buffer = np.zeros(max(1, buffer_records), dtype=RECORD_DTYPE)
+        self._size = 0
+        self._frames: Dict[Tuple[int, int], int] = {}  # (minute, camera) -> frames
+        self._pending = {resolution: np.empty(0, dtype=ROLLUP_DTYPE) for resolution in RESOLUTIONS}
+        self._last_flush = time.time()
+        self._pruned_partition = None
+        self.records_written = 0
+
+    def append(self, camera_id: str, detections: List[dict], timestamp: float) -> None:
+        """Record one processed frame and its detections (possibly none)."""
+        camera = self.catalog.id('cameras', camera_id)
+        minute = _partition(timestamp, 60)
+        self._frames[(minute, camera)] = self._frames.get((minute, camera), 0) + 1
+
+        count = len(detections)
+        if count:
+            if self._size + count > len(self._buffer):
+                self.flush(timestamp)
+            if count > len(self._buffer):
+                self._buffer = np.zeros(count, dtype=RECORD_DTYPE)
+            rows = self._buffer[self._size:self._size + count]
+            rows['timestamp'] = timestamp
+            rows['camera'] = camera
+            rows['cls'] = [self.catalog.id('classes', det['class']) for det in detections]
+            rows['confidence'] = [det['confidence'] for det in detections]
+            rows['bbox'] = [det['bbox'] for det in detections]
+            rows['track_id'] = [-1 if det.get('track_id') is None else det['track_id'] for det in detections]
+            self._size += count
+
+        if timestamp - self._last_flush >= self.flush_interval:
+            self.flush(timestamp)
+
+    def flush(self, now: Optional[float] = None) -> None:
+        """Write buffered detections and every rollup bucket that has ended by `now`."""
+        now = now if now is not None else time.time()
+        self._last_flush = now
+        records = self._buffer[:self._size]
+        with STAGE_SECONDS.time('history_write'):
+            if self.catalog.dirty:
+                self.catalog.save()
+            if len(records):
+                _append_partitioned(self.root / 'raw', records, self.partition_seconds)
+                self.records_written += len(records)
+            self._rollup(records, now)
+        self._size = 0
+
+        if self.retention and math.isfinite(now):
+            partition = _partition(now, self.partition_seconds)
+            if partition != self._pruned_partition:
+                self._pruned_partition = partition
+                self._prune(now)
+
+    def _rollup(self, records: np.ndarray, now: float) -> None:
+        rows = np.zeros(len(records) + len(self._frames), dtype=ROLLUP_DTYPE)
+        detections, frames = rows[:len(records)], rows[len(records):]
+        detections['timestamp'] = records['timestamp'] // 60 * 60
+        detections['camera'] = records['camera']
+        detections['cls'] = records['cls']
+        detections['count'] = 1
+        detections['confidence_sum'] = records['confidence']
+        detections['confidence_max'] = records['confidence']
+        if self._frames:
+            keys = np.array(list(self._frames.keys()), dtype=np.int64)
+            frames['timestamp'] = keys[:, 0]
+            frames['camera'] = keys[:, 1]
+            frames['cls'] = FRAMES_CLASS
+            frames['count'] = list(self._frames.values())
+            self._frames.clear()
+
+        # Buckets that have ended move to disk, and closed minutes feed the hours
+        for resolution, seconds in RESOLUTIONS.items():
+            pending = merge_rollups(np.concatenate([self._pending[resolution], rows]), seconds)
+            closed = pending['timestamp'] + seconds <= now
+            if closed.any():
+                _append_partitioned(self.root / resolution, pending[closed], ROLLUP_PARTITIONS[resolution])
+            self._pending[resolution] = pending[~closed]
+            rows = pending[closed]
+
+    def _prune(self, now: float) -> None:
+        cutoff = now - self.retention
+        for path in _segments(self.root / 'raw', 0, cutoff, self.partition_seconds):
+            if int(path.stem) + self.partition_seconds <= cutoff:
+                path.unlink()
+                logger.info(f"Deleted detection history segment {path}")
+
+    def close(self) -> None:
+        """Write everything, including rollup buckets that are still open."""
+        self.flush(math.inf)
+
+class HistoryReader:
+    """Queries over every shard of a history directory, reading only the partitions in range.
+
+    Results are NumPy structured arrays whose `camera` and `cls` columns index
+    `self.cameras` and `self.classes` as of the last query. Raw detections lag
+    the writers by up to their flush interval, rollups by up to a minute.
+    """
+
+    def __init__(self, dir: str = 'history'):
+        self.root = Path(dir)
+        self.cameras: List[str] = []
+        self.classes: List[str] = []
+
+    def _shards(self) -> List[Tuple[Path, Catalog, np.ndarray, np.ndarray]]:
+        """Shards with lookup tables from their ids to this reader's ids."""
+        catalogs = [
+            (path.parent, Catalog(path))
+            for path in sorted(self.root.glob('*/catalog.json'))
+        ]
+        self.cameras = sorted({name for _, catalog in catalogs for name in catalog.names['cameras']})
+        self.classes = sorted({name for _, catalog in catalogs for name in catalog.names['classes']})
+        camera_ids = {name: i for i, name in enumerate(self.cameras)}
+        class_ids = {name: i for i, name in enumerate(self.classes)}
+        shards = []
+        for path, catalog in catalogs:
+            cameras = np.array([camera_ids[name] for name in catalog.names['cameras']] or [0], dtype=np.uint16)
+            classes = np.full(FRAMES_CLASS + 1, FRAMES_CLASS, dtype=np.uint16)
+            classes[:len(catalog.names['classes'])] = [class_ids[name] for name in catalog.names['classes']]
+            shards.append((path, catalog, cameras, classes))
+        return shards
+
+    def _filter(self, rows: np.ndarray, cameras: Optional[Iterable[str]],
+                classes: Optional[Iterable[str]]) -> np.ndarray:
+        mask = np.ones(len(rows), dtype=bool)
+        if cameras is not None:
+            ids = [i for i, name in enumerate(self.cameras) if name in set(cameras)]
+            mask &= np.isin(rows['camera'], ids)
+        if classes is not None:
+            ids = [i for i, name in enumerate(self.classes) if name in set(classes)]
+            mask &= np.isin(rows['cls'], ids)
+        return rows[mask]
+
+    def detections(self, start: float, end: float, cameras: Optional[Iterable[str]] = None,
+                   classes: Optional[Iterable[str]] = None, min_confidence: float = 0.0) -> np.ndarray:
+        """Raw detections with start <= timestamp < end, in time order."""
+        parts = []
+        for path, catalog, camera_lut, class_lut in self._shards():
+            for segment in _segments(path / 'raw', start, end, catalog.partition_seconds):
+                records = _read(segment, RECORD_DTYPE)
+                selected = records[
+                    (records['timestamp'] >= start) & (records['timestamp'] < end)
+                    & (records['confidence'] >= min_confidence)
+                ]
+                selected['camera'] = camera_lut[selected['camera']]
+                selected['cls'] = class_lut[selected['cls']]
+                parts.append(selected)
+        rows = np.concatenate(parts) if parts else np.empty(0, dtype=RECORD_DTYPE)
+        rows = self._filter(rows, cameras, classes)
+        return rows[np.argsort(rows['timestamp'], kind='stable')]
+
+    def _rollup_rows(self, path: Path, resolution: str, start: float, end: float) -> np.ndarray:
+        parts = [
+            _read(segment, ROLLUP_DTYPE)
+            for segment in _segments(path / resolution, start, end, ROLLUP_PARTITIONS[resolution])
+        ]
+        rows = np.concatenate(parts) if parts else np.empty(0, dtype=ROLLUP_DTYPE)
+        return rows[(rows['timestamp'] >= start) & (rows['timestamp'] < end)]
+
+    def rollup(self, start: float, end: float, bucket_seconds: int = 3600,
+               cameras: Optional[Iterable[str]] = None, classes: Optional[Iterable[str]] = None,
+               include_frames: bool = True) -> np.ndarray:
+        """Counts and confidences per (bucket, camera, class) over [start, end).
+
+        The range is widened to whole minutes and `bucket_seconds` must be a
+        multiple of one. For multiples of an hour, whole hours are read from the
+        hourly rollups and only the partial hours at either end (or hours not
+        rolled up yet) from the minute rollups. Rows with cls == FRAMES_CLASS
+        count frames.
+        """
+        if bucket_seconds % 60:
+            raise ValueError("bucket_seconds must be a multiple of 60")
+        start = _partition(start, 60)
+        first_hour, last_hour = math.ceil(start / 3600) * 3600, _partition(end, 3600)
+        parts = []
+        for path, _, camera_lut, class_lut in self._shards():
+            if bucket_seconds % 3600 == 0 and last_hour > first_hour:
+                hours = self._rollup_rows(path, 'hour', first_hour, last_hour)
+                covered = int(hours['timestamp'].max()) + 3600 if len(hours) else first_hour
+                rows = np.concatenate([
+                    self._rollup_rows(path, 'minute', start, first_hour),
+                    hours,
+                    self._rollup_rows(path, 'minute', covered, end),
+                ])
+            else:
+                rows = self._rollup_rows(path, 'minute', start, end)
+            rows['camera'] = camera_lut[rows['camera']]
+            rows['cls'] = class_lut[rows['cls']]
+            parts.append(rows)
+        rows = np.concatenate(parts) if parts else np.empty(0, dtype=ROLLUP_DTYPE)
+        if not include_frames:
+            rows = rows[rows['cls'] != FRAMES_CLASS]
+        if classes is not None:
+            # Frame counts stay in so rates can still be computed
+            frames = rows[rows['cls'] == FRAMES_CLASS]
+            rows = np.concatenate([self._filter(rows[rows['cls'] != FRAMES_CLASS], None, classes), frames])
+        rows = self._filter(rows, cameras, None)
+        return merge_rollups(rows, bucket_seconds)
+
+    def totals(self, start: float, end: float, cameras: Optional[Iterable[str]] = None,
+               classes: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, int]]:
+        """{camera: {class: detections}} over [start, end), from the hourly and minute rollups."""
+        rows = self.rollup(start, end, 3600, cameras, classes, include_frames=False)
+        totals: Dict[str, Dict[str, int]] = {}
+        for row in rows:
+            camera = totals.setdefault(self.cameras[row['camera']], {})
+            name = self.classes[row['cls']]
+            camera[name] = camera.get(name, 0) + int(row['count'])
+        return totals
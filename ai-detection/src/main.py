@@ -3,12 +3,30 @@ import numpy as np
 import torch
 import time
 import json
-import requests
-from ultralytics import YOLO
+import sys
 from typing import Dict, List, Optional
 import logging
+from functools import partial
 from pathlib import Path
 
+# Modules shared with the backend live in the repository's shared/ package
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from alert_dispatcher import AlertDispatcher, DEFAULT_ALERTS_CONFIG
+from camera_supervisor import CameraSupervisor, DEFAULT_SUPERVISOR_CONFIG
+from capture import CaptureConnector, DEFAULT_DECODE_OPTIONS
+from evidence import EvidenceClaims, EvidenceRecorder, DEFAULT_EVIDENCE_CONFIG
+from history import HistoryWriter, DEFAULT_HISTORY_CONFIG
+from motion_gate import MotionGate
+from pipeline_metrics import STAGE_SECONDS, register_camera_metrics, register_evidence_metrics
+from rules import RuleEngine, DEFAULT_RULES_CONFIG, compile_rules, load_definitions
+from scheduler import FrameScheduler, DEFAULT_SCHEDULING_CONFIG
+from tiling import TilePlan
+from tracker import MultiObjectTracker
+from shared.detections import extract_detections
+from shared.metrics import REGISTRY, serve as serve_metrics
+from shared.model_registry import ModelRegistry, DEFAULT_MODEL
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -16,116 +34,598 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+DEFAULT_BATCHING_CONFIG = {
+    'enabled': False,
+    'max_batch_size': 8,  # frames per forward pass
+    'max_wait': 0.05,  # seconds to wait for a batch to fill up
+}
+
+DEFAULT_INFERENCE_CONFIG = {
+    'backend': 'pytorch',  # pytorch, onnx or openvino
+    'threads': None,  # CPU threads for the runtime; None uses the runtime default
+    'imgsz': 640,
+    'warmup_runs': 1,
+}
+
+DEFAULT_MODELS_CONFIG = {
+    'model': None,  # registry name a camera runs; None uses model_path
+    'memory_budget_mb': None,  # unload least recently used idle models above this
+    'registry': {},  # name -> path, or {'path', 'version', and inference options}
+}
+
+DEFAULT_MOTION_CONFIG = {
+    'enabled': False,
+    'width': 160,  # width of the downscaled grayscale copy
+    'pixel_threshold': 25,  # per-pixel intensity change that counts as motion
+    'min_changed_ratio': 0.01,  # fraction of ROI pixels that must change
+    'max_interval': 30.0,  # seconds before inference is forced anyway
+    'roi': None,  # optional polygon of normalized [x, y] points
+}
+
+DEFAULT_TRACKING_CONFIG = {
+    'enabled': False,
+    'iou_threshold': 0.3,
+    'high_confidence': 0.6,  # detections below this only extend existing tracks
+    'min_hits': 2,  # matches before a track is confirmed and alerted on
+    'max_lost': 10.0,  # seconds a track survives without a matching detection
+}
+
+DEFAULT_TILING_CONFIG = {
+    'roi': None,  # optional [x1, y1, x2, y2] crop in normalized coordinates
+    'tile_size': None,  # slice the ROI into overlapping tiles of this many pixels
+    'overlap': 0.2,  # fraction of a tile shared with its neighbour
+    'full_frame': True,  # also run the whole ROI to catch objects larger than a tile
+    'nms_iou': 0.5,  # IoU above which detections from different tiles are merged
+}
+
+DEFAULT_METRICS_CONFIG = {
+    'enabled': True,
+    'host': '127.0.0.1',  # Prometheus text format on http://host:port/metrics
+    'port': 9108,
+    'sample_every': 10,  # time one in N calls per stage to keep the hot loop cheap
+}
+
+FRAMES_INFERRED = REGISTRY.counter('detection_frames_inferred_total', 'Frames run through the model', ['camera'])
+ALERTS_SENT = REGISTRY.counter('detection_alerts_total', 'Alerts queued for delivery', ['camera'])
+RULE_HITS = REGISTRY.counter('detection_rule_hits_total', 'Detection rules that fired', ['camera', 'rule'])
+
+class ThroughputMeter:
+    """Count processed frames and periodically report frames/s."""
+
+    def __init__(self, name: str, report_interval: float = 30.0):
+        self.name = name
+        self.report_interval = report_interval
+        self.total_frames = 0
+        self.total_batches = 0
+        self._window_frames = 0
+        self._window_batches = 0
+        self._window_start = time.time()
+        self.fps = 0.0
+
+    def update(self, frames: int, now: Optional[float] = None) -> bool:
+        """Record a processed batch of `frames` frames; return True if a report was logged."""
+        now = now if now is not None else time.time()
+        self.total_frames += frames
+        self.total_batches += 1
+        self._window_frames += frames
+        self._window_batches += 1
+
+        elapsed = now - self._window_start
+        if elapsed >= self.report_interval:
+            self.fps = self._window_frames / elapsed
+            logger.info(
+                f"{self.name}: {self.fps:.1f} frames/s "
+                f"(avg batch {self._window_frames / self._window_batches:.1f}, "
+                f"{self._window_frames} frames in {elapsed:.1f}s)"
+            )
+            self._window_frames = 0
+            self._window_batches = 0
+            self._window_start = now
+            return True
+        return False
+
 class AIDetectionService:
-    def __init__(self, config_path: str = 'config.json'):
+    def __init__(self, config_path: str = 'config.json', buffers_footage: bool = True,
+                 history_shard: str = 'main'):
         self.config = self._load_config(config_path)
-        self.model = self._load_model()
-        self.cameras: Dict[str, cv2.VideoCapture] = {}
-        self.last_detection: Dict[str, float] = {}
-        self.min_detection_interval = 5.0  # seconds between detections per camera
+        self.models = self._load_models()
+        self.camera_models: Dict[str, str] = {}
+        self.cameras: Dict[str, CaptureConnector] = {}
+        evidence = {**DEFAULT_EVIDENCE_CONFIG, **self.config.get('evidence', {})}
+        self.threaded_capture = self.config.get('threaded_capture', False)
+        if evidence['enabled'] and buffers_footage and not self.threaded_capture:
+            # Evidence needs footage between inferences (and while a camera is
+            # held after an alert), which only a grabber thread reads
+            logger.info("Evidence recording is on, reading cameras on grabber threads")
+            self.threaded_capture = True
+        self.connections = CameraSupervisor(
+            **{**DEFAULT_SUPERVISOR_CONFIG, **self.config.get('connection', {})}
+        )
+        scheduling = {**DEFAULT_SCHEDULING_CONFIG, **self.config.get('scheduling', {})}
+        self.scheduler = FrameScheduler(scheduling['retry_delay'], scheduling['lag_warning'])
+        self.batching = {**DEFAULT_BATCHING_CONFIG, **self.config.get('batching', {})}
+        self.throughput = ThroughputMeter('inference')
+        self.motion_gates: Dict[str, MotionGate] = {}
+        self.tracking = {**DEFAULT_TRACKING_CONFIG, **self.config.get('tracking', {})}
+        self.trackers: Dict[str, MultiObjectTracker] = {}
+        self.tile_plans: Dict[str, Optional[TilePlan]] = {}
+        self.rules = {**DEFAULT_RULES_CONFIG, **self.config.get('rules', {})}
+        self.compiled_rules = self._load_rules() if self.rules['enabled'] else None
+        self.rule_engines: Dict[str, RuleEngine] = {}
+        self.alert_dispatcher = AlertDispatcher(
+            self.config['alert_endpoint'],
+            **{**DEFAULT_ALERTS_CONFIG, **self.config.get('alerts', {})}
+        ).start()
+        evidence_options = {key: value for key, value in evidence.items() if key != 'enabled'}
+        if not evidence['enabled']:
+            self.evidence = None
+        elif buffers_footage:
+            self.evidence = EvidenceRecorder(**evidence_options).start()
+        else:
+            # A worker only picks the clip paths; the supervisor reading its cameras records them
+            self.evidence = EvidenceClaims(**evidence_options)
+        self.history = self._open_history(history_shard)
+        self.metrics = {**DEFAULT_METRICS_CONFIG, **self.config.get('metrics', {})}
+        self._register_metrics()
+
+    def _register_metrics(self):
+        """Expose per-camera and queue state; collected only when /metrics is scraped."""
+        REGISTRY.sample_every = max(1, int(self.metrics['sample_every']))
+        register_camera_metrics(self.connections, self.scheduler, self.cameras)
+        REGISTRY.counter('detection_motion_skipped_total', 'Frames skipped by the motion gate', ['camera'],
+                         collect=lambda: {
+                             (camera_id,): gate.frames_skipped for camera_id, gate in list(self.motion_gates.items())
+                         })
+        REGISTRY.gauge('detection_model_memory_bytes', 'Estimated memory of loaded models', ['model', 'version'],
+                       collect=lambda: {
+                           (stats['name'], stats['version']): stats['memory_bytes'] for stats in self.models.stats()
+                       })
+        REGISTRY.counter('detection_model_loads_total', 'Model loads and budget evictions', ['event'],
+                         collect=lambda: {('load',): self.models.loads, ('evict',): self.models.evictions})
+        REGISTRY.gauge('detection_alert_queue_depth', 'Alerts waiting to be sent',
+                       collect=self.alert_dispatcher.queue_depth)
+        REGISTRY.counter('detection_alerts_spooled_total', 'Alerts written to the disk spool',
+                         collect=lambda: self.alert_dispatcher.spooled)
+        REGISTRY.counter('detection_alerts_dropped_total', 'Alerts rejected by the endpoint or lost',
+                         collect=lambda: self.alert_dispatcher.dropped)
+        if self.history is not None:
+            REGISTRY.counter('detection_history_records_total', 'Detections written to the history store',
+                             collect=lambda: self.history.records_written)
+        if isinstance(self.evidence, EvidenceRecorder):
+            register_evidence_metrics(self.evidence)
 
     def _load_config(self, config_path: str) -> dict:
         with open(config_path, 'r') as f:
             return json.load(f)
 
-    def _load_model(self) -> YOLO:
-        model_path = self.config['model_path']
-        logger.info(f"Loading YOLO model from {model_path}")
-        return YOLO(model_path)
+    def _camera_options(self, section: str, defaults: dict, camera_id: str) -> dict:
+        """Merge a config section with its per-camera overrides under 'cameras'."""
+        options = {**defaults, **self.config.get(section, {})}
+        overrides = options.pop('cameras', None) or {}
+        options.update(overrides.get(camera_id, {}))
+        return options
+
+    def _scheduling_options(self, camera_id: str) -> dict:
+        defaults = dict(DEFAULT_SCHEDULING_CONFIG)
+        # Older configs set the tracking sample rate as tracking.inference_interval
+        legacy_interval = self.config.get('tracking', {}).get('inference_interval')
+        if legacy_interval:
+            defaults['fps'] = 1.0 / legacy_interval
+        return self._camera_options('scheduling', defaults, camera_id)
+
+    def _load_rules(self) -> list:
+        """Compile the configured AlertRule/Workflow definitions once at startup."""
+        definitions = load_definitions(self.rules['definitions'])
+        if self.rules['file']:
+            with open(self.rules['file'], 'r') as f:
+                definitions += load_definitions(json.load(f))
+        return compile_rules(definitions, self.rules['stationary_iou'], self.tracking['enabled'])
+
+    def _open_history(self, shard: str) -> Optional[HistoryWriter]:
+        history = {**DEFAULT_HISTORY_CONFIG, **self.config.get('history', {})}
+        if not history.pop('enabled'):
+            return None
+        return HistoryWriter(shard=shard, **history)
+
+    def _load_models(self) -> ModelRegistry:
+        """Register model_path as the default model next to the site models; only the default loads now."""
+        models = {**DEFAULT_MODELS_CONFIG, **self.config.get('models', {})}
+        options = {**DEFAULT_INFERENCE_CONFIG, **self.config.get('inference', {})}
+        registry = ModelRegistry(models['memory_budget_mb'])
+        registry.register(DEFAULT_MODEL, self.config['model_path'], **options)
+        registry.configure(models['registry'], options)
+        logger.info(f"Loading YOLO model from {self.config['model_path']} ({options['backend']} backend)")
+        registry.preload(DEFAULT_MODEL)
+        return registry
+
+    def _model_name(self, camera_id: str) -> str:
+        name = self.camera_models.get(camera_id)
+        if name is None:
+            name = self._camera_options('models', DEFAULT_MODELS_CONFIG, camera_id)['model'] or DEFAULT_MODEL
+            self.camera_models[camera_id] = name
+        return name
+
+    def swap_model(self, name: str, path: str, version: Optional[str] = None, **options) -> str:
+        """Switch a model to a new version; frames already in inference finish on the old one."""
+        options = {**DEFAULT_INFERENCE_CONFIG, **self.config.get('inference', {}), **options}
+        return self.models.swap(name, path, version, **options)
+
+    def _add_camera(self, camera_id: str, rtsp_url: str):
+        connector = CaptureConnector(
+            camera_id, rtsp_url,
+            self._camera_options('decode', DEFAULT_DECODE_OPTIONS, camera_id),
+            threaded=self.threaded_capture,
+            on_frame=partial(self.evidence.record, camera_id) if isinstance(self.evidence, EvidenceRecorder) else None,
+        )
+        self.cameras[camera_id] = connector
+        self.connections.add(camera_id, connector)
+        options = self._scheduling_options(camera_id)
+        self.scheduler.add(camera_id, options['fps'], options['priority'])
 
     def connect_camera(self, camera_id: str, rtsp_url: str) -> bool:
-        """Connect to a camera stream."""
-        try:
-            cap = cv2.VideoCapture(rtsp_url)
-            if not cap.isOpened():
-                logger.error(f"Failed to connect to camera {camera_id}")
-                return False
-            
-            self.cameras[camera_id] = cap
-            self.last_detection[camera_id] = 0
-            logger.info(f"Connected to camera {camera_id}")
-            return True
-        except Exception as e:
-            logger.error(f"Error connecting to camera {camera_id}: {e}")
-            return False
+        """Connect to a camera stream.
+
+        A camera that fails to open stays registered and is retried in the
+        background with backoff.
+        """
+        self._add_camera(camera_id, rtsp_url)
+        return self.connections.connect(camera_id)
+
+    def connect_cameras(self, cameras: Dict[str, str]) -> Dict[str, bool]:
+        """Connect to several camera streams in parallel."""
+        for camera_id, rtsp_url in cameras.items():
+            self._add_camera(camera_id, rtsp_url)
+        results = self.connections.connect_all()
+        logger.info(f"Connected to {sum(results.values())}/{len(results)} cameras")
+        return results
 
     def disconnect_camera(self, camera_id: str):
         """Disconnect from a camera stream."""
         if camera_id in self.cameras:
-            self.cameras[camera_id].release()
+            self.connections.remove(camera_id)
+            self.scheduler.remove(camera_id)
             del self.cameras[camera_id]
-            del self.last_detection[camera_id]
+            self.motion_gates.pop(camera_id, None)
+            self.trackers.pop(camera_id, None)
+            self.tile_plans.pop(camera_id, None)
+            self.camera_models.pop(camera_id, None)
+            self.rule_engines.pop(camera_id, None)
+            if self.evidence is not None:
+                self.evidence.remove(camera_id)
             logger.info(f"Disconnected from camera {camera_id}")
 
+    def read_frame(self, camera_id: str) -> Optional[np.ndarray]:
+        """Read the next frame from a camera, or None if none is available.
+
+        Stalled and dead cameras are reconnected in the background by the
+        connection supervisor; reading them just returns None meanwhile.
+        """
+        return self.connections.read(camera_id)
+
+    def dropped_frames(self) -> Dict[str, int]:
+        """Frames overwritten before inference, per threaded camera."""
+        return {
+            camera_id: connector.frames_dropped
+            for camera_id, connector in self.cameras.items()
+            if connector.threaded
+        }
+
+    def should_process(self, frame: np.ndarray, camera_id: str) -> bool:
+        """Run the camera's motion gate; False means the frame can be skipped."""
+        gate = self.motion_gates.get(camera_id)
+        if gate is None:
+            options = self._camera_options('motion', DEFAULT_MOTION_CONFIG, camera_id)
+            if not options.pop('enabled'):
+                return True
+            gate = self.motion_gates[camera_id] = MotionGate(**options)
+        return gate.should_process(frame)
+
+    def _log_stats(self):
+        logger.info(self.connections.summary())
+        logger.info(self.scheduler.summary())
+        self._log_motion_stats()
+
+    def _log_motion_stats(self):
+        if not self.motion_gates:
+            return
+        checked = sum(gate.frames_checked for gate in self.motion_gates.values())
+        skipped = sum(gate.frames_skipped for gate in self.motion_gates.values())
+        logger.info(
+            f"Motion gate skipped {skipped}/{checked} frames "
+            f"({skipped / max(checked, 1):.0%}); per camera: "
+            + ", ".join(
+                f"{camera_id}={gate.skip_ratio:.0%}"
+                for camera_id, gate in self.motion_gates.items()
+            )
+        )
+
+    def _tile_plan(self, camera_id: str, frame: np.ndarray) -> Optional[TilePlan]:
+        """ROI/tile layout for a camera, rebuilt only when the frame geometry changes."""
+        if camera_id in self.tile_plans:
+            plan = self.tile_plans[camera_id]
+            if plan is None or plan.frame_shape == frame.shape:
+                return plan
+
+        options = self._camera_options('tiling', DEFAULT_TILING_CONFIG, camera_id)
+        plan = None
+        if options['roi'] or options['tile_size']:
+            plan = TilePlan(frame.shape, **options)
+            logger.info(f"Camera {camera_id}: {plan.num_inputs} inference inputs per frame")
+        self.tile_plans[camera_id] = plan
+        return plan
+
+    def _model_inputs(self, frame: np.ndarray, camera_id: str):
+        plan = self._tile_plan(camera_id, frame)
+        return (plan.inputs(frame) if plan else [frame]), plan
+
+    def _collect_detections(self, results, plan: Optional[TilePlan], names: dict) -> List[dict]:
+        per_input = [extract_detections(result, names)[0] for result in results]
+        if plan is None:
+            return [det for detections in per_input for det in detections]
+        return plan.merge(per_input)
+
     def process_frame(self, frame: np.ndarray, camera_id: str) -> Optional[dict]:
         """Process a single frame and return detection results."""
         try:
-            # Run YOLO detection
-            results = self.model(frame, conf=0.5)
-            
-            # Process results
-            detections = []
-            for result in results:
-                boxes = result.boxes
-                for box in boxes:
-                    cls = int(box.cls[0])
-                    conf = float(box.conf[0])
-                    xyxy = box.xyxy[0].tolist()
-                    
-                    detections.append({
-                        'class': self.model.names[cls],
-                        'confidence': conf,
-                        'bbox': xyxy
-                    })
-
-            if detections:
-                return {
-                    'camera_id': camera_id,
-                    'timestamp': time.time(),
-                    'detections': detections
-                }
-            return None
+            # Run YOLO detection on the whole frame, or on its ROI/tiles
+            with STAGE_SECONDS.time('preprocess'):
+                inputs, plan = self._model_inputs(frame, camera_id)
+            with self.models.use(self._model_name(camera_id)) as model:
+                with STAGE_SECONDS.time('inference'):
+                    results = model(inputs if plan else frame, conf=0.5)
+            with STAGE_SECONDS.time('postprocess'):
+                return self._build_detection(self._collect_detections(results, plan, model.names), camera_id)
 
         except Exception as e:
             logger.error(f"Error processing frame from camera {camera_id}: {e}")
             return None
 
-    def send_alert(self, detection: dict):
-        """Send detection alert to the backend."""
+    def process_batch(self, frames: Dict[str, np.ndarray]) -> Dict[str, Optional[dict]]:
+        """Run one batched forward pass per model and route the results back per camera."""
+        groups: Dict[str, Dict[str, np.ndarray]] = {}
+        for camera_id, frame in frames.items():
+            groups.setdefault(self._model_name(camera_id), {})[camera_id] = frame
+        results = {}
+        for name, group in groups.items():
+            results.update(self._process_group(name, group))
+        return results
+
+    def _process_group(self, name: str, frames: Dict[str, np.ndarray]) -> Dict[str, Optional[dict]]:
+        camera_ids = list(frames.keys())
         try:
-            response = requests.post(
-                self.config['alert_endpoint'],
-                json=detection,
-                headers={'Content-Type': 'application/json'}
-            )
-            response.raise_for_status()
-            logger.info(f"Alert sent successfully for camera {detection['camera_id']}")
+            inputs, spans = [], []
+            with STAGE_SECONDS.time('preprocess'):
+                for camera_id in camera_ids:
+                    camera_inputs, plan = self._model_inputs(frames[camera_id], camera_id)
+                    spans.append((len(inputs), len(inputs) + len(camera_inputs), plan))
+                    inputs.extend(camera_inputs)
+            with self.models.use(name) as model:
+                with STAGE_SECONDS.time('inference'):
+                    results = model(inputs, conf=0.5)
         except Exception as e:
-            logger.error(f"Error sending alert: {e}")
+            logger.error(f"Error processing batch from cameras {camera_ids}: {e}")
+            return {camera_id: None for camera_id in camera_ids}
+
+        # Ultralytics returns one result per input image, in input order
+        with STAGE_SECONDS.time('postprocess'):
+            return {
+                camera_id: self._build_detection(
+                    self._collect_detections(results[start:end], plan, model.names), camera_id
+                )
+                for camera_id, (start, end, plan) in zip(camera_ids, spans)
+            }
+
+    def _build_detection(self, detections: List[dict], camera_id: str) -> Optional[dict]:
+        """Wrap a camera's detections into the alert payload."""
+        if detections:
+            return {
+                'camera_id': camera_id,
+                'timestamp': time.time(),
+                'detections': detections
+            }
+        return None
+
+    def _tracker(self, camera_id: str) -> MultiObjectTracker:
+        tracker = self.trackers.get(camera_id)
+        if tracker is None:
+            options = {
+                key: value for key, value in self.tracking.items()
+                if key not in ('enabled', 'inference_interval')
+            }
+            tracker = self.trackers[camera_id] = MultiObjectTracker(**options)
+        return tracker
+
+    def _track(self, camera_id: str, detection: Optional[dict], current_time: float) -> Optional[dict]:
+        """Assign track ids and keep only detections from newly confirmed tracks."""
+        tracker = self._tracker(camera_id)
+        detections = detection['detections'] if detection else []
+        new_tracks = tracker.update(detections, current_time)
+        if not new_tracks:
+            return None
+
+        new_ids = {track.track_id for track in new_tracks}
+        return {
+            **detection,
+            'detections': [det for det in detections if det.get('track_id') in new_ids],
+            'active_tracks': len(tracker.tracks),
+        }
+
+    def _rule_engine(self, camera_id: str) -> RuleEngine:
+        engine = self.rule_engines.get(camera_id)
+        if engine is None:
+            options = self._camera_options('rules', DEFAULT_RULES_CONFIG, camera_id)
+            engine = self.rule_engines[camera_id] = RuleEngine(
+                self.compiled_rules, camera_id,
+                zones=options['zones'],
+                pixels_per_meter=options['pixels_per_meter'],
+                object_heights=options['object_heights'],
+                class_aliases=options['class_aliases'],
+                cooldown=options['cooldown'],
+            )
+        return engine
+
+    def _apply_rules(self, camera_id: str, detection: Optional[dict], current_time: float,
+                     frame: Optional[np.ndarray]) -> Optional[dict]:
+        """Evaluate the camera's rules; returns an alert with only the rule hits and their detections."""
+        detections = detection['detections'] if detection else []
+        frame_size = (frame.shape[1], frame.shape[0]) if frame is not None else None
+        hits = self._rule_engine(camera_id).evaluate(detections, frame_size, current_time)
+        if not hits:
+            return None
+
+        involved = sorted({index for hit in hits for index in hit['detections']})
+        position = {index: i for i, index in enumerate(involved)}
+        for hit in hits:
+            RULE_HITS.inc(camera_id, hit['rule_id'])
+            hit['detections'] = [position[index] for index in hit['detections']]
+        return {
+            'camera_id': camera_id,
+            'timestamp': detection['timestamp'] if detection else time.time(),
+            'detections': [detections[index] for index in involved],
+            'rule_hits': hits,
+        }
+
+    def tracks(self, camera_id: str, current_time: Optional[float] = None) -> List[dict]:
+        """Current track positions for a camera, predicted forward between inferences."""
+        tracker = self.trackers.get(camera_id)
+        if tracker is None:
+            return []
+        return [track.to_dict() for track in tracker.predict(current_time)]
+
+    def handle_result(self, camera_id: str, detection: Optional[dict], current_time: float,
+                      frame: Optional[np.ndarray] = None) -> bool:
+        """Alert on a camera's inference result; returns True if an alert was sent.
+
+        With detection rules enabled only rule hits are alerted, each rule at most
+        once per its cooldown; tracking then only supplies track ids. Otherwise,
+        with tracking enabled an alert fires once per track, and without it the
+        camera is held back by the scheduling alert_cooldown after each alert.
+        Every result, alerted or not, is appended to the history store if enabled.
+        With evidence recording on, the alert carries the paths of the clip and
+        snapshot being written for it; `frame` becomes the snapshot.
+        """
+        FRAMES_INFERRED.inc(camera_id)
+        detections = detection['detections'] if detection else []
+        if self.tracking['enabled']:
+            with STAGE_SECONDS.time('tracking'):
+                # Assigns track ids to the detections in place
+                tracked = self._track(camera_id, detection, current_time)
+        if self.history is not None:
+            with STAGE_SECONDS.time('history'):
+                self.history.append(camera_id, detections, current_time)
+        if self.compiled_rules is not None:
+            with STAGE_SECONDS.time('rules'):
+                detection = self._apply_rules(camera_id, detection, current_time, frame)
+        elif self.tracking['enabled']:
+            detection = tracked
+        if not detection:
+            return False
+
+        ALERTS_SENT.inc(camera_id)
+        if self.evidence is not None:
+            evidence = self.evidence.trigger(camera_id, current_time, frame)
+            if evidence is not None:
+                detection = {**detection, 'evidence': evidence}
+        self.send_alert(detection)
+        if not self.tracking['enabled'] and self.compiled_rules is None:
+            cooldown = self._scheduling_options(camera_id)['alert_cooldown']
+            self.scheduler.hold(camera_id, current_time + cooldown)
+        return True
+
+    def send_alert(self, detection: dict):
+        """Queue a detection alert for background delivery to the backend."""
+        self.alert_dispatcher.submit(detection)
+
+    def shutdown(self):
+        """Release all cameras and flush pending alerts."""
+        for camera_id in list(self.cameras.keys()):
+            self.disconnect_camera(camera_id)
+        self.connections.shutdown()
+        if isinstance(self.evidence, EvidenceRecorder):
+            self.evidence.stop()
+        if self.history is not None:
+            self.history.close()
+        self.alert_dispatcher.stop()
+
+    def _next_frame(self, timeout: Optional[float] = None):
+        """Wait for the next due camera and read it; returns (camera_id, frame).
+
+        A camera without a frame ready is retried shortly. A frame the motion
+        gate rejects still counts as served. (None, None) means the timeout
+        passed, or the due camera had nothing to run.
+        """
+        camera_id = self.scheduler.next(timeout)
+        if camera_id is None:
+            return None, None
+
+        frame = self.read_frame(camera_id)
+        if frame is None:
+            self.scheduler.retry(camera_id)
+            return None, None
+        self.scheduler.complete(camera_id)
+        if not self.should_process(frame, camera_id):
+            return None, None
+        return camera_id, frame
+
+    def _collect_batch(self) -> Dict[str, np.ndarray]:
+        """Collect frames from due cameras until the batch is full or max_wait expires."""
+        max_batch_size = self.batching['max_batch_size']
+        batch: Dict[str, np.ndarray] = {}
+        deadline = None
+
+        while len(batch) < max_batch_size:
+            # The first frame opens the batch; others may join for up to max_wait
+            timeout = 0.5 if deadline is None else deadline - time.time()
+            if timeout < 0:
+                break
+            camera_id, frame = self._next_frame(timeout)
+            if camera_id is None:
+                if deadline is None:
+                    return batch  # nothing due yet
+                continue
+            batch[camera_id] = frame
+            if deadline is None:
+                deadline = time.time() + self.batching['max_wait']
+        return batch
+
+    def _run_batched(self):
+        """Processing loop that runs due cameras through YOLO in batches."""
+        logger.info(
+            f"Batched inference enabled (max_batch_size={self.batching['max_batch_size']}, "
+            f"max_wait={self.batching['max_wait']}s)"
+        )
+
+        while True:
+            batch = self._collect_batch()
+            if not batch:
+                continue
+
+            current_time = time.time()
+            results = self.process_batch(batch)
+            if self.throughput.update(len(batch)):
+                self._log_stats()
+
+            for camera_id, detection in results.items():
+                self.handle_result(camera_id, detection, current_time, batch[camera_id])
 
     def run(self):
-        """Main processing loop."""
+        """Main processing loop, driven by the scheduler's next-due camera."""
         logger.info("Starting AI detection service")
-        
-        while True:
-            for camera_id, cap in self.cameras.items():
-                # Check if enough time has passed since last detection
-                current_time = time.time()
-                if current_time - self.last_detection[camera_id] < self.min_detection_interval:
-                    continue
 
-                ret, frame = cap.read()
-                if not ret:
-                    logger.warning(f"Failed to read frame from camera {camera_id}")
-                    continue
+        if self.batching['enabled']:
+            self._run_batched()
+            return
 
-                # Process frame
-                detection = self.process_frame(frame, camera_id)
-                if detection:
-                    self.send_alert(detection)
-                    self.last_detection[camera_id] = current_time
+        while True:
+            camera_id, frame = self._next_frame(timeout=0.5)
+            if camera_id is None:
+                continue
 
-            time.sleep(0.1)  # Small delay to prevent CPU overload
+            current_time = time.time()
+            detection = self.process_frame(frame, camera_id)
+            if self.throughput.update(1):
+                self._log_stats()
+            self.handle_result(camera_id, detection, current_time, frame)
 
 def main():
     # Create config directory if it doesn't exist
@@ -138,6 +638,22 @@ def main():
         default_config = {
             'model_path': 'models/yolov8n.pt',
             'alert_endpoint': 'http://localhost:3000/api/alerts',
+            'inference': DEFAULT_INFERENCE_CONFIG,
+            'models': DEFAULT_MODELS_CONFIG,
+            'batching': DEFAULT_BATCHING_CONFIG,
+            'threaded_capture': False,
+            'decode': DEFAULT_DECODE_OPTIONS,
+            'connection': DEFAULT_SUPERVISOR_CONFIG,
+            'scheduling': DEFAULT_SCHEDULING_CONFIG,
+            'workers': 1,
+            'motion': DEFAULT_MOTION_CONFIG,
+            'alerts': DEFAULT_ALERTS_CONFIG,
+            'tracking': DEFAULT_TRACKING_CONFIG,
+            'tiling': DEFAULT_TILING_CONFIG,
+            'metrics': DEFAULT_METRICS_CONFIG,
+            'evidence': DEFAULT_EVIDENCE_CONFIG,
+            'rules': DEFAULT_RULES_CONFIG,
+            'history': DEFAULT_HISTORY_CONFIG,
             'cameras': {
                 'CAM-001': 'rtsp://camera1.example.com/stream',
                 'CAM-002': 'rtsp://camera2.example.com/stream'
@@ -146,19 +662,35 @@ def main():
         with open(config_path, 'w') as f:
             json.dump(default_config, f, indent=2)
 
+    # Shard cameras across worker processes when more than one is configured
+    with open(config_path, 'r') as f:
+        config = json.load(f)
+    if config.get('workers', 1) > 1:
+        from worker_pool import DetectionSupervisor
+
+        supervisor = DetectionSupervisor(str(config_path))
+        try:
+            supervisor.run()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            supervisor.shutdown()
+        return
+
     # Initialize and run the service
     service = AIDetectionService(str(config_path))
+    if service.metrics['enabled']:
+        serve_metrics(REGISTRY, service.metrics['host'], service.metrics['port'])
+        logger.info(f"Serving metrics on http://{service.metrics['host']}:{service.metrics['port']}/metrics")
     
     # Connect to configured cameras
-    for camera_id, rtsp_url in service.config['cameras'].items():
-        service.connect_camera(camera_id, rtsp_url)
+    service.connect_cameras(service.config['cameras'])
 
     try:
         service.run()
     except KeyboardInterrupt:
         logger.info("Shutting down AI detection service")
-        for camera_id in list(service.cameras.keys()):
-            service.disconnect_camera(camera_id)
+        service.shutdown()
 
 if __name__ == '__main__':
     main() 
\ No newline at end of file
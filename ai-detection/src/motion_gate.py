@@ -0,0 +1,94 @@
+import time
+from typing import Optional, Sequence
+
+import cv2
+import numpy as np
+
+class MotionGate:
+    """Cheap frame-differencing pre-filter in front of YOLO inference.
+
+    Each frame is downscaled to `width` pixels wide, converted to grayscale and
+    compared against the last frame that was let through. Inference runs only if
+    at least `min_changed_ratio` of the region-of-interest pixels changed by more
+    than `pixel_threshold`, or if `max_interval` seconds have passed since the
+    last inference.
+
+    `roi` is an optional polygon of [x, y] points in normalized (0..1) frame
+    coordinates; pixels outside it are ignored.
+    """
+
+    def __init__(
+        self,
+        width: int = 160,
+        pixel_threshold: int = 25,
+        min_changed_ratio: float = 0.01,
+        max_interval: float = 30.0,
+        roi: Optional[Sequence[Sequence[float]]] = None,
+    ):
+        self.width = width
+        self.pixel_threshold = pixel_threshold
+        self.min_changed_ratio = min_changed_ratio
+        self.max_interval = max_interval
+        self.roi = roi
+
+        self.frames_checked = 0
+        self.frames_skipped = 0
+        self.last_changed_ratio = 0.0
+
+        self._reference: Optional[np.ndarray] = None
+        self._last_pass = 0.0
+        self._mask: Optional[np.ndarray] = None
+        self._mask_pixels = 0
+
+    @property
+    def skip_ratio(self) -> float:
+        if not self.frames_checked:
+            return 0.0
+        return self.frames_skipped / self.frames_checked
+
+    def _prepare(self, frame: np.ndarray) -> np.ndarray:
+        height = max(1, int(frame.shape[0] * self.width / frame.shape[1]))
+        small = cv2.resize(frame, (self.width, height), interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(small, (5, 5), 0)
+
+    def _build_mask(self, shape) -> None:
+        if self.roi:
+            height, width = shape
+            points = np.array(
+                [[x * (width - 1), y * (height - 1)] for x, y in self.roi], dtype=np.int32
+            )
+            self._mask = np.zeros(shape, dtype=np.uint8)
+            cv2.fillPoly(self._mask, [points], 255)
+        else:
+            self._mask = None
+        self._mask_pixels = (
+            cv2.countNonZero(self._mask) if self._mask is not None else shape[0] * shape[1]
+        )
+
+    def should_process(self, frame: np.ndarray, now: Optional[float] = None) -> bool:
+        """Return True if the frame differs enough to be worth running inference on."""
+        now = now if now is not None else time.time()
+        self.frames_checked += 1
+        small = self._prepare(frame)
+
+        if self._reference is None or self._reference.shape != small.shape:
+            self._build_mask(small.shape)
+            changed = True
+        elif now - self._last_pass >= self.max_interval:
+            changed = True
+        else:
+            diff = cv2.absdiff(small, self._reference)
+            _, moving = cv2.threshold(diff, self.pixel_threshold, 255, cv2.THRESH_BINARY)
+            if self._mask is not None:
+                moving = cv2.bitwise_and(moving, self._mask)
+            self.last_changed_ratio = cv2.countNonZero(moving) / max(self._mask_pixels, 1)
+            changed = self.last_changed_ratio >= self.min_changed_ratio
+
+        if changed:
+            self._reference = small
+            self._last_pass = now
+        else:
+            self.frames_skipped += 1
+        return changed
@@ -0,0 +1,54 @@
+from typing import Dict
+
+from shared.metrics import REGISTRY
+
+# Shared by every stage of the detection pipeline, labelled by stage:
+# capture, decode, preprocess, inference, postprocess, tracking, alert_send,
+# rules, evidence_encode, evidence_write, history, history_write
+STAGE_SECONDS = REGISTRY.histogram('detection_stage_seconds', 'Seconds spent per pipeline stage (sampled)', ['stage'])
+
+def register_camera_metrics(connections, scheduler, cameras: Dict) -> None:
+    """Expose per-camera connection and scheduling state, collected only when scraped.
+
+    `connections` is a CameraSupervisor, `scheduler` a FrameScheduler and
+    `cameras` maps camera ids to CaptureConnectors.
+    """
+    def health(key):
+        return {(camera_id,): stats[key] for camera_id, stats in connections.stats().items()}
+
+    def schedule(key):
+        return {(camera_id,): stats[key] for camera_id, stats in scheduler.stats().items()}
+
+    REGISTRY.gauge('detection_camera_connected', 'Whether the camera is connected', ['camera'],
+                   collect=lambda: {
+                       (camera_id,): stats['state'] == 'connected'
+                       for camera_id, stats in connections.stats().items()
+                   })
+    REGISTRY.gauge('detection_camera_capture_fps', 'Frames per second read from the camera', ['camera'],
+                   collect=lambda: health('fps'))
+    REGISTRY.counter('detection_camera_reconnects_total', 'Successful camera reconnects', ['camera'],
+                     collect=lambda: health('reconnects'))
+    REGISTRY.gauge('detection_camera_inference_fps', 'Inferences per second per camera', ['camera'],
+                   collect=lambda: schedule('fps'))
+    REGISTRY.gauge('detection_camera_lag_seconds', 'Average delay between a camera being due and served',
+                   ['camera'], collect=lambda: {k: v / 1000 for k, v in schedule('lag_ms').items()})
+    REGISTRY.counter('detection_skipped_slots_total', 'Sampling slots dropped because inference fell behind',
+                     ['camera'], collect=lambda: schedule('skipped_slots'))
+    REGISTRY.counter('detection_frames_dropped_total', 'Frames overwritten by a grabber before inference',
+                     ['camera'], collect=lambda: {
+                         (camera_id,): connector.frames_dropped
+                         for camera_id, connector in list(cameras.items()) if connector.threaded
+                     })
+    REGISTRY.gauge('detection_scheduler_overdue', 'Cameras due and waiting for inference',
+                   collect=scheduler.overdue)
+
+def register_evidence_metrics(recorder) -> None:
+    """Expose an EvidenceRecorder's buffer memory and clip outcomes."""
+    REGISTRY.gauge('detection_evidence_buffer_bytes', 'Memory preallocated for pre-event footage',
+                   collect=recorder.memory_bytes)
+    REGISTRY.counter('detection_evidence_clips_total', 'Evidence clips by outcome', ['outcome'],
+                     collect=lambda: {
+                         ('written',): recorder.clips_written,
+                         ('dropped',): recorder.clips_dropped,
+                         ('failed',): recorder.clips_failed,
+                     })
@@ -0,0 +1,532 @@
+import json
+import time
+import logging
+import operator
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from geometry import distance_matrix, iou_matrix, points_in_polygon
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RULES_CONFIG = {
+    'enabled': False,  # when on, only rule hits are alerted instead of every detection
+    'file': None,  # JSON export of AlertRule and/or Workflow records
+    'definitions': [],  # inline rules, same shape as AlertRule records
+    'zones': {},  # area name -> polygon of normalized [x, y] points
+    'pixels_per_meter': None,  # ground-plane calibration; estimated from object heights if unset
+    'object_heights': {'person': 1.7},  # meters, used to estimate scale without calibration
+    'class_aliases': {},  # rule object name -> model class names, e.g. {"hard_hat": ["helmet"]}
+    'cooldown': 30.0,  # seconds before the same rule alerts again on a camera
+    'stationary_iou': 0.9,  # box overlap between samples that counts as not moving (idle_time)
+}
+
+UNIT_TO_METERS = {'m': 1.0, 'ft': 0.3048}
+UNIT_TO_MPS = {'m/s': 1.0, 'km/h': 1 / 3.6, 'mph': 0.44704}
+UNIT_TO_SECONDS = {'seconds': 1.0, 'minutes': 60.0, 'hours': 3600.0}
+ANY = ('any', '*', None)
+
+def _equal(value, threshold):
+    return np.abs(value - threshold) <= 0.05 * np.abs(threshold)
+
+OPERATORS = {
+    '<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge, '=': _equal, '==': _equal,
+}
+
+class FrameContext:
+    """One frame's detections as arrays, with per-frame caches shared by all rules.
+
+    Class masks, zone containment and pairwise matrices are computed at most
+    once per frame, however many rules use them.
+    """
+
+    def __init__(self, detections: List[dict], engine: 'RuleEngine', now: float):
+        self.detections = detections
+        self.engine = engine
+        self.now = now
+        count = len(detections)
+        self.boxes = np.array([det['bbox'] for det in detections], dtype=np.float32).reshape(count, 4)
+        self.classes = np.array([det['class'] for det in detections], dtype=object)
+        self.track_ids = np.array([det.get('track_id', -1) for det in detections], dtype=np.int64)
+        # Ground contact point (bottom centre) is what zones and distances are measured at
+        self.anchors = np.stack([(self.boxes[:, 0] + self.boxes[:, 2]) / 2, self.boxes[:, 3]], axis=1)
+        self._cache: Dict[tuple, np.ndarray] = {}
+
+    def _cached(self, key: tuple, compute: Callable[[], np.ndarray]) -> np.ndarray:
+        value = self._cache.get(key)
+        if value is None:
+            value = self._cache[key] = compute()
+        return value
+
+    def mask(self, name: Optional[str]) -> np.ndarray:
+        if name in ANY:
+            return np.ones(len(self.detections), dtype=bool)
+        names = self.engine.class_aliases.get(name, [name])
+        return self._cached(('class', name), lambda: np.isin(self.classes, names))
+
+    def in_zone(self, zone: str) -> np.ndarray:
+        return self._cached(('zone', zone), lambda: points_in_polygon(self.anchors, self.engine.zone(zone)))
+
+    def select(self, name: Optional[str], zone: Optional[str] = None) -> np.ndarray:
+        """Indices of detections of a class, optionally only those inside a zone."""
+        mask = self.mask(name)
+        if zone:
+            mask = mask & self.in_zone(zone)
+        return np.flatnonzero(mask)
+
+    def meters(self, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        """Ground distance in meters between detections a (rows) and b (columns)."""
+        pixels = distance_matrix(self.anchors[a], self.anchors[b])
+        scale = self.engine.pixels_per_meter
+        if scale:
+            return pixels / scale
+        # Uncalibrated: estimate the local scale from the boxes of known real-world height
+        per_box = self.engine.scale_estimates(self)
+        scale_a, scale_b = per_box[a][:, None], per_box[b][None, :]
+        pair_scale = np.where(np.isnan(scale_a), scale_b,
+                              np.where(np.isnan(scale_b), scale_a, (scale_a + scale_b) / 2))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return pixels / pair_scale
+
+    def iou(self, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        return iou_matrix(self.boxes[a], self.boxes[b])
+
+class Rule:
+    """A compiled rule: a vectorized predicate plus dwell and cooldown handling.
+
+    `predicate(ctx, state)` returns the indices of the detections involved in a
+    hit (empty if the condition doesn't hold) and a measured value for the alert.
+    `scaled_by` names the objects whose known heights stand in for a
+    pixels_per_meter calibration when the rule measures meters.
+    """
+
+    def __init__(self, rule_id: str, name: str, rule_type: str, severity: str,
+                 predicate: Callable, zones: Tuple[str, ...] = (), dwell: float = 0.0,
+                 cooldown: Optional[float] = None, cameras: Optional[List[str]] = None,
+                 scaled_by: Tuple[str, ...] = ()):
+        self.id = rule_id
+        self.name = name
+        self.type = rule_type
+        self.severity = severity
+        self.predicate = predicate
+        self.zones = zones
+        self.dwell = dwell
+        self.cooldown = cooldown
+        self.cameras = set(cameras) if cameras else None
+        self.scaled_by = scaled_by
+
+def _number(condition: dict, key: str, default=None) -> float:
+    value = condition.get(key, default)
+    if value is None:
+        raise ValueError(f"missing '{key}'")
+    return float(value)
+
+def _operator(condition: dict, default: str) -> Callable:
+    op = condition.get('operator', default)
+    if op not in OPERATORS:
+        raise ValueError(f"unsupported operator '{op}'")
+    return OPERATORS[op]
+
+def _pair_hits(hit: np.ndarray, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    rows, cols = np.nonzero(hit)
+    return np.union1d(a[rows], b[cols])
+
+def _paired_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """IoU of a[i] with b[i] for each row."""
+    top_left = np.maximum(a[:, :2], b[:, :2])
+    bottom_right = np.minimum(a[:, 2:], b[:, 2:])
+    inter = np.prod(np.clip(bottom_right - top_left, 0, None), axis=1)
+    union = np.prod(a[:, 2:] - a[:, :2], axis=1) + np.prod(b[:, 2:] - b[:, :2], axis=1) - inter
+    return inter / (union + 1e-9)
+
+def _proximity(condition: dict) -> Tuple[Callable, Tuple[str, ...]]:
+    object1 = condition.get('object1', 'person')
+    object2 = condition.get('object2', 'person')
+    zone = condition.get('area')
+    metric = condition.get('metric', 'distance')
+    if metric == 'iou':
+        op = _operator(condition, '>')
+        threshold = _number(condition, 'threshold')
+    else:
+        op = _operator(condition, '<')
+        unit = condition.get('unit', 'm')
+        if unit not in UNIT_TO_METERS:
+            raise ValueError(f"unsupported distance unit '{unit}'")
+        threshold = _number(condition, 'threshold') * UNIT_TO_METERS[unit]
+
+    def predicate(ctx: FrameContext, state: dict):
+        a, b = ctx.select(object1, zone), ctx.select(object2, zone)
+        if not len(a) or not len(b):
+            return np.empty(0, dtype=np.int64), None
+        key = (metric, object1, object2, zone)
+        matrix = ctx._cached(key, lambda: ctx.iou(a, b) if metric == 'iou' else ctx.meters(a, b))
+        valid = a[:, None] != b[None, :]  # a detection is never near itself
+        with np.errstate(invalid='ignore'):
+            hit = op(matrix, threshold) & valid & ~np.isnan(matrix)
+        if not hit.any():
+            return np.empty(0, dtype=np.int64), None
+        best = matrix[hit].max() if metric == 'iou' else matrix[hit].min()
+        return _pair_hits(hit, a, b), round(float(best), 3)
+
+    return predicate, (zone,) if zone else ()
+
+def _presence(condition: dict, default_object: str, inside: bool = True) -> Tuple[Callable, Tuple[str, ...]]:
+    """Objects inside a zone, or for exits, tracks that were inside last time and aren't now."""
+    object1 = condition.get('object1', default_object)
+    zone = condition.get('area')
+    if not zone:
+        raise ValueError("missing 'area'")
+
+    def predicate(ctx: FrameContext, state: dict):
+        candidates = ctx.select(object1)
+        inside_now = ctx.in_zone(zone)[candidates]
+        if inside:
+            hits = candidates[inside_now]
+        else:
+            # Untracked detections (id -1) can't be told apart from people who were never inside
+            was_inside = state.setdefault('inside', set())
+            ids = ctx.track_ids[candidates]
+            left = np.array([tid >= 0 and tid in was_inside for tid in ids], dtype=bool) & ~inside_now
+            state['inside'] = set(ids[inside_now & (ids >= 0)].tolist())
+            hits = candidates[left]
+        return hits, len(hits) if len(hits) else None
+
+    return predicate, (zone,)
+
+def _crowd(condition: dict) -> Tuple[Callable, Tuple[str, ...]]:
+    object1 = condition.get('object1', 'person')
+    zone = condition.get('area')
+    op = _operator(condition, '>')
+    threshold = _number(condition, 'max_count', condition.get('threshold'))
+
+    def predicate(ctx: FrameContext, state: dict):
+        members = ctx.select(object1, zone)
+        if op(len(members), threshold):
+            return members, len(members)
+        return np.empty(0, dtype=np.int64), None
+
+    return predicate, (zone,) if zone else ()
+
+def _ppe(condition: dict) -> Tuple[Callable, Tuple[str, ...]]:
+    """People (in a zone) with no PPE box of the required type centred inside their box."""
+    ppe = condition.get('ppe_type')
+    if not ppe:
+        raise ValueError("missing 'ppe_type'")
+    wearer = condition.get('object1', 'person')
+    zone = condition.get('area')
+
+    def predicate(ctx: FrameContext, state: dict):
+        people = ctx.select(wearer, zone)
+        if not len(people):
+            return np.empty(0, dtype=np.int64), None
+        gear = ctx.select(ppe)
+        boxes = ctx.boxes[people]
+        centres = (ctx.boxes[gear, :2] + ctx.boxes[gear, 2:]) / 2
+        worn = (
+            (centres[None, :, 0] >= boxes[:, None, 0]) & (centres[None, :, 0] <= boxes[:, None, 2])
+            & (centres[None, :, 1] >= boxes[:, None, 1]) & (centres[None, :, 1] <= boxes[:, None, 3])
+        ).any(axis=1) if len(gear) else np.zeros(len(people), dtype=bool)
+        hits = people[~worn]
+        return hits, len(hits) if len(hits) else None
+
+    return predicate, (zone,) if zone else ()
+
+def _equipment_usage(condition: dict) -> Tuple[Callable, Tuple[str, ...]]:
+    """People whose box overlaps the equipment's (operator qualification isn't visible)."""
+    equipment = condition.get('equipment')
+    if not equipment:
+        raise ValueError("missing 'equipment'")
+    user = condition.get('object1', 'person')
+
+    def predicate(ctx: FrameContext, state: dict):
+        people, machines = ctx.select(user), ctx.select(equipment)
+        if not len(people) or not len(machines):
+            return np.empty(0, dtype=np.int64), None
+        overlap = ctx._cached(('iou', user, equipment, None), lambda: ctx.iou(people, machines))
+        hit = overlap > 0
+        return _pair_hits(hit, people, machines), None
+
+    return predicate, ()
+
+def _previous_match(ctx: FrameContext, state: dict, selected: np.ndarray):
+    """For each selected detection, its position last sample and the seconds since.
+
+    Matches by track id when the tracker is on, otherwise to the nearest
+    detection of the same class last time. Returns (previous anchors, previous
+    boxes, matched mask, dt).
+    """
+    previous = state.get('previous')
+    state['previous'] = (ctx.now, ctx.anchors[selected], ctx.boxes[selected],
+                         ctx.track_ids[selected], ctx.classes[selected])
+    count = len(selected)
+    if previous is None or not count or not len(previous[1]):
+        return np.zeros((count, 2)), np.zeros((count, 4)), np.zeros(count, dtype=bool), 0.0
+    then, anchors, boxes, track_ids, classes = previous
+    ids = ctx.track_ids[selected]
+    if (ids >= 0).all() and (track_ids >= 0).all():
+        same = ids[:, None] == track_ids[None, :]
+    else:
+        same = ctx.classes[selected][:, None] == classes[None, :]
+    distances = np.where(same, distance_matrix(ctx.anchors[selected], anchors), np.inf)
+    nearest = distances.argmin(axis=1)
+    matched = np.isfinite(distances[np.arange(count), nearest])
+    return anchors[nearest], boxes[nearest], matched, ctx.now - then
+
+def _speed(condition: dict) -> Tuple[Callable, Tuple[str, ...]]:
+    object1 = condition.get('object1', 'forklift')
+    zone = condition.get('area')
+    op = _operator(condition, '>')
+    unit = condition.get('unit', 'km/h')
+    if unit not in UNIT_TO_MPS:
+        raise ValueError(f"unsupported speed unit '{unit}'")
+    threshold = _number(condition, 'threshold') * UNIT_TO_MPS[unit]
+
+    def predicate(ctx: FrameContext, state: dict):
+        selected = ctx.select(object1, zone)
+        anchors, _, matched, dt = _previous_match(ctx, state, selected)
+        if dt <= 0 or not matched.any():
+            return np.empty(0, dtype=np.int64), None
+        pixels = np.linalg.norm(ctx.anchors[selected] - anchors, axis=1)
+        scale = ctx.engine.pixels_per_meter or ctx.engine.scale_estimates(ctx)[selected]
+        with np.errstate(invalid='ignore'):
+            speeds = pixels / scale / dt
+            hit = matched & op(speeds, threshold) & ~np.isnan(speeds)
+        if not hit.any():
+            return np.empty(0, dtype=np.int64), None
+        return selected[hit], round(float(speeds[hit].max() / UNIT_TO_MPS[unit]), 2)
+
+    return predicate, (zone,) if zone else ()
+
+def _idle(condition: dict, stationary_iou: float) -> Tuple[Callable, Tuple[str, ...]]:
+    """Equipment that hasn't moved between samples; the duration becomes the rule's dwell."""
+    equipment = condition.get('equipment', condition.get('object1'))
+    if not equipment:
+        raise ValueError("missing 'equipment'")
+
+    def predicate(ctx: FrameContext, state: dict):
+        selected = ctx.select(equipment)
+        _, boxes, matched, _ = _previous_match(ctx, state, selected)
+        if not matched.any():
+            return np.empty(0, dtype=np.int64), None
+        overlap = _paired_iou(ctx.boxes[selected], boxes)
+        hits = selected[matched & (overlap >= stationary_iou)]
+        return hits, len(hits) if len(hits) else None
+
+    return predicate, ()
+
+def _normalize(definition: dict) -> Tuple[str, dict]:
+    """Rule type and flat condition from an AlertRule, workflow rule or builder condition."""
+    condition = dict(definition.get('condition') or definition.get('config') or {})
+    rule_type = definition.get('type') or condition.pop('type', None)
+    # The workflow canvas saves {"type": ..., "parameters": {"distance": ..., "speed": ...}}
+    parameters = condition.pop('parameters', None)
+    if isinstance(parameters, dict):
+        if rule_type == 'proximity' and 'distance' in parameters:
+            condition.setdefault('threshold', parameters['distance'])
+        condition = {**parameters, **condition}
+    condition.pop('type', None)
+    return rule_type, condition
+
+def compile_rule(definition: dict, stationary_iou: float = 0.9, tracking: bool = False) -> Rule:
+    """Compile one rule definition; raises ValueError if it can't be evaluated on detections.
+
+    `tracking` says whether detections will carry track ids, which area_exit needs.
+    """
+    rule_type, condition = _normalize(definition)
+    scaled_by = ()
+    if rule_type == 'proximity':
+        if condition.get('object2') == 'wall':
+            raise ValueError("walls are not detected objects")
+        predicate, zones = _proximity(condition)
+        if condition.get('metric', 'distance') != 'iou':
+            scaled_by = (condition.get('object1', 'person'), condition.get('object2', 'person'))
+    elif rule_type in ('area_entry', 'safety_zone', 'unauthorized_access'):
+        predicate, zones = _presence(condition, 'person')
+    elif rule_type == 'area_exit':
+        if not tracking:
+            raise ValueError("area_exit needs tracking enabled to know who was inside")
+        predicate, zones = _presence(condition, 'person', inside=False)
+    elif rule_type in ('crowd_density', 'count'):
+        predicate, zones = _crowd(condition)
+    elif rule_type == 'ppe_detection':
+        predicate, zones = _ppe(condition)
+    elif rule_type == 'equipment_usage':
+        predicate, zones = _equipment_usage(condition)
+    elif rule_type == 'speed':
+        predicate, zones = _speed(condition)
+        scaled_by = (condition.get('object1', 'forklift'),)
+    elif rule_type == 'idle_time':
+        predicate, zones = _idle(condition, stationary_iou)
+    else:
+        raise ValueError(f"unsupported rule type '{rule_type}'")
+
+    dwell = float(condition.get('dwell', 0.0))
+    if rule_type == 'idle_time':
+        unit = condition.get('unit', 'minutes')
+        if unit not in UNIT_TO_SECONDS:
+            raise ValueError(f"unsupported duration unit '{unit}'")
+        dwell = _number(condition, 'duration') * UNIT_TO_SECONDS[unit]
+
+    cooldown = condition.get('cooldown')
+    return Rule(
+        rule_id=str(definition.get('id') or definition.get('name') or rule_type),
+        name=definition.get('name') or condition.get('name') or rule_type,
+        rule_type=rule_type,
+        severity=definition.get('severity') or condition.get('severity') or 'MEDIUM',
+        predicate=predicate,
+        zones=zones,
+        dwell=dwell,
+        cooldown=float(cooldown) if cooldown is not None else None,
+        cameras=definition.get('cameras') or condition.get('cameras'),
+        scaled_by=scaled_by,
+    )
+
+def load_definitions(data) -> List[dict]:
+    """Flatten exported AlertRule and Workflow records into rule definitions.
+
+    Accepts a list of records or an object with 'alertRules' / 'workflows' /
+    'rules' lists. Inactive rules and disabled workflows are left out.
+    """
+    if isinstance(data, dict):
+        records = data.get('alertRules', []) + data.get('workflows', []) + data.get('rules', [])
+    else:
+        records = list(data)
+
+    definitions = []
+    for record in records:
+        if 'nodes' in record and 'rules' in record:
+            if not record.get('enabled', True):
+                continue
+            rules = record['rules']
+            if isinstance(rules, str):
+                rules = json.loads(rules)
+            definitions.extend(
+                {'id': f"{record.get('id', 'workflow')}:{i}", 'workflow': record.get('name'), **rule}
+                for i, rule in enumerate(rules)
+            )
+        elif record.get('isActive', record.get('enabled', True)):
+            definitions.append(record)
+    return definitions
+
+def compile_rules(definitions: List[dict], stationary_iou: float = 0.9, tracking: bool = False) -> List[Rule]:
+    """Compile every definition that can run on detections; the rest are logged and skipped."""
+    rules = []
+    for definition in definitions:
+        try:
+            rules.append(compile_rule(definition, stationary_iou, tracking))
+        except (ValueError, TypeError) as e:
+            logger.warning(f"Skipping rule {definition.get('name') or definition.get('id')!r}: {e}")
+    logger.info(f"Compiled {len(rules)}/{len(definitions)} detection rules")
+    return rules
+
+class RuleEngine:
+    """Evaluates compiled rules over each frame's detections for one camera.
+
+    All detections of a frame become arrays once; rules then test class-to-class
+    distance or IoU matrices, zone containment, counts and motion between
+    samples on those arrays. A rule hits only after its condition has held for
+    its dwell time, and then not again until its cooldown has passed. Rules
+    whose zones aren't defined for this camera are left out, as are rules that
+    measure meters on a camera with neither a pixels_per_meter calibration nor
+    a known height for any of their objects.
+    """
+
+    def __init__(
+        self,
+        rules: List[Rule],
+        camera_id: str,
+        zones: Optional[Dict[str, list]] = None,
+        pixels_per_meter: Optional[float] = None,
+        object_heights: Optional[Dict[str, float]] = None,
+        class_aliases: Optional[Dict[str, List[str]]] = None,
+        cooldown: float = 30.0,
+    ):
+        zones = zones or {}
+        self.camera_id = camera_id
+        self.zones = {name: np.asarray(points, dtype=np.float32) for name, points in zones.items()}
+        self.pixels_per_meter = pixels_per_meter
+        self.object_heights = object_heights if object_heights is not None else DEFAULT_RULES_CONFIG['object_heights']
+        self.class_aliases = {name: list(aliases) for name, aliases in (class_aliases or {}).items()}
+        self.rules = []
+        for rule in rules:
+            if rule.cameras is not None and camera_id not in rule.cameras:
+                continue
+            missing = [zone for zone in rule.zones if zone not in zones]
+            if missing:
+                logger.warning(f"Rule {rule.name!r} disabled on camera {camera_id}: no zone {', '.join(missing)}")
+                continue
+            if rule.scaled_by and not pixels_per_meter and not any(map(self._has_height, rule.scaled_by)):
+                logger.warning(
+                    f"Rule {rule.name!r} disabled on camera {camera_id}: set pixels_per_meter, or "
+                    f"object_heights for {' or '.join(rule.scaled_by)}, to measure meters"
+                )
+                continue
+            self.rules.append(rule)
+        self.cooldown = cooldown
+        self.frame_size = None
+        self._zones_px: Dict[str, np.ndarray] = {}
+        self._state: Dict[str, dict] = {rule.id: {} for rule in self.rules}
+        self._since: Dict[str, float] = {}
+        self._last_hit: Dict[str, float] = {}
+        self.hits = {rule.id: 0 for rule in self.rules}
+
+    def _has_height(self, name: Optional[str]) -> bool:
+        """Whether detections of a rule object can be scaled by a known height."""
+        if name in ANY:
+            return bool(self.object_heights)
+        return any(cls in self.object_heights for cls in self.class_aliases.get(name, [name]))
+
+    def zone(self, name: str) -> np.ndarray:
+        """A zone polygon in pixels for the current frame size."""
+        polygon = self._zones_px.get(name)
+        if polygon is None:
+            width, height = self.frame_size
+            polygon = self._zones_px[name] = self.zones[name] * np.array([width, height], dtype=np.float32)
+        return polygon
+
+    def scale_estimates(self, ctx: FrameContext) -> np.ndarray:
+        """Pixels per meter at each detection, from classes with a known height (NaN otherwise)."""
+        def estimate():
+            heights = np.array([self.object_heights.get(cls, np.nan) for cls in ctx.classes], dtype=np.float32)
+            return (ctx.boxes[:, 3] - ctx.boxes[:, 1]) / heights
+        return ctx._cached(('scale',), estimate)
+
+    def evaluate(self, detections: List[dict], frame_size: Optional[Tuple[int, int]] = None,
+                 now: Optional[float] = None) -> List[dict]:
+        """Run every rule over one frame's detections; returns the rules that hit.
+
+        Each hit lists the indices of the detections involved. Call this for
+        frames without detections too, so dwell timers reset.
+        """
+        now = now if now is not None else time.time()
+        if frame_size is not None and frame_size != self.frame_size:
+            self.frame_size = frame_size
+            self._zones_px.clear()
+        if self.frame_size is None:
+            return []
+
+        ctx = FrameContext(detections, self, now)
+        hits = []
+        for rule in self.rules:
+            involved, value = rule.predicate(ctx, self._state[rule.id])
+            if not len(involved):
+                self._since.pop(rule.id, None)
+                continue
+            since = self._since.setdefault(rule.id, now)
+            if now - since < rule.dwell:
+                continue
+            cooldown = rule.cooldown if rule.cooldown is not None else self.cooldown
+            if now - self._last_hit.get(rule.id, -np.inf) < cooldown:
+                continue
+            self._last_hit[rule.id] = now
+            self.hits[rule.id] += 1
+            hits.append({
+                'rule_id': rule.id,
+                'name': rule.name,
+                'type': rule.type,
+                'severity': rule.severity,
+                'value': value,
+                'detections': [int(i) for i in involved],
+            })
+        return hits
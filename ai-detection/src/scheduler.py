@@ -0,0 +1,216 @@
+import time
+import heapq
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SCHEDULING_CONFIG = {
+    'fps': 2.0,  # target inferences per second per camera
+    'priority': 1.0,  # share of inference capacity under overload, relative to other cameras
+    'alert_cooldown': 5.0,  # seconds a camera rests after an alert (ignored while tracking)
+    'retry_delay': 0.1,  # seconds before retrying a camera that had no frame ready
+    'lag_warning': 2.0,  # log a warning when a camera's average lag exceeds this many seconds
+}
+
+class CameraSchedule:
+    """Sampling rate, priority and lag statistics for one camera."""
+
+    def __init__(self, interval: float, priority: float):
+        self.interval = interval
+        self.priority = priority
+        self.due = 0.0
+        self.last_served = time.time()
+        self.version = 0
+        self.served = 0
+        self.skipped_slots = 0
+        self.lag = 0.0  # moving average of seconds between due time and service
+        self.max_lag = 0.0
+        self._window_start = time.time()
+        self._window_served = 0
+        self.fps = 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            'target_fps': round(1 / self.interval, 2),
+            'fps': round(self.fps, 2),
+            'priority': self.priority,
+            'lag_ms': round(self.lag * 1000, 1),
+            'max_lag_ms': round(self.max_lag * 1000, 1),
+            'served': self.served,
+            'skipped_slots': self.skipped_slots,
+        }
+
+class FrameScheduler:
+    """Decides which camera to run next, by next-due time.
+
+    Cameras that are not due yet wait in a heap keyed by due time, and `next()`
+    sleeps until the earliest one is due instead of polling. When several
+    cameras are overdue (inference can't keep up), the one with the highest
+    `priority * (time since last served) / interval` goes first. That shares
+    capacity in proportion to each camera's rate times its priority, and no
+    camera runs faster than its own rate. A camera that falls more than a slot
+    behind drops the missed slots instead of catching up on them, so overload
+    lowers the effective rate instead of growing a backlog. Missed slots and
+    lag are reported per camera.
+
+    Every camera returned by `next()` must be handed back with `complete()` or
+    `retry()`.
+    """
+
+    def __init__(self, retry_delay: float = 0.1, lag_warning: float = 2.0, report_window: float = 30.0):
+        self.retry_delay = retry_delay
+        self.lag_warning = lag_warning
+        self.report_window = report_window
+        self.cameras: Dict[str, CameraSchedule] = {}
+        self._heap: List[Tuple[float, int, str]] = []
+        self._ready: Dict[str, float] = {}
+        self._cond = threading.Condition()
+
+    def add(self, camera_id: str, fps: float, priority: float = 1.0, start: Optional[float] = None) -> None:
+        """Register a camera; it is first due at `start` (default: now)."""
+        with self._cond:
+            self.cameras[camera_id] = CameraSchedule(1.0 / fps, priority)
+            self._push(camera_id, start if start is not None else time.time())
+            self._cond.notify()
+
+    def remove(self, camera_id: str) -> None:
+        with self._cond:
+            self.cameras.pop(camera_id, None)
+            self._ready.pop(camera_id, None)
+
+    def _push(self, camera_id: str, due: float) -> None:
+        schedule = self.cameras[camera_id]
+        schedule.due = due
+        schedule.version += 1
+        heapq.heappush(self._heap, (due, schedule.version, camera_id))
+
+    def _promote(self, now: float) -> None:
+        """Move cameras that are due from the heap to the ready set."""
+        while self._heap and self._heap[0][0] <= now:
+            due, version, camera_id = heapq.heappop(self._heap)
+            schedule = self.cameras.get(camera_id)
+            if schedule is not None and schedule.version == version:
+                self._ready[camera_id] = due
+
+    def _pick(self, now: float) -> str:
+        def urgency(camera_id: str) -> float:
+            schedule = self.cameras[camera_id]
+            return schedule.priority * (now - schedule.last_served) / schedule.interval
+        camera_id = max(self._ready, key=urgency)
+        del self._ready[camera_id]
+        return camera_id
+
+    def next(self, timeout: Optional[float] = None) -> Optional[str]:
+        """Block until a camera is due and return it; None if `timeout` passes first."""
+        deadline = time.time() + timeout if timeout is not None else None
+        with self._cond:
+            while True:
+                now = time.time()
+                self._promote(now)
+                if self._ready:
+                    return self._pick(now)
+
+                wait = self._heap[0][0] - now if self._heap else None
+                if deadline is not None:
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        return None
+                    wait = remaining if wait is None else min(wait, remaining)
+                self._cond.wait(wait)
+
+    def until_next(self) -> Optional[float]:
+        """Seconds until the earliest camera is due (0 if one already is), None if idle."""
+        with self._cond:
+            if self._ready:
+                return 0.0
+            if not self._heap:
+                return None
+            return max(0.0, self._heap[0][0] - time.time())
+
+    def overdue(self) -> int:
+        """Cameras that are due but waiting for inference capacity."""
+        now = time.time()
+        with self._cond:
+            waiting = sum(
+                1 for due, version, camera_id in self._heap
+                if due <= now and camera_id in self.cameras and self.cameras[camera_id].version == version
+            )
+            return len(self._ready) + waiting
+
+    def complete(self, camera_id: str, now: Optional[float] = None) -> None:
+        """Record that a camera was served and schedule its next slot."""
+        now = now if now is not None else time.time()
+        with self._cond:
+            schedule = self.cameras.get(camera_id)
+            if schedule is None:
+                return
+            lag = max(0.0, now - schedule.due)
+            schedule.last_served = now
+            schedule.served += 1
+            schedule.lag = lag if schedule.served == 1 else 0.9 * schedule.lag + 0.1 * lag
+            schedule.max_lag = max(schedule.max_lag, lag)
+            self._update_fps(schedule, now)
+
+            next_due = schedule.due + schedule.interval
+            if next_due < now:
+                # Already late for the next slot too: drop the missed slots instead of
+                # queueing them up, and compete for the next free inference right away
+                schedule.skipped_slots += int((now - schedule.due) / schedule.interval)
+                next_due = now
+            self._push(camera_id, next_due)
+
+    def _update_fps(self, schedule: CameraSchedule, now: float) -> None:
+        schedule._window_served += 1
+        elapsed = now - schedule._window_start
+        if elapsed >= self.report_window:
+            schedule.fps = schedule._window_served / elapsed
+            schedule._window_served = 0
+            schedule._window_start = now
+
+    def retry(self, camera_id: str, delay: Optional[float] = None) -> None:
+        """Hand a camera back unserved (no frame ready); it is tried again shortly.
+
+        Waiting for a frame is not counted as lag; lag measures only the wait
+        for inference capacity.
+        """
+        with self._cond:
+            schedule = self.cameras.get(camera_id)
+            if schedule is None:
+                return
+            delay = min(delay if delay is not None else self.retry_delay, schedule.interval)
+            self._push(camera_id, time.time() + delay)
+            self._cond.notify()
+
+    def hold(self, camera_id: str, until: float) -> None:
+        """Don't run a camera again before `until` (e.g. an alert cooldown)."""
+        with self._cond:
+            schedule = self.cameras.get(camera_id)
+            if schedule is None or camera_id in self._ready or schedule.due >= until:
+                return
+            self._push(camera_id, until)
+
+    def stats(self) -> Dict[str, dict]:
+        """Per-camera target and achieved rate, lag and skipped slots."""
+        with self._cond:
+            return {camera_id: schedule.to_dict() for camera_id, schedule in self.cameras.items()}
+
+    def summary(self) -> str:
+        with self._cond:
+            if not self.cameras:
+                return "Scheduler: no cameras"
+            worst_id, worst = max(self.cameras.items(), key=lambda item: item[1].lag)
+            avg_lag = sum(s.lag for s in self.cameras.values()) / len(self.cameras)
+            skipped = sum(s.skipped_slots for s in self.cameras.values())
+            overloaded = worst.lag > self.lag_warning
+            # max_lag covers one report window
+            for schedule in self.cameras.values():
+                schedule.max_lag = 0.0
+        message = (
+            f"Scheduler: avg lag {avg_lag * 1000:.0f} ms, worst {worst_id} "
+            f"{worst.lag * 1000:.0f} ms, {skipped} slots skipped"
+        )
+        if overloaded:
+            logger.warning(f"Inference is falling behind the configured camera rates. {message}")
+        return message
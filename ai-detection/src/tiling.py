@@ -0,0 +1,96 @@
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from geometry import nms
+
+class TilePlan:
+    """Region-of-interest crop and overlapping tile layout for one camera geometry.
+
+    The layout and the tile buffers are computed once per frame shape and reused
+    for every frame. `roi` is [x1, y1, x2, y2] in normalized (0..1) coordinates.
+    With `tile_size` set, the ROI is cut into overlapping tiles of at most that
+    size, SAHI-style. With `full_frame` the whole ROI is also run as one extra
+    input, so objects larger than a tile are still found.
+    """
+
+    def __init__(
+        self,
+        frame_shape: Tuple[int, ...],
+        roi: Optional[Sequence[float]] = None,
+        tile_size: Optional[int] = None,
+        overlap: float = 0.2,
+        full_frame: bool = True,
+        nms_iou: float = 0.5,
+    ):
+        self.frame_shape = frame_shape
+        self.nms_iou = nms_iou
+        height, width = frame_shape[:2]
+        x1, y1, x2, y2 = roi or (0.0, 0.0, 1.0, 1.0)
+        self.roi = (int(x1 * width), int(y1 * height), int(x2 * width), int(y2 * height))
+
+        roi_width = self.roi[2] - self.roi[0]
+        roi_height = self.roi[3] - self.roi[1]
+        self.origins: List[Tuple[int, int, int, int]] = []
+        if tile_size and (roi_width > tile_size or roi_height > tile_size):
+            for ty in self._starts(roi_height, tile_size, overlap):
+                for tx in self._starts(roi_width, tile_size, overlap):
+                    tw, th = min(tile_size, roi_width), min(tile_size, roi_height)
+                    self.origins.append((self.roi[0] + tx, self.roi[1] + ty, tw, th))
+            self.full_frame = full_frame
+        else:
+            self.full_frame = True
+
+        # Preallocated tile buffers, refilled in place on every frame
+        channels = frame_shape[2:] if len(frame_shape) > 2 else ()
+        self.buffers = [np.empty((th, tw) + channels, dtype=np.uint8) for _, _, tw, th in self.origins]
+
+    @staticmethod
+    def _starts(length: int, tile: int, overlap: float) -> List[int]:
+        if length <= tile:
+            return [0]
+        step = max(1, int(tile * (1 - overlap)))
+        starts = list(range(0, length - tile, step))
+        starts.append(length - tile)
+        return starts
+
+    @property
+    def num_inputs(self) -> int:
+        return len(self.origins) + (1 if self.full_frame else 0)
+
+    def inputs(self, frame: np.ndarray) -> List[np.ndarray]:
+        """Cut a frame into the model inputs for this plan."""
+        inputs = []
+        for buffer, (x, y, w, h) in zip(self.buffers, self.origins):
+            np.copyto(buffer, frame[y:y + h, x:x + w])
+            inputs.append(buffer)
+        if self.full_frame:
+            x1, y1, x2, y2 = self.roi
+            inputs.append(frame[y1:y2, x1:x2])
+        return inputs
+
+    def offsets(self) -> List[Tuple[int, int]]:
+        offsets = [(x, y) for x, y, _, _ in self.origins]
+        if self.full_frame:
+            offsets.append((self.roi[0], self.roi[1]))
+        return offsets
+
+    def merge(self, per_input: List[List[dict]]) -> List[dict]:
+        """Map per-input detections back to frame coordinates and merge overlaps with class-wise NMS."""
+        merged = []
+        for detections, (dx, dy) in zip(per_input, self.offsets()):
+            for det in detections:
+                x1, y1, x2, y2 = det['bbox']
+                merged.append({**det, 'bbox': [x1 + dx, y1 + dy, x2 + dx, y2 + dy]})
+
+        if self.num_inputs <= 1 or len(merged) <= 1:
+            return merged
+
+        keep = []
+        classes = np.array([det['class'] for det in merged])
+        boxes = np.array([det['bbox'] for det in merged], dtype=np.float32)
+        scores = np.array([det['confidence'] for det in merged], dtype=np.float32)
+        for cls in np.unique(classes):
+            idx = np.nonzero(classes == cls)[0]
+            keep.extend(idx[k] for k in nms(boxes[idx], scores[idx], self.nms_iou))
+        return [merged[i] for i in sorted(keep)]
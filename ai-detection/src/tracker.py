@@ -0,0 +1,161 @@
+import time
+import itertools
+from typing import List, Optional
+
+import numpy as np
+
+from geometry import greedy_match, iou_matrix
+
+class KalmanBoxFilter:
+    """Constant-velocity Kalman filter over a box's [cx, cy, w, h] and their velocities.
+
+    Time steps are in seconds, so cameras sampled at irregular intervals still
+    get sensible motion predictions.
+    """
+
+    def __init__(self, bbox: List[float]):
+        x1, y1, x2, y2 = bbox
+        self.x = np.array([(x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1, 0, 0, 0, 0], dtype=np.float64)
+        self.P = np.diag([10, 10, 10, 10, 1e3, 1e3, 1e3, 1e3]).astype(np.float64)
+        self.R = np.diag([1, 1, 10, 10]).astype(np.float64)
+        self.H = np.eye(4, 8)
+
+    def predict(self, dt: float) -> None:
+        F = np.eye(8)
+        F[:4, 4:] = np.eye(4) * dt
+        # Process noise grows with the time since the last update
+        Q = np.diag([1, 1, 1, 1, 10, 10, 1, 1]) * max(dt, 1e-3)
+        self.x = F @ self.x
+        self.x[2:4] = np.maximum(self.x[2:4], 1.0)
+        self.P = F @ self.P @ F.T + Q
+
+    def update(self, bbox: List[float]) -> None:
+        x1, y1, x2, y2 = bbox
+        z = np.array([(x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1])
+        S = self.H @ self.P @ self.H.T + self.R
+        K = self.P @ self.H.T @ np.linalg.inv(S)
+        self.x = self.x + K @ (z - self.H @ self.x)
+        self.P = (np.eye(8) - K @ self.H) @ self.P
+
+    @property
+    def bbox(self) -> List[float]:
+        cx, cy, w, h = self.x[:4]
+        return [float(cx - w / 2), float(cy - h / 2), float(cx + w / 2), float(cy + h / 2)]
+
+class Track:
+    """One tracked object of a single class."""
+
+    def __init__(self, track_id: int, detection: dict, now: float):
+        self.track_id = track_id
+        self.class_name = detection['class']
+        self.confidence = detection['confidence']
+        self.filter = KalmanBoxFilter(detection['bbox'])
+        self.hits = 1
+        self.first_seen = now
+        self.last_seen = now
+        self.last_predicted = now
+        self.alerted = False
+
+    @property
+    def bbox(self) -> List[float]:
+        return self.filter.bbox
+
+    def predict(self, now: float) -> None:
+        self.filter.predict(now - self.last_predicted)
+        self.last_predicted = now
+
+    def update(self, detection: dict, now: float) -> None:
+        self.filter.update(detection['bbox'])
+        self.confidence = detection['confidence']
+        self.hits += 1
+        self.last_seen = now
+
+    def to_dict(self) -> dict:
+        return {
+            'track_id': self.track_id,
+            'class': self.class_name,
+            'confidence': self.confidence,
+            'bbox': self.bbox,
+            'first_seen': self.first_seen,
+            'last_seen': self.last_seen,
+        }
+
+class MultiObjectTracker:
+    """Lightweight ByteTrack-style tracker for one camera.
+
+    Detections are associated with predicted track boxes by IoU, within the same
+    class, in two stages. High-confidence detections are matched first and may
+    start new tracks. Low-confidence ones only keep existing tracks alive. A
+    track is confirmed after `min_hits` matches and dropped after `max_lost`
+    seconds without one.
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(
+        self,
+        iou_threshold: float = 0.3,
+        high_confidence: float = 0.6,
+        min_hits: int = 2,
+        max_lost: float = 10.0,
+    ):
+        self.iou_threshold = iou_threshold
+        self.high_confidence = high_confidence
+        self.min_hits = min_hits
+        self.max_lost = max_lost
+        self.tracks: List[Track] = []
+
+    def predict(self, now: Optional[float] = None) -> List[Track]:
+        """Advance all tracks to `now` without new detections."""
+        now = now if now is not None else time.time()
+        for track in self.tracks:
+            track.predict(now)
+        return self.tracks
+
+    def _associate(self, tracks: List[Track], detections: List[dict]):
+        """IoU-match tracks to detections, refusing matches across classes."""
+        if not tracks or not detections:
+            return [], list(range(len(tracks))), list(range(len(detections)))
+        track_boxes = np.array([track.bbox for track in tracks], dtype=np.float32)
+        det_boxes = np.array([det['bbox'] for det in detections], dtype=np.float32)
+        scores = iou_matrix(track_boxes, det_boxes)
+        track_classes = np.array([track.class_name for track in tracks])
+        det_classes = np.array([det['class'] for det in detections])
+        scores[track_classes[:, None] != det_classes[None, :]] = 0
+        return greedy_match(scores, self.iou_threshold)
+
+    def update(self, detections: List[dict], now: Optional[float] = None) -> List[Track]:
+        """Update tracks with a frame's detections and return the tracks that are newly confirmed.
+
+        Each detection dict gets a 'track_id' key when it is matched to a track.
+        """
+        now = now if now is not None else time.time()
+        self.predict(now)
+
+        high = [det for det in detections if det['confidence'] >= self.high_confidence]
+        low = [det for det in detections if det['confidence'] < self.high_confidence]
+
+        matches, unmatched_tracks, unmatched_high = self._associate(self.tracks, high)
+        for t, d in matches:
+            self.tracks[t].update(high[d], now)
+            high[d]['track_id'] = self.tracks[t].track_id
+
+        remaining = [self.tracks[t] for t in unmatched_tracks]
+        matches, _, _ = self._associate(remaining, low)
+        for t, d in matches:
+            remaining[t].update(low[d], now)
+            low[d]['track_id'] = remaining[t].track_id
+
+        for d in unmatched_high:
+            track = Track(next(self._ids), high[d], now)
+            high[d]['track_id'] = track.track_id
+            self.tracks.append(track)
+
+        self.tracks = [track for track in self.tracks if now - track.last_seen <= self.max_lost]
+
+        confirmed = []
+        for track in self.tracks:
+            if not track.alerted and track.hits >= self.min_hits and track.last_seen == now:
+                track.alerted = True
+                confirmed.append(track)
+        return confirmed
@@ -0,0 +1,422 @@
+import os
+import json
+import time
+import queue
+import logging
+import multiprocessing as mp
+from functools import partial
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from camera_supervisor import CameraSupervisor, DEFAULT_SUPERVISOR_CONFIG
+from capture import CaptureConnector, DEFAULT_DECODE_OPTIONS
+from evidence import EvidenceRecorder, DEFAULT_EVIDENCE_CONFIG
+from shared.metrics import REGISTRY, serve as serve_metrics
+from pipeline_metrics import register_camera_metrics, register_evidence_metrics
+from scheduler import FrameScheduler, DEFAULT_SCHEDULING_CONFIG
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKER_RESTART_CONFIG = {
+    'backoff': 1.0,  # seconds before a crashed worker is replaced, doubled per fast failure
+    'max_backoff': 60.0,
+    'min_uptime': 60.0,  # a worker that dies sooner counts as a fast failure
+    'max_fast_failures': 5,  # in a row, before its slot is no longer respawned
+}
+
+WORKER_SECONDS = REGISTRY.histogram(
+    'detection_worker_task_seconds', 'Seconds a worker spent on one frame, motion gate to alert', ['worker']
+)
+
+def shard_cameras(camera_ids: List[str], worker_ids: List[int]) -> Dict[str, int]:
+    """Assign cameras to workers round-robin."""
+    return {
+        camera_id: worker_ids[i % len(worker_ids)]
+        for i, camera_id in enumerate(sorted(camera_ids))
+    }
+
+class SharedFrameSlot:
+    """Single-frame shared-memory buffer for one camera.
+
+    The supervisor writes a frame and hands the worker only the slot name, shape
+    and dtype. It does not write again until the worker has reported back, so
+    the worker can read the buffer in place without copying or locking.
+    """
+
+    def __init__(self, camera_id: str):
+        self.camera_id = camera_id
+        self.shm: Optional[shared_memory.SharedMemory] = None
+        self.shape: Tuple[int, ...] = ()
+        self.dtype = np.dtype(np.uint8)
+
+    def write(self, frame: np.ndarray) -> Tuple[str, Tuple[int, ...], str]:
+        if self.shm is None or frame.shape != self.shape or frame.dtype != self.dtype:
+            self.close()
+            self.shm = shared_memory.SharedMemory(create=True, size=frame.nbytes)
+            self.shape = frame.shape
+            self.dtype = frame.dtype
+
+        np.ndarray(self.shape, dtype=self.dtype, buffer=self.shm.buf)[...] = frame
+        return self.shm.name, self.shape, self.dtype.str
+
+    def read(self) -> Optional[np.ndarray]:
+        """A copy of the last frame written."""
+        if self.shm is None:
+            return None
+        return np.ndarray(self.shape, dtype=self.dtype, buffer=self.shm.buf).copy()
+
+    def close(self):
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+def _worker_main(worker_id: int, config_path: str, tasks: mp.Queue, results: mp.Queue):
+    """Worker process: owns one model and runs detection on frames from shared memory."""
+    # Imported here so the supervisor process never loads a model
+    from main import AIDetectionService
+
+    # Each worker appends to its own shard of the history store
+    service = AIDetectionService(config_path, buffers_footage=False, history_shard=f"worker-{worker_id}")
+    attached: Dict[str, shared_memory.SharedMemory] = {}
+    results.put(('ready', worker_id, os.getpid()))
+
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+
+            camera_id, shm_name, shape, dtype = task
+            shm = attached.get(camera_id)
+            if shm is None or shm.name != shm_name:
+                if shm is not None:
+                    shm.close()
+                shm = shared_memory.SharedMemory(name=shm_name)
+                attached[camera_id] = shm
+
+            frame = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+            start = time.time()
+            alerted = False
+            if service.should_process(frame, camera_id):
+                detection = service.process_frame(frame, camera_id)
+                alerted = service.handle_result(camera_id, detection, start, frame)
+            del frame  # drop the view before the buffer can be closed
+            # Clips for this frame's alert are recorded by the supervisor, from its footage
+            evidence = service.evidence.take() if service.evidence is not None else []
+            results.put(('result', worker_id, camera_id, alerted, time.time() - start, evidence))
+    finally:
+        for shm in attached.values():
+            shm.close()
+        if service.history is not None:
+            service.history.close()
+        service.alert_dispatcher.stop()
+
+class WorkerHandle:
+    """Supervisor-side bookkeeping for one worker process."""
+
+    def __init__(self, worker_id: int, slot: int, process: mp.Process, tasks: mp.Queue):
+        self.worker_id = worker_id
+        self.slot = slot  # position in the pool, kept by the worker's replacements
+        self.process = process
+        self.tasks = tasks
+        self.started = time.time()
+        self.frames = 0
+        self.busy_time = 0.0
+
+    def reset_stats(self):
+        self.frames = 0
+        self.busy_time = 0.0
+
+class DetectionSupervisor:
+    """Shards cameras across N worker processes, each with its own YOLO model.
+
+    The supervisor owns the camera captures (on FrameGrabber threads, kept
+    connected by a CameraSupervisor), copies
+    due frames into per-camera shared-memory slots and dispatches them to the
+    worker that owns the camera. Dead workers are replaced, with backoff if
+    they keep dying shortly after starting, and their cameras rebalanced
+    across the pool. With evidence recording on, the supervisor
+    buffers every camera's footage and writes the clips whose paths the
+    workers put in their alerts.
+    """
+
+    def __init__(self, config_path: str):
+        self.config_path = config_path
+        with open(config_path, 'r') as f:
+            self.config = json.load(f)
+
+        self.num_workers = max(1, int(self.config.get('workers', os.cpu_count() or 1)))
+        self.report_interval = 30.0
+        # With tracking, workers dedupe alerts per track, so there is no alert cooldown
+        self.tracking_enabled = self.config.get('tracking', {}).get('enabled', False)
+        scheduling = {**DEFAULT_SCHEDULING_CONFIG, **self.config.get('scheduling', {})}
+        self.scheduler = FrameScheduler(scheduling['retry_delay'], scheduling['lag_warning'])
+
+        self.ctx = mp.get_context('spawn')
+        self.results = self.ctx.Queue()
+        self.workers: Dict[int, WorkerHandle] = {}
+        self._next_worker_id = 0
+        self.restarts = {**DEFAULT_WORKER_RESTART_CONFIG, **self.config.get('worker_restarts', {})}
+        self._fast_failures: Dict[int, int] = {}
+        self._respawn_at: Dict[int, float] = {}
+
+        self.cameras: Dict[str, CaptureConnector] = {}
+        self.connections = CameraSupervisor(
+            **{**DEFAULT_SUPERVISOR_CONFIG, **self.config.get('connection', {})}
+        )
+        self.slots: Dict[str, SharedFrameSlot] = {}
+        self.assignments: Dict[str, int] = {}
+        self.in_flight: Dict[str, int] = {}
+        evidence = {**DEFAULT_EVIDENCE_CONFIG, **self.config.get('evidence', {})}
+        self.evidence = EvidenceRecorder(
+            **{key: value for key, value in evidence.items() if key != 'enabled'}
+        ).start() if evidence['enabled'] else None
+
+        register_camera_metrics(self.connections, self.scheduler, self.cameras)
+        REGISTRY.gauge('detection_worker_in_flight', 'Frames dispatched to a worker and not yet answered',
+                       ['worker'], collect=self._in_flight_counts)
+        if self.evidence is not None:
+            register_evidence_metrics(self.evidence)
+
+    def _in_flight_counts(self) -> Dict[tuple, int]:
+        counts = {(str(worker_id),): 0 for worker_id in list(self.workers)}
+        for worker_id in list(self.in_flight.values()):
+            counts[(str(worker_id),)] = counts.get((str(worker_id),), 0) + 1
+        return counts
+
+    def _spawn_worker(self, slot: int) -> WorkerHandle:
+        worker_id = self._next_worker_id
+        self._next_worker_id += 1
+        tasks = self.ctx.Queue()
+        process = self.ctx.Process(
+            target=_worker_main,
+            args=(worker_id, self.config_path, tasks, self.results),
+            name=f"detection-worker-{worker_id}",
+            daemon=True,
+        )
+        process.start()
+        handle = WorkerHandle(worker_id, slot, process, tasks)
+        self.workers[worker_id] = handle
+        logger.info(f"Started detection worker {worker_id} (pid {process.pid})")
+        return handle
+
+    def add_camera(self, camera_id: str, rtsp_url: str):
+        """Register a camera to be read on a background grabber thread."""
+        decode = {**DEFAULT_DECODE_OPTIONS, **self.config.get('decode', {})}
+        decode.update((decode.pop('cameras', None) or {}).get(camera_id, {}))
+        connector = CaptureConnector(
+            camera_id, rtsp_url, decode, threaded=True,
+            on_frame=partial(self.evidence.record, camera_id) if self.evidence else None,
+        )
+        self.cameras[camera_id] = connector
+        self.connections.add(camera_id, connector)
+        self.slots[camera_id] = SharedFrameSlot(camera_id)
+        options = self._scheduling_options(camera_id)
+        self.scheduler.add(camera_id, options['fps'], options['priority'])
+
+    def _scheduling_options(self, camera_id: str) -> dict:
+        options = dict(DEFAULT_SCHEDULING_CONFIG)
+        # Older configs set the tracking sample rate as tracking.inference_interval
+        legacy_interval = self.config.get('tracking', {}).get('inference_interval')
+        if legacy_interval:
+            options['fps'] = 1.0 / legacy_interval
+        options.update(self.config.get('scheduling', {}))
+        options.update((options.pop('cameras', None) or {}).get(camera_id, {}))
+        return options
+
+    def start(self):
+        for camera_id, rtsp_url in self.config['cameras'].items():
+            self.add_camera(camera_id, rtsp_url)
+        results = self.connections.connect_all()
+        logger.info(f"Connected to {sum(results.values())}/{len(results)} cameras")
+
+        for slot in range(self.num_workers):
+            self._spawn_worker(slot)
+        self.assignments = shard_cameras(list(self.cameras.keys()), list(self.workers.keys()))
+
+    def _camera_counts(self) -> Dict[int, int]:
+        counts = {worker_id: 0 for worker_id in self.workers}
+        for worker_id in self.assignments.values():
+            if worker_id in counts:
+                counts[worker_id] += 1
+        return counts
+
+    def _check_workers(self):
+        """Replace dead workers and hand their cameras to the least-loaded live workers.
+
+        A worker that dies within min_uptime of starting is replaced after a
+        backoff that doubles with each such failure of its slot; after
+        max_fast_failures in a row the slot is left empty.
+        """
+        now = time.time()
+        dead = [handle for handle in self.workers.values() if not handle.process.is_alive()]
+        for handle in dead:
+            del self.workers[handle.worker_id]
+            for camera_id, worker_id in list(self.in_flight.items()):
+                if worker_id == handle.worker_id:
+                    del self.in_flight[camera_id]
+
+            uptime = now - handle.started
+            failures = self._fast_failures.get(handle.slot, 0) + 1 if uptime < self.restarts['min_uptime'] else 0
+            self._fast_failures[handle.slot] = failures
+            if failures >= self.restarts['max_fast_failures']:
+                logger.error(
+                    f"Detection worker {handle.worker_id} died (exit code {handle.process.exitcode}) "
+                    f"after {uptime:.0f}s, {failures} times in a row within {self.restarts['min_uptime']:.0f}s "
+                    f"of starting; no longer restarting worker slot {handle.slot}"
+                )
+                continue
+            delay = 0.0
+            if failures:
+                delay = min(self.restarts['max_backoff'], self.restarts['backoff'] * 2 ** (failures - 1))
+            self._respawn_at[handle.slot] = now + delay
+            logger.error(
+                f"Detection worker {handle.worker_id} died (exit code {handle.process.exitcode}) "
+                f"after {uptime:.0f}s, replacing it in {delay:.0f}s and rebalancing its cameras"
+            )
+
+        for slot, due in list(self._respawn_at.items()):
+            if now >= due:
+                del self._respawn_at[slot]
+                self._spawn_worker(slot)
+
+        if not self.workers and not self._respawn_at:
+            raise RuntimeError("Every detection worker slot has given up restarting")
+
+        # Cameras of dead workers wait for a live worker to take them
+        counts = self._camera_counts()
+        if counts:
+            for camera_id, worker_id in list(self.assignments.items()):
+                if worker_id not in counts:
+                    target = min(counts, key=counts.get)
+                    self.assignments[camera_id] = target
+                    counts[target] += 1
+
+        self._rebalance()
+
+    def _rebalance(self):
+        """Move idle cameras from the busiest worker to the emptiest one."""
+        counts = self._camera_counts()
+        while counts:
+            busiest = max(counts, key=counts.get)
+            emptiest = min(counts, key=counts.get)
+            if counts[busiest] - counts[emptiest] <= 1:
+                return
+            movable = [
+                camera_id for camera_id, worker_id in self.assignments.items()
+                if worker_id == busiest and camera_id not in self.in_flight
+            ]
+            if not movable:
+                return
+            self.assignments[movable[0]] = emptiest
+            counts[busiest] -= 1
+            counts[emptiest] += 1
+
+    def _dispatch(self):
+        """Send frames of due cameras to the workers that own them."""
+        while True:
+            camera_id = self.scheduler.next(timeout=0)
+            if camera_id is None:
+                return
+
+            worker_id = self.assignments.get(camera_id)
+            frame = None
+            if camera_id not in self.in_flight and worker_id in self.workers:
+                frame = self.connections.read(camera_id)
+            if frame is None:
+                self.scheduler.retry(camera_id)
+                continue
+
+            self.scheduler.complete(camera_id)
+            shm_name, shape, dtype = self.slots[camera_id].write(frame)
+            self.workers[worker_id].tasks.put((camera_id, shm_name, shape, dtype))
+            self.in_flight[camera_id] = worker_id
+
+    def _drain_results(self, timeout: float):
+        try:
+            message = self.results.get(timeout=timeout)
+        except queue.Empty:
+            return
+
+        while True:
+            kind = message[0]
+            if kind == 'ready':
+                _, worker_id, pid = message
+                logger.info(f"Detection worker {worker_id} ready (pid {pid})")
+            elif kind == 'result':
+                _, worker_id, camera_id, detected, elapsed, evidence = message
+                if evidence and self.evidence is not None:
+                    # Unless the camera moved on, the slot still holds the frame the worker alerted on
+                    snapshot = self.slots[camera_id].read() if self.in_flight.get(camera_id) == worker_id else None
+                    for _, timestamp, paths in evidence:
+                        self.evidence.write(camera_id, timestamp, paths, snapshot)
+                if self.in_flight.get(camera_id) == worker_id:
+                    del self.in_flight[camera_id]
+                if detected and not self.tracking_enabled:
+                    cooldown = self._scheduling_options(camera_id)['alert_cooldown']
+                    self.scheduler.hold(camera_id, time.time() + cooldown)
+                handle = self.workers.get(worker_id)
+                if handle:
+                    handle.frames += 1
+                    handle.busy_time += elapsed
+                WORKER_SECONDS.observe(elapsed, str(worker_id))
+
+            try:
+                message = self.results.get_nowait()
+            except queue.Empty:
+                return
+
+    def _report(self, elapsed: float):
+        counts = self._camera_counts()
+        for worker_id, handle in sorted(self.workers.items()):
+            fps = handle.frames / elapsed if elapsed > 0 else 0.0
+            avg_ms = handle.busy_time / handle.frames * 1000 if handle.frames else 0.0
+            logger.info(
+                f"Worker {worker_id} (pid {handle.process.pid}): {fps:.1f} frames/s, "
+                f"avg inference {avg_ms:.0f} ms, {counts.get(worker_id, 0)} cameras"
+            )
+            handle.reset_stats()
+        logger.info(self.connections.summary())
+        logger.info(self.scheduler.summary())
+
+    def run(self):
+        """Supervisor loop: dispatch frames, collect results and watch the pool."""
+        logger.info(f"Starting detection supervisor with {self.num_workers} workers")
+        # Stage timings stay inside the worker processes; the supervisor serves
+        # camera, scheduling and per-worker metrics
+        metrics = self.config.get('metrics', {})
+        if metrics.get('enabled', True):
+            serve_metrics(REGISTRY, metrics.get('host', '127.0.0.1'), metrics.get('port', 9108))
+        self.start()
+
+        last_check = last_report = time.time()
+        while True:
+            self._dispatch()
+            # Wake up for the next due camera, or a result, whichever is first
+            until_next = self.scheduler.until_next()
+            self._drain_results(timeout=min(0.05, until_next if until_next is not None else 0.05))
+
+            now = time.time()
+            if now - last_check >= 1.0:
+                self._check_workers()
+                last_check = now
+            if now - last_report >= self.report_interval:
+                self._report(now - last_report)
+                last_report = now
+
+    def shutdown(self):
+        logger.info("Shutting down detection supervisor")
+        for handle in self.workers.values():
+            handle.tasks.put(None)
+        for handle in self.workers.values():
+            handle.process.join(timeout=5.0)
+            if handle.process.is_alive():
+                handle.process.terminate()
+        self.connections.shutdown()
+        if self.evidence is not None:
+            self.evidence.stop()
+        for slot in self.slots.values():
+            slot.close()
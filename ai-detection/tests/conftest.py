@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+# The service runs its modules as scripts from src/, next to the repository's shared/ package
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / 'ai-detection' / 'src'))
@@ -0,0 +1,98 @@
+import json
+import time
+from functools import partial
+
+import numpy as np
+import pytest
+
+import main
+from shared import model_registry
+
+class Tensor:
+    def __init__(self, values):
+        self.values = np.asarray(values)
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.values
+
+class Boxes:
+    def __init__(self, xyxy):
+        self.xyxy = Tensor(xyxy)
+        self.conf = Tensor([0.9] * len(xyxy))
+        self.cls = Tensor([0.0] * len(xyxy))
+
+    def __len__(self):
+        return len(self.xyxy.values)
+
+class Result:
+    def __init__(self, xyxy):
+        self.boxes = Boxes(xyxy)
+
+class FakeModel:
+    """One box per input whose x1 is the frame's pixel value; blank frames have none."""
+
+    def __init__(self, path, **_):
+        self.path = path
+        self.names = {0: 'person'}
+        self.calls = []
+
+    def __call__(self, inputs, conf):
+        self.calls.append([int(frame[0, 0, 0]) for frame in inputs])
+        return [Result([[int(frame[0, 0, 0]), 0, 10, 10]] if frame.any() else []) for frame in inputs]
+
+def frame(value):
+    return np.full((48, 64, 3), value, dtype=np.uint8)
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    # Sizing real models needs torch; these fakes have no weights
+    monkeypatch.setattr(model_registry, 'model_bytes', lambda *args: 0)
+    monkeypatch.setattr(main, 'ModelRegistry', partial(model_registry.ModelRegistry, loader=FakeModel))
+    config = {
+        'model_path': 'default.pt',
+        'alert_endpoint': 'http://127.0.0.1:9/alerts',
+        'alerts': {'spool_dir': str(tmp_path / 'spool')},
+        'batching': {'enabled': True, 'max_batch_size': 2, 'max_wait': 0.05},
+        'models': {'registry': {'ppe': 'ppe.pt'}, 'cameras': {'cam3': {'model': 'ppe'}}},
+    }
+    path = tmp_path / 'config.json'
+    path.write_text(json.dumps(config))
+    service = main.AIDetectionService(str(path))
+    yield service
+    service.shutdown()
+
+def feed(service, frames, start=None):
+    """Schedule cameras and serve `frames` ({camera_id: frame}) as their next reads."""
+    service.read_frame = frames.get
+    for camera_id in frames:
+        service.scheduler.add(camera_id, fps=1.0, start=start)
+
+def test_collect_batch_stops_at_max_batch_size(service):
+    feed(service, {'cam1': frame(1), 'cam2': frame(2), 'cam3': frame(3)}, start=time.time() - 1)
+    first = service._collect_batch()
+    assert len(first) == 2
+    second = service._collect_batch()
+    assert set(first) | set(second) == {'cam1', 'cam2', 'cam3'}
+
+def test_collect_batch_waits_at_most_max_wait_for_more_cameras(service):
+    feed(service, {'cam1': frame(1)})
+    service.scheduler.add('cam2', fps=1.0, start=time.time() + 1.0)
+    started = time.time()
+    batch = service._collect_batch()
+    assert list(batch) == ['cam1']
+    assert time.time() - started < 0.5
+
+def test_process_batch_runs_one_pass_per_model_and_routes_results_back(service):
+    results = service.process_batch({'cam1': frame(1), 'cam2': frame(2), 'cam3': frame(3), 'cam4': frame(0)})
+    assert results['cam1']['detections'][0]['bbox'][0] == 1
+    assert results['cam2']['detections'][0]['bbox'][0] == 2
+    assert results['cam3']['detections'][0]['bbox'][0] == 3
+    assert results['cam4'] is None
+    assert all(results[camera_id]['camera_id'] == camera_id for camera_id in ('cam1', 'cam2', 'cam3'))
+
+    with service.models.use() as default, service.models.use('ppe') as ppe:
+        assert default.calls == [[1, 2, 0]]
+        assert ppe.calls == [[3]]
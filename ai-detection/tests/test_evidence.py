@@ -0,0 +1,46 @@
+import numpy as np
+
+from evidence import FrameRingBuffer
+
+def jpeg(size, value=0):
+    return np.full(size, value, dtype=np.uint8)
+
+def test_frames_are_returned_oldest_first_within_the_window():
+    buffer = FrameRingBuffer(capacity_bytes=1000, max_frames=10)
+    for i in range(5):
+        buffer.append(jpeg(10, i), timestamp=float(i), width=64, height=48)
+    frames = buffer.frames(1.0, 3.0)
+    assert [timestamp for timestamp, _, _, _ in frames] == [1.0, 2.0, 3.0]
+    assert frames[0][1] == bytes([1] * 10)
+    assert frames[0][2:] == (64, 48)
+
+def test_oldest_frames_are_overwritten_when_the_arena_is_full():
+    buffer = FrameRingBuffer(capacity_bytes=100, max_frames=10)
+    for i in range(6):
+        buffer.append(jpeg(30, i), timestamp=float(i), width=1, height=1)
+    frames = buffer.frames(0.0, 10.0)
+    # Three 30-byte frames fit in 100 bytes
+    assert [timestamp for timestamp, _, _, _ in frames] == [3.0, 4.0, 5.0]
+    assert [jpeg[0] for _, jpeg, _, _ in frames] == [3, 4, 5]
+
+def test_frame_count_is_bounded_by_max_frames():
+    buffer = FrameRingBuffer(capacity_bytes=1000, max_frames=3)
+    for i in range(5):
+        buffer.append(jpeg(10, i), timestamp=float(i), width=1, height=1)
+    assert buffer.count == 3
+    assert buffer.span() == 2.0
+
+def test_frames_larger_than_the_buffer_are_rejected():
+    buffer = FrameRingBuffer(capacity_bytes=10, max_frames=4)
+    assert not buffer.append(jpeg(11), timestamp=0.0, width=1, height=1)
+    assert buffer.frames_oversized == 1
+    assert buffer.count == 0
+
+def test_wrapping_keeps_frames_intact():
+    buffer = FrameRingBuffer(capacity_bytes=100, max_frames=10)
+    sizes = [40, 40, 30, 25, 45, 10]
+    for i, size in enumerate(sizes):
+        buffer.append(jpeg(size, i), timestamp=float(i), width=1, height=1)
+    for timestamp, data, _, _ in buffer.frames(0.0, 10.0):
+        i = int(timestamp)
+        assert data == bytes([i] * sizes[i])
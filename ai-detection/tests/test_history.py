@@ -0,0 +1,85 @@
+import numpy as np
+
+from history import FRAMES_CLASS, HistoryReader, HistoryWriter, merge_rollups, ROLLUP_DTYPE
+
+START = 1_700_000_000 // 3600 * 3600  # on an hour boundary
+
+def detection(cls, confidence=0.5):
+    return {'class': cls, 'confidence': confidence, 'bbox': [0, 0, 10, 10]}
+
+def write(tmp_path, shard, frames):
+    """frames: (camera_id, timestamp, [detections])"""
+    writer = HistoryWriter(dir=str(tmp_path), shard=shard, flush_interval=60.0, retention_days=None)
+    for camera_id, timestamp, detections in frames:
+        writer.append(camera_id, detections, timestamp)
+    writer.close()
+
+def test_raw_detections_round_trip_in_time_order(tmp_path):
+    write(tmp_path, 'main', [
+        ('cam1', START + 5, [detection('person', 0.9)]),
+        ('cam2', START + 1, [detection('helmet', 0.4), detection('person', 0.7)]),
+    ])
+    reader = HistoryReader(str(tmp_path))
+    rows = reader.detections(START, START + 60)
+    assert rows['timestamp'].tolist() == [START + 1, START + 1, START + 5]
+    assert [reader.classes[c] for c in rows['cls']] == ['helmet', 'person', 'person']
+    assert len(reader.detections(START, START + 60, min_confidence=0.8)) == 1
+
+def test_minute_rollups_count_detections_and_frames(tmp_path):
+    write(tmp_path, 'main', [
+        ('cam1', START + 1, [detection('person', 0.2), detection('person', 0.6)]),
+        ('cam1', START + 30, []),
+        ('cam1', START + 61, [detection('person', 0.8)]),
+    ])
+    reader = HistoryReader(str(tmp_path))
+    rows = reader.rollup(START, START + 120, bucket_seconds=60)
+    people = rows[rows['cls'] == reader.classes.index('person')]
+    assert people['timestamp'].tolist() == [START, START + 60]
+    assert people['count'].tolist() == [2, 1]
+    assert np.allclose(people['confidence_max'], [0.6, 0.8])
+    frames = rows[rows['cls'] == FRAMES_CLASS]
+    assert frames['count'].tolist() == [2, 1]
+
+def test_hourly_totals_merge_shards_with_their_own_catalogs(tmp_path):
+    # The shards assign camera and class ids in different orders
+    write(tmp_path, 'worker-0', [
+        ('cam1', START + 10, [detection('person')]),
+        ('cam2', START + 3700, [detection('helmet')]),
+    ])
+    write(tmp_path, 'worker-1', [
+        ('cam2', START + 20, [detection('helmet'), detection('person')]),
+        ('cam1', START + 3800, [detection('person')]),
+    ])
+    totals = HistoryReader(str(tmp_path)).totals(START, START + 2 * 3600)
+    assert totals == {'cam1': {'person': 2}, 'cam2': {'helmet': 2, 'person': 1}}
+
+def test_partial_hours_come_from_minute_rollups(tmp_path):
+    write(tmp_path, 'main', [
+        ('cam1', START + 100, [detection('person')]),
+        ('cam1', START + 3700, [detection('person')]),
+        ('cam1', START + 7300, [detection('person')]),
+    ])
+    reader = HistoryReader(str(tmp_path))
+    # Starts mid-way through the first hour and ends mid-way through the third
+    assert reader.totals(START + 60, START + 7320) == {'cam1': {'person': 3}}
+    assert reader.totals(START + 120, START + 7200) == {'cam1': {'person': 1}}
+
+def test_filters_keep_frame_counts(tmp_path):
+    write(tmp_path, 'main', [
+        ('cam1', START + 1, [detection('person'), detection('helmet')]),
+        ('cam2', START + 2, [detection('person')]),
+    ])
+    reader = HistoryReader(str(tmp_path))
+    rows = reader.rollup(START, START + 60, 60, cameras=['cam1'], classes=['helmet'])
+    assert sorted(rows['cls'].tolist()) == sorted([reader.classes.index('helmet'), FRAMES_CLASS])
+
+def test_merge_rollups_sums_rows_of_the_same_bucket():
+    rows = np.zeros(3, dtype=ROLLUP_DTYPE)
+    rows['timestamp'] = [0, 60, 3600]
+    rows['count'] = [1, 2, 3]
+    rows['confidence_sum'] = [0.5, 1.0, 1.5]
+    rows['confidence_max'] = [0.5, 0.6, 0.7]
+    merged = merge_rollups(rows, 3600)
+    assert merged['timestamp'].tolist() == [0, 3600]
+    assert merged['count'].tolist() == [3, 3]
+    assert np.allclose(merged['confidence_max'], [0.6, 0.7])
@@ -0,0 +1,88 @@
+import threading
+
+import pytest
+
+from shared import model_registry
+from shared.model_registry import ModelRegistry
+
+@pytest.fixture(autouse=True)
+def no_size_estimate(monkeypatch):
+    # Sizing real models needs torch; these fakes have no weights
+    monkeypatch.setattr(model_registry, 'model_bytes', lambda *args: 0)
+
+class FakeModel:
+    def __init__(self, path):
+        self.path = path
+        self.names = {0: 'person'}
+
+def registry(**options):
+    loads = []
+
+    def loader(path, **_):
+        loads.append(path)
+        return FakeModel(path)
+
+    models = ModelRegistry(loader=loader, **options)
+    models.loads_seen = loads
+    return models
+
+def test_models_load_lazily_and_are_reused():
+    models = registry()
+    models.register('site', 'a.pt', 'A')
+    assert models.status('site') == 'unloaded'
+    with models.use('site') as model:
+        assert model.path == 'a.pt'
+    with models.use('site'):
+        pass
+    assert models.loads_seen == ['a.pt']
+    assert models.status('site') == 'ready'
+
+def test_swap_switches_new_leases_and_drops_the_old_version_when_idle():
+    models = registry()
+    models.register('site', 'a.pt', 'A')
+    models.preload('site')
+    assert models.swap('site', 'b.pt', 'B') == 'B'
+    with models.use('site') as model:
+        assert model.path == 'b.pt'
+    assert ('site', 'A') not in models._versions
+
+def test_in_flight_lease_finishes_on_the_old_version():
+    models = registry()
+    models.register('site', 'a.pt', 'A')
+    entry, model = models.acquire('site')
+    models.swap('site', 'b.pt', 'B')
+    assert model.path == 'a.pt'
+    assert ('site', 'A') in models._versions
+    models.release(entry, model)
+    assert ('site', 'A') not in models._versions
+
+def test_swapping_back_while_the_old_version_drains_keeps_it_registered():
+    models = registry()
+    models.register('site', 'a.pt', 'A')
+    entry, model = models.acquire('site')
+    models.swap('site', 'b.pt', 'B')
+    # The draining instance is the only one allowed; swapping back waits for it
+    threading.Timer(0.2, models.release, (entry, model)).start()
+    models.swap('site', 'a.pt', 'A')
+    with models.use('site') as current:
+        assert current.path == 'a.pt'
+    assert models._current['site'] == 'A'
+
+def test_swap_rejects_a_different_path_under_a_registered_version():
+    models = registry(max_instances=2)
+    models.register('site', 'a.pt', 'A')
+    entry, model = models.acquire('site')
+    models.swap('site', 'b.pt', 'B')
+    with pytest.raises(ValueError):
+        models.swap('site', 'other.pt', 'A')
+    models.release(entry, model)
+
+def test_failed_swap_keeps_the_current_version():
+    models = registry()
+    models.register('site', 'a.pt', 'A')
+    models.preload('site')
+    models.loader = lambda path, **_: (_ for _ in ()).throw(IOError('corrupt'))
+    with pytest.raises(IOError):
+        models.swap('site', 'b.pt', 'B')
+    assert models._current['site'] == 'A'
+    assert ('site', 'B') not in models._versions
@@ -0,0 +1,94 @@
+from rules import RuleEngine, compile_rule, compile_rules, load_definitions
+
+FRAME = (1000, 1000)
+
+def person(x, y=0, height=170):
+    return {'bbox': [x, y, x + 50, y + height], 'class': 'person', 'confidence': 0.9}
+
+def box(cls, x1, y1, x2, y2):
+    return {'bbox': [x1, y1, x2, y2], 'class': cls, 'confidence': 0.9}
+
+def engine(*definitions, **options):
+    options.setdefault('cooldown', 0.0)
+    return RuleEngine([compile_rule(d) for d in definitions], 'cam', **options)
+
+def test_proximity_uses_calibrated_distance():
+    rules = engine({'type': 'proximity', 'condition': {'object1': 'person', 'object2': 'forklift',
+                                                       'threshold': 2, 'unit': 'm'}},
+                   pixels_per_meter=100.0)
+    near = rules.evaluate([person(0), box('forklift', 100, 0, 200, 170)], FRAME, now=0.0)
+    # Ground points (bottom centres) are 125 px apart
+    assert near and near[0]['value'] == 1.25
+    assert rules.evaluate([person(0), box('forklift', 300, 0, 400, 170)], FRAME, now=1.0) == []
+
+def test_proximity_never_pairs_a_detection_with_itself():
+    rules = engine({'type': 'proximity', 'condition': {'threshold': 1}}, pixels_per_meter=100.0)
+    assert rules.evaluate([person(0)], FRAME, now=0.0) == []
+    assert rules.evaluate([person(0), person(20)], FRAME, now=1.0)
+
+def test_area_entry_tests_the_ground_point_against_the_zone():
+    zones = {'pit': [[0, 0], [0.5, 0], [0.5, 0.5], [0, 0.5]]}
+    rules = engine({'type': 'area_entry', 'condition': {'area': 'pit'}}, zones=zones)
+    hits = rules.evaluate([person(100, 100), person(700, 100)], FRAME, now=0.0)
+    assert hits[0]['detections'] == [0]
+    # Head inside the zone, feet below it
+    assert rules.evaluate([person(100, 400, height=200)], FRAME, now=1.0) == []
+
+def test_rules_without_their_zone_are_disabled():
+    rules = engine({'type': 'area_entry', 'condition': {'area': 'pit'}})
+    assert rules.rules == []
+
+def test_crowd_density_counts_against_max_count():
+    rules = engine({'type': 'crowd_density', 'condition': {'max_count': 2}})
+    assert rules.evaluate([person(0), person(100)], FRAME, now=0.0) == []
+    assert rules.evaluate([person(0), person(100), person(200)], FRAME, now=1.0)[0]['value'] == 3
+
+def test_ppe_flags_people_without_gear_inside_their_box():
+    rules = engine({'type': 'ppe_detection', 'condition': {'ppe_type': 'hard_hat'}},
+                   class_aliases={'hard_hat': ['helmet']})
+    detections = [person(0), person(300), box('helmet', 10, 0, 40, 20)]
+    assert rules.evaluate(detections, FRAME, now=0.0)[0]['detections'] == [1]
+
+def test_dwell_and_cooldown():
+    rules = engine({'type': 'crowd_density', 'condition': {'max_count': 0, 'dwell': 2, 'cooldown': 10}})
+    crowd = [person(0)]
+    assert rules.evaluate(crowd, FRAME, now=0.0) == []
+    assert rules.evaluate(crowd, FRAME, now=2.0)
+    assert rules.evaluate(crowd, FRAME, now=5.0) == []
+    # The condition lapsing resets the dwell timer
+    assert rules.evaluate([], FRAME, now=11.0) == []
+    assert rules.evaluate(crowd, FRAME, now=12.0) == []
+    assert rules.evaluate(crowd, FRAME, now=14.0)
+
+def test_speed_between_samples():
+    rules = engine({'type': 'speed', 'condition': {'object1': 'forklift', 'threshold': 10, 'unit': 'km/h'}},
+                   pixels_per_meter=100.0)
+    assert rules.evaluate([box('forklift', 0, 0, 100, 100)], FRAME, now=0.0) == []
+    # 500 px in one second is 5 m/s, 18 km/h
+    hits = rules.evaluate([box('forklift', 500, 0, 600, 100)], FRAME, now=1.0)
+    assert hits[0]['value'] == 18.0
+
+def test_area_exit_fires_for_tracks_that_leave_and_needs_tracking():
+    exit_rule = {'type': 'area_exit', 'condition': {'area': 'pit'}}
+    assert compile_rules([exit_rule]) == []
+    zones = {'pit': [[0, 0], [0.5, 0], [0.5, 0.5], [0, 0.5]]}
+    rules = RuleEngine([compile_rule(exit_rule, tracking=True)], 'cam', zones=zones, cooldown=0.0)
+    assert rules.evaluate([dict(person(100, 100), track_id=1)], FRAME, now=0.0) == []
+    # Track 2 was never inside; untracked detections never count as leaving
+    left = [dict(person(700, 100), track_id=1), dict(person(800, 100), track_id=2), person(900, 100)]
+    assert rules.evaluate(left, FRAME, now=1.0)[0]['detections'] == [0]
+
+def test_meter_rules_need_calibration_or_a_known_height():
+    speed = {'type': 'speed', 'condition': {'threshold': 10}}
+    assert engine(speed).rules == []
+    assert engine(speed, object_heights={'forklift': 2.5}).rules
+    # The person's height scales the distance to the forklift
+    assert engine({'type': 'proximity', 'condition': {'object2': 'forklift', 'threshold': 2}}).rules
+
+def test_unsupported_rules_are_skipped():
+    definitions = load_definitions({'alertRules': [
+        {'id': 1, 'type': 'proximity', 'condition': {'object2': 'wall', 'threshold': 1}},
+        {'id': 2, 'type': 'crowd_density', 'condition': {'max_count': 5}},
+        {'id': 3, 'type': 'crowd_density', 'condition': {'max_count': 5}, 'isActive': False},
+    ]})
+    assert [rule.id for rule in compile_rules(definitions)] == ['2']
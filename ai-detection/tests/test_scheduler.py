@@ -0,0 +1,60 @@
+import time
+
+from scheduler import FrameScheduler
+
+def test_next_returns_cameras_in_due_order():
+    scheduler = FrameScheduler()
+    now = time.time()
+    scheduler.add('late', fps=1.0, start=now - 1)
+    scheduler.add('later', fps=1.0, start=now + 60)
+    assert scheduler.next(timeout=0) == 'late'
+    assert scheduler.next(timeout=0) is None
+
+def test_overdue_cameras_share_capacity_by_priority():
+    scheduler = FrameScheduler()
+    now = time.time()
+    scheduler.add('low', fps=1.0, priority=1.0, start=now - 1)
+    scheduler.add('high', fps=1.0, priority=5.0, start=now - 1)
+    assert scheduler.next(timeout=0) == 'high'
+    assert scheduler.next(timeout=0) == 'low'
+
+def test_complete_schedules_the_next_slot_one_interval_later():
+    scheduler = FrameScheduler()
+    now = time.time()
+    scheduler.add('cam', fps=2.0, start=now)
+    assert scheduler.next(timeout=0) == 'cam'
+    scheduler.complete('cam', now=now)
+    assert scheduler.cameras['cam'].due == now + 0.5
+
+def test_falling_behind_skips_slots_instead_of_queueing_them():
+    scheduler = FrameScheduler()
+    now = time.time()
+    scheduler.add('cam', fps=10.0, start=now - 1.0)
+    assert scheduler.next(timeout=0) == 'cam'
+    scheduler.complete('cam', now=now)
+    schedule = scheduler.cameras['cam']
+    assert schedule.skipped_slots == 10
+    assert schedule.due == now
+
+def test_retry_is_capped_at_the_camera_interval():
+    scheduler = FrameScheduler(retry_delay=5.0)
+    scheduler.add('cam', fps=4.0, start=time.time() - 1)
+    assert scheduler.next(timeout=0) == 'cam'
+    scheduler.retry('cam')
+    assert 0.0 < scheduler.until_next() <= 0.25
+
+def test_hold_postpones_but_never_advances_a_camera():
+    scheduler = FrameScheduler()
+    now = time.time()
+    scheduler.add('cam', fps=1.0, start=now + 10)
+    scheduler.hold('cam', now + 5)
+    assert scheduler.cameras['cam'].due == now + 10
+    scheduler.hold('cam', now + 30)
+    assert scheduler.cameras['cam'].due == now + 30
+
+def test_removed_cameras_are_never_returned():
+    scheduler = FrameScheduler()
+    scheduler.add('cam', fps=1.0, start=time.time() - 1)
+    scheduler.remove('cam')
+    assert scheduler.next(timeout=0) is None
+    assert scheduler.overdue() == 0
@@ -0,0 +1,46 @@
+from tracker import MultiObjectTracker
+
+def detection(bbox, cls='person', confidence=0.9):
+    return {'bbox': list(bbox), 'class': cls, 'confidence': confidence}
+
+def test_track_is_confirmed_once_after_min_hits():
+    tracker = MultiObjectTracker(min_hits=2)
+    assert tracker.update([detection((0, 0, 10, 20))], now=0.0) == []
+    confirmed = tracker.update([detection((1, 0, 11, 20))], now=0.5)
+    assert len(confirmed) == 1
+    assert tracker.update([detection((2, 0, 12, 20))], now=1.0) == []
+
+def test_matched_detections_keep_their_track_id():
+    tracker = MultiObjectTracker()
+    first = detection((0, 0, 10, 20))
+    tracker.update([first], now=0.0)
+    second = detection((1, 0, 11, 20))
+    tracker.update([second], now=0.5)
+    assert second['track_id'] == first['track_id']
+
+def test_classes_are_never_matched_to_each_other():
+    tracker = MultiObjectTracker()
+    person = detection((0, 0, 10, 20))
+    tracker.update([person], now=0.0)
+    forklift = detection((0, 0, 10, 20), cls='forklift')
+    tracker.update([forklift], now=0.5)
+    assert forklift['track_id'] != person['track_id']
+
+def test_low_confidence_detections_extend_but_do_not_start_tracks():
+    tracker = MultiObjectTracker(high_confidence=0.6)
+    tracker.update([detection((0, 0, 10, 20), confidence=0.3)], now=0.0)
+    assert tracker.tracks == []
+
+    tracker.update([detection((0, 0, 10, 20))], now=0.0)
+    weak = detection((1, 0, 11, 20), confidence=0.3)
+    tracker.update([weak], now=0.5)
+    assert weak['track_id'] == tracker.tracks[0].track_id
+    assert tracker.tracks[0].hits == 2
+
+def test_lost_tracks_are_dropped_after_max_lost():
+    tracker = MultiObjectTracker(max_lost=2.0)
+    tracker.update([detection((0, 0, 10, 20))], now=0.0)
+    tracker.update([], now=1.0)
+    assert len(tracker.tracks) == 1
+    tracker.update([], now=3.0)
+    assert tracker.tracks == []
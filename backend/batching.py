@@ -0,0 +1,110 @@
+import asyncio
+import logging
+from typing import Any, Callable, List, Optional, Set
+
+from inference import InferenceExecutor, ExecutorSaturated
+
+logger = logging.getLogger(__name__)
+
+class MicroBatcher:
+    """Gathers concurrent requests into batched forward passes.
+
+    The first request to arrive opens a batch window. Further requests join it
+    until `max_batch_size` is reached or `max_delay` seconds pass. The batch then
+    runs as a single `batch_fn(model, items)` call on the inference executor, and
+    each caller gets its own entry of the returned list (an Exception entry is
+    raised to that caller only). At most one batch per executor thread is in
+    flight, so under load the next batch keeps filling while the previous ones run.
+    """
+
+    def __init__(
+        self,
+        executor: InferenceExecutor,
+        batch_fn: Callable[[Any, List[Any]], List[Any]],
+        max_batch_size: int = 8,
+        max_delay: float = 0.005,
+        max_pending: int = 64,
+    ):
+        self.executor = executor
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self.pending = 0
+        self.batches = 0
+        self.batched_items = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._collector: Optional[asyncio.Task] = None
+        # The event loop only keeps weak references to tasks
+        self._running: Set[asyncio.Task] = set()
+
+    def _ensure_started(self):
+        # Created lazily so they bind to the running event loop
+        if self._collector is None or self._collector.done():
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.executor.max_workers)
+            self._collector = asyncio.create_task(self._collect())
+
+    async def submit(self, item: Any) -> Any:
+        """Queue one item for the next batch and await its result."""
+        if self.pending >= self.max_pending:
+            raise ExecutorSaturated(f"{self.pending} requests already waiting for a batch")
+
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        self.pending += 1
+        try:
+            self._queue.put_nowait((item, future))
+            return await future
+        finally:
+            self.pending -= 1
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._slots.acquire()
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            task = asyncio.create_task(self._run_batch(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run_batch(self, batch: list):
+        try:
+            items = [item for item, _ in batch]
+            try:
+                results = await self.executor.run(self.batch_fn, items)
+            except Exception as e:
+                results = [e] * len(batch)
+
+            self.batches += 1
+            self.batched_items += len(batch)
+            for (_, future), result in zip(batch, results):
+                if future.done():
+                    continue  # caller went away
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+        finally:
+            self._slots.release()
+
+    async def shutdown(self):
+        """Stop collecting new batches and wait for the ones in flight."""
+        if self._collector is not None:
+            self._collector.cancel()
+            try:
+                await self._collector
+            except asyncio.CancelledError:
+                pass
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
@@ -0,0 +1,101 @@
+"""Load generator for /api/detect: p50/p99 latency and images/s per concurrency level.
+
+Start the backend first (python main.py), then from the backend directory:
+
+    python benchmarks/bench_detect_load.py --image site.jpg --concurrency 1 4 16 32
+
+Run it once with DETECT_MAX_BATCH=1 and once with batching enabled to compare.
+Without --image a synthetic 640x480 JPEG is uploaded.
+"""
+import argparse
+import http.client
+import statistics
+import threading
+import time
+import uuid
+from urllib.parse import urlparse
+
+def synthetic_jpeg() -> bytes:
+    import cv2
+    import numpy as np
+
+    frame = np.random.default_rng(0).integers(0, 255, (480, 640, 3), dtype=np.uint8)
+    return cv2.imencode('.jpg', frame)[1].tobytes()
+
+def multipart_body(image: bytes):
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\n"
+        'Content-Disposition: form-data; name="file"; filename="frame.jpg"\r\n'
+        "Content-Type: image/jpeg\r\n\r\n"
+    ).encode() + image + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def run_level(url, body, content_type, concurrency, requests_per_client):
+    target = urlparse(url)
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+
+    def client():
+        conn = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=60)
+        for _ in range(requests_per_client):
+            start = time.perf_counter()
+            try:
+                path = f"{target.path}?{target.query}" if target.query else target.path
+                conn.request('POST', path, body=body, headers={'Content-Type': content_type})
+                response = conn.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=60)
+                status = 'error'
+            elapsed = time.perf_counter() - start
+            with lock:
+                statuses[status] = statuses.get(status, 0) + 1
+                if status == 200:
+                    latencies.append(elapsed)
+        conn.close()
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+    return latencies, statuses, wall
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://localhost:8000/api/detect')
+    parser.add_argument('--image', help='JPEG to upload (defaults to a synthetic frame)')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16, 32])
+    parser.add_argument('--requests', type=int, default=20, help='Requests per client per level')
+    parser.add_argument('--response', choices=['base64', 'json', 'jpeg'], default='base64',
+                        help='Response mode requested from /api/detect')
+    args = parser.parse_args()
+    url = f"{args.url}?response={args.response}"
+
+    image = open(args.image, 'rb').read() if args.image else synthetic_jpeg()
+    body, content_type = multipart_body(image)
+
+    print(f"{'clients':>8}{'ok':>7}{'503':>6}{'p50 ms':>10}{'p99 ms':>10}{'mean ms':>10}{'img/s':>9}")
+    for concurrency in args.concurrency:
+        latencies, statuses, wall = run_level(url, body, content_type, concurrency, args.requests)
+        mean = statistics.mean(latencies) * 1000 if latencies else 0.0
+        print(
+            f"{concurrency:>8}{len(latencies):>7}{statuses.get(503, 0):>6}"
+            f"{percentile(latencies, 50) * 1000:>10.1f}{percentile(latencies, 99) * 1000:>10.1f}"
+            f"{mean:>10.1f}{len(latencies) / wall:>9.1f}"
+        )
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+"""Startup time and per-worker memory of the backend under different launch modes.
+
+Usage (from the backend directory):
+
+    python benchmarks/bench_startup.py --workers 4
+    python benchmarks/bench_startup.py --modes import prefork --workers 2 4 8
+
+Modes:
+  import   time to `import main` with MODEL_LOADING=lazy (no model, no server)
+  uvicorn  `uvicorn main:app --workers N`: spawned workers, each loads its own weights
+  prefork  `python main.py --workers N`: the model is loaded once, workers are forked
+
+For the server modes it reports when /health first answers, when the first
+detection succeeds, and each worker's RSS and PSS once every worker has served
+requests. PSS splits shared pages between the processes sharing them, so the
+sum of PSS is the real footprint; RSS counts shared weights in every worker.
+Linux only (reads /proc).
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench_detect_load import multipart_body, synthetic_jpeg
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+def import_time(repeat: int) -> dict:
+    code = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+    env = {**os.environ, 'MODEL_LOADING': 'lazy'}
+    times = [
+        float(subprocess.run([sys.executable, '-c', code], cwd=BACKEND_DIR, env=env,
+                             capture_output=True, text=True, check=True).stdout.split()[-1])
+        for _ in range(repeat)
+    ]
+    return {'mode': 'import', 'import_seconds': min(times)}
+
+def memory(pid: int) -> dict:
+    """RSS and PSS of a process in MB, from smaps_rollup."""
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if parts[0] in ('Rss:', 'Pss:', 'Shared_Clean:', 'Shared_Dirty:'):
+                values[parts[0][:-1].lower()] = int(parts[1]) / 1024
+    return values
+
+def children(pid: int) -> list:
+    found = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+            with open(f'/proc/{entry}/cmdline', 'rb') as f:
+                cmdline = f.read()
+        except OSError:
+            continue
+        # multiprocessing's resource tracker is not a worker
+        if int(fields[1]) == pid and b'resource_tracker' not in cmdline:
+            found.append(int(entry))
+    return sorted(found)
+
+def get(url: str, timeout: float = 1.0):
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            return json.loads(response.read())
+    except OSError:
+        return None
+
+def detect(url: str, body: bytes, content_type: str) -> bool:
+    request = urllib.request.Request(f"{url}/api/detect?response=json", data=body,
+                                     headers={'Content-Type': content_type})
+    try:
+        with urllib.request.urlopen(request, timeout=120) as response:
+            return response.status == 200
+    except OSError:
+        return False
+
+def run_server(mode: str, workers: int, port: int, timeout: float, requests: int) -> dict:
+    if mode == 'uvicorn':
+        command = [sys.executable, '-m', 'uvicorn', 'main:app', '--port', str(port), '--workers', str(workers)]
+    else:
+        command = [sys.executable, 'main.py', '--port', str(port), '--workers', str(workers)]
+    url = f"http://127.0.0.1:{port}"
+    body, content_type = multipart_body(synthetic_jpeg())
+
+    started = time.perf_counter()
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    result = {'mode': mode, 'workers': workers}
+    try:
+        while get(f"{url}/health") is None:
+            if process.poll() is not None or time.perf_counter() - started > timeout:
+                raise RuntimeError(f"{mode} server did not come up")
+            time.sleep(0.05)
+        result['health_seconds'] = time.perf_counter() - started
+
+        while not detect(url, body, content_type):
+            if process.poll() is not None or time.perf_counter() - started > timeout:
+                raise RuntimeError(f"{mode} server never served a detection")
+            time.sleep(0.2)
+        result['first_detection_seconds'] = time.perf_counter() - started
+
+        # Make sure every worker has loaded (or touched) its model before measuring
+        ready = set()
+        deadline = time.perf_counter() + timeout
+        while len(ready) < workers and time.perf_counter() < deadline:
+            health = get(f"{url}/health")
+            if health and health['model'] == 'ready':
+                ready.add(health['pid'])
+            time.sleep(0.05)
+        for _ in range(requests):
+            detect(url, body, content_type)
+        result['all_ready_seconds'] = time.perf_counter() - started
+
+        pids = children(process.pid) or [process.pid]
+        per_worker = [memory(pid) for pid in pids]
+        result['parent'] = memory(process.pid)
+        result['per_worker'] = per_worker
+        result['rss_mb_per_worker'] = sum(m['rss'] for m in per_worker) / len(per_worker)
+        result['pss_mb_per_worker'] = sum(m['pss'] for m in per_worker) / len(per_worker)
+        result['total_pss_mb'] = sum(m['pss'] for m in per_worker) + (
+            result['parent']['pss'] if pids != [process.pid] else 0.0
+        )
+    finally:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    return result
+
+def print_result(result: dict):
+    if result['mode'] == 'import':
+        print(f"import main: {result['import_seconds']:.2f}s")
+        return
+    print(
+        f"{result['mode']:>8} x{result['workers']}: /health {result['health_seconds']:.2f}s, "
+        f"first detection {result['first_detection_seconds']:.2f}s, "
+        f"RSS/worker {result['rss_mb_per_worker']:.0f} MB, PSS/worker {result['pss_mb_per_worker']:.0f} MB, "
+        f"total PSS {result['total_pss_mb']:.0f} MB"
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modes', nargs='+', default=['import', 'uvicorn', 'prefork'],
+                        choices=['import', 'uvicorn', 'prefork'])
+    parser.add_argument('--workers', type=int, nargs='+', default=[4])
+    parser.add_argument('--port', type=int, default=8011)
+    parser.add_argument('--timeout', type=float, default=300.0)
+    parser.add_argument('--requests', type=int, default=16, help='Detections to send before measuring memory')
+    parser.add_argument('--repeat', type=int, default=3, help='Import timings to take the best of')
+    parser.add_argument('--output', help='Write results as JSON')
+    args = parser.parse_args()
+
+    results = []
+    for mode in args.modes:
+        if mode == 'import':
+            results.append(import_time(args.repeat))
+            print_result(results[-1])
+            continue
+        for workers in args.workers:
+            results.append(run_server(mode, workers, args.port, args.timeout, args.requests))
+            print_result(results[-1])
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Compare bytes/frame and encode time of the JSON and binary /ws/video protocols.
+
+Usage (from the backend directory):
+
+    python benchmarks/bench_ws_encoding.py [--image frame.jpg] [--frames 200]
+
+Without --image a synthetic 1080p frame is used. No model is loaded: a fixed
+set of fake detections stands in for inference output.
+"""
+import argparse
+import base64
+import json
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from streaming import encode_frame, compact_detections
+
+def synthetic_frame(width: int = 1920, height: int = 1080) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    frame = cv2.resize(
+        rng.integers(0, 255, (height // 16, width // 16, 3), dtype=np.uint8),
+        (width, height), interpolation=cv2.INTER_CUBIC
+    )
+    cv2.rectangle(frame, (400, 300), (700, 900), (0, 200, 255), -1)
+    return frame
+
+def fake_detections(count: int = 8):
+    detections = [{
+        "class": "person",
+        "confidence": 0.8734,
+        "bbox": [100.0 + i * 150, 200.25, 220.5 + i * 150, 640.75]
+    } for i in range(count)]
+    return detections, [0] * count
+
+def bench_json(frame, detections, frames):
+    total_bytes = 0
+    start = time.perf_counter()
+    for _ in range(frames):
+        jpeg, _ = encode_frame(frame)
+        message = json.dumps({
+            "frame": base64.b64encode(jpeg).decode('utf-8'),
+            "detections": detections
+        })
+        total_bytes += len(message.encode('utf-8'))
+    return total_bytes / frames, (time.perf_counter() - start) / frames * 1000
+
+def bench_binary(frame, detections, class_ids, frames, quality, width):
+    total_bytes = 0
+    start = time.perf_counter()
+    for seq in range(frames):
+        jpeg, scale = encode_frame(frame, quality, width)
+        side = json.dumps({"seq": seq, "d": compact_detections(detections, class_ids, scale)})
+        total_bytes += len(jpeg) + len(side.encode('utf-8'))
+    return total_bytes / frames, (time.perf_counter() - start) / frames * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--image', help='Frame to encode (defaults to a synthetic 1080p frame)')
+    parser.add_argument('--frames', type=int, default=200)
+    args = parser.parse_args()
+
+    frame = cv2.imread(args.image) if args.image else synthetic_frame()
+    if frame is None:
+        parser.error(f"Could not read image {args.image}")
+    detections, class_ids = fake_detections()
+
+    rows = [('json (q95, full res)',) + bench_json(frame, detections, args.frames)]
+    for quality, width in [(95, None), (80, None), (70, 1280), (70, 640)]:
+        label = f"binary (q{quality}, {'full res' if width is None else f'{width}px'})"
+        rows.append((label,) + bench_binary(frame, detections, class_ids, args.frames, quality, width))
+
+    baseline = rows[0][1]
+    print(f"Frame {frame.shape[1]}x{frame.shape[0]}, {args.frames} frames")
+    print(f"{'protocol':<28}{'bytes/frame':>14}{'vs json':>10}{'encode ms':>12}")
+    for label, size, ms in rows:
+        print(f"{label:<28}{size:>14,.0f}{size / baseline:>10.0%}{ms:>12.2f}")
+
+if __name__ == '__main__':
+    main()
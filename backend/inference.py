@@ -0,0 +1,53 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from shared.model_registry import ModelRegistry
+
+logger = logging.getLogger(__name__)
+
+class ExecutorSaturated(Exception):
+    """Raised when the inference queue is full and the request should be shed."""
+
+class InferenceExecutor:
+    """Runs blocking OpenCV/YOLO work on a bounded thread pool behind an awaitable API.
+
+    Ultralytics predictors are not thread-safe, so every job leases a model
+    instance of its own from the registry (which keeps up to one instance per
+    pool thread) and hands it back when done. Because the model is looked up
+    per job, a model swapped in the registry takes over from the next job on,
+    while jobs already running finish on the old version. At most `max_workers` jobs run at
+    once and `max_queue_depth` more may wait; beyond that `run()` raises
+    ExecutorSaturated immediately instead of queueing unbounded work.
+    """
+
+    def __init__(self, models: ModelRegistry, max_workers: int = 2, max_queue_depth: int = 8,
+                 model_name: Optional[str] = None):
+        self.models = models
+        self.model_name = model_name
+        self.max_workers = max_workers
+        self.max_queue_depth = max_queue_depth
+        self.pending = 0
+        self.rejected = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='inference')
+
+    def _call(self, fn: Callable, args: tuple):
+        with self.models.use(self.model_name) as model:
+            return fn(model, *args)
+
+    async def run(self, fn: Callable, *args):
+        """Run `fn(model, *args)` on an inference thread and await its result."""
+        if self.pending >= self.max_workers + self.max_queue_depth:
+            self.rejected += 1
+            raise ExecutorSaturated(f"{self.pending} inference jobs already pending")
+
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, self._call, fn, args)
+        finally:
+            self.pending -= 1
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
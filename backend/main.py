@@ -1,6 +1,6 @@
-from fastapi import FastAPI, UploadFile, File, WebSocket, HTTPException
+from fastapi import FastAPI, UploadFile, File, WebSocket, HTTPException, Query, Request, Response
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from ultralytics import YOLO
 import cv2
 import numpy as np
 import io
@@ -8,8 +8,25 @@ from PIL import Image
 import base64
 import asyncio
 import json
-from typing import Optional
+from typing import TYPE_CHECKING, List, Optional
 import logging
+import os
+import sys
+import threading
+from pathlib import Path
+
+# Modules shared with the detection service live in the repository's shared/ package
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from batching import MicroBatcher
+from inference import InferenceExecutor, ExecutorSaturated
+from shared.detections import extract_detections
+from shared.metrics import REGISTRY, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from shared.model_registry import ModelRegistry, DEFAULT_MODEL
+from streaming import StreamHub, parse_stream_options, compact_detections, draw_detections, scale_detections, STAGE_SECONDS
+
+if TYPE_CHECKING:
+    from ultralytics import YOLO
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -17,6 +34,11 @@ logger = logging.getLogger(__name__)
 
 app = FastAPI()
 
+# Stage timers measure one call in N so instrumentation stays off the hot path
+REGISTRY.sample_every = int(os.environ.get('METRICS_SAMPLE_EVERY', '10'))
+METRICS_ALLOW_REMOTE = os.environ.get('METRICS_ALLOW_REMOTE', '').lower() in ('1', 'true', 'yes')
+DETECT_REQUESTS = REGISTRY.counter('api_detect_requests_total', '/api/detect requests by outcome', ['outcome'])
+
 # Configure CORS with more permissive settings for development
 app.add_middleware(
     CORSMiddleware,
@@ -26,128 +48,226 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Load YOLO model
-model = YOLO('yolov8n.pt')  # Load the smallest YOLOv8 model
+# Load YOLO models on the configured runtime (pytorch, onnx or openvino)
+MODEL_PATH = 'yolov8n.pt'  # The smallest YOLOv8 model, registered as "default"
+MODEL_OPTIONS = {
+    'backend': os.environ.get('INFERENCE_BACKEND', 'pytorch'),
+    'threads': int(os.environ['INFERENCE_THREADS']) if os.environ.get('INFERENCE_THREADS') else None,
+}
+# Site models (e.g. train_yolo.py's safety_detection_model.pt) come from a JSON file of
+# {name: path} or {name: {"path", "version", backend options}}; MODEL_NAME picks the served one
+MODEL_NAME = os.environ.get('MODEL_NAME', DEFAULT_MODEL)
+# background: load after startup while /health already answers; lazy: on the first
+# request; eager: at import, before the app can serve anything
+MODEL_LOADING = os.environ.get('MODEL_LOADING', 'background')
+INFERENCE_WORKERS = int(os.environ.get('INFERENCE_WORKERS', '2'))
+
+model_registry = ModelRegistry(
+    memory_budget_mb=float(os.environ['MODEL_MEMORY_MB']) if os.environ.get('MODEL_MEMORY_MB') else None,
+    max_instances=INFERENCE_WORKERS,  # one predictor per inference thread
+    default=MODEL_NAME,
+)
+model_registry.register(DEFAULT_MODEL, MODEL_PATH, **MODEL_OPTIONS)
+if os.environ.get('MODEL_REGISTRY'):
+    with open(os.environ['MODEL_REGISTRY'], 'r') as f:
+        model_registry.configure(json.load(f), MODEL_OPTIONS)
+if MODEL_LOADING == 'eager':
+    model_registry.preload()
+_model_error: Optional[str] = None
+
+def _load_in_background():
+    global _model_error
+    try:
+        model_registry.preload()
+    except Exception as e:
+        _model_error = str(e)
+        logger.error(f"Could not load model {MODEL_NAME}: {e}")
+
+# Blocking decode/inference/encode work runs here instead of on the event loop
+inference_executor = InferenceExecutor(
+    model_registry,
+    max_workers=INFERENCE_WORKERS,
+    max_queue_depth=int(os.environ.get('INFERENCE_QUEUE_DEPTH', '8')),
+)
+
+def stream_detection(model: 'YOLO', frame: np.ndarray):
+    """Run inference on a stream frame, returning (detections, class_ids)."""
+    with STAGE_SECONDS.time('inference'):
+        results = model(frame)
+    with STAGE_SECONDS.time('postprocess'):
+        return extract_detections(results[0], model.names)
+
+async def run_stream_detection(frame: np.ndarray):
+    try:
+        return await inference_executor.run(stream_detection, frame)
+    except ExecutorSaturated:
+        # Skip this frame rather than queueing behind uploads
+        return None
+
+# One shared capture/inference producer per stream source, fanned out to all viewers
+stream_hub = StreamHub(run_stream_detection)
+
+# Response modes for /api/detect
+RESPONSE_MODES = ("base64", "json", "jpeg")
+
+def detect_images(model: 'YOLO', uploads: List[tuple]) -> list:
+    """Decode a batch of (image bytes, response mode) uploads and run one forward pass.
+
+    Returns one response per upload, or an HTTPException for uploads that could
+    not be decoded. Boxes are only drawn and re-encoded when the mode asks for
+    an annotated image.
+    """
+    with STAGE_SECONDS.time('decode'):
+        images = [cv2.imdecode(np.frombuffer(contents, np.uint8), cv2.IMREAD_COLOR) for contents, _ in uploads]
+    valid = [i for i, img in enumerate(images) if img is not None]
+    responses = [HTTPException(status_code=400, detail="Could not decode image") for _ in images]
+    if not valid:
+        return responses
+
+    # Run inference on all decodable images at once
+    with STAGE_SECONDS.time('inference'):
+        results = model([images[i] for i in valid])
+
+    for i, r in zip(valid, results):
+        img = images[i]
+        mode = uploads[i][1]
+        with STAGE_SECONDS.time('postprocess'):
+            detections, _ = extract_detections(r, model.names)
+
+        if mode == "json":
+            responses[i] = {"detections": detections}
+            continue
+
+        # Draw detections on image
+        with STAGE_SECONDS.time('encode'):
+            draw_detections(img, detections)
+            _, buffer = cv2.imencode('.jpg', img)
+
+        if mode == "jpeg":
+            responses[i] = Response(
+                content=buffer.tobytes(),
+                media_type="image/jpeg",
+                headers={"X-Detections": json.dumps(detections, separators=(',', ':'))}
+            )
+        else:
+            # Convert image to base64
+            responses[i] = {
+                "detections": detections,
+                "image": base64.b64encode(buffer).decode('utf-8')
+            }
+    return responses
+
+# Concurrent /api/detect uploads share batched forward passes
+detect_batcher = MicroBatcher(
+    inference_executor,
+    detect_images,
+    max_batch_size=int(os.environ.get('DETECT_MAX_BATCH', '8')),
+    max_delay=float(os.environ.get('DETECT_MAX_DELAY_MS', '5')) / 1000,
+    max_pending=int(os.environ.get('DETECT_MAX_PENDING', '64')),
+)
+
+# Queue depths and totals are read from the live objects at scrape time
+REGISTRY.gauge('api_inference_pending', 'Inference jobs running or queued', collect=lambda: inference_executor.pending)
+REGISTRY.counter('api_inference_rejected_total', 'Inference jobs shed because the queue was full',
+                 collect=lambda: inference_executor.rejected)
+REGISTRY.gauge('api_detect_pending', 'Uploads waiting for a batch', collect=lambda: detect_batcher.pending)
+REGISTRY.counter('api_detect_batches_total', 'Batched forward passes for /api/detect',
+                 collect=lambda: detect_batcher.batches)
+REGISTRY.counter('api_detect_batched_images_total', 'Images run in /api/detect batches',
+                 collect=lambda: detect_batcher.batched_items)
+REGISTRY.gauge('api_model_memory_bytes', 'Estimated memory of loaded models', ['model', 'version'],
+               collect=lambda: {
+                   (stats['name'], stats['version']): stats['memory_bytes'] for stats in model_registry.stats()
+               })
+REGISTRY.gauge('api_stream_producers', 'Stream sources being captured', collect=lambda: len(stream_hub.producers))
+REGISTRY.gauge('api_stream_subscribers', 'Connected stream viewers',
+               collect=lambda: sum(len(p.subscribers) for p in list(stream_hub.producers.values())))
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics(request: Request):
+    """Prometheus text exposition of the metrics above, for local scrapers only by default."""
+    if not METRICS_ALLOW_REMOTE and request.client and request.client.host not in ('127.0.0.1', '::1', 'localhost'):
+        raise HTTPException(status_code=404)
+    return PlainTextResponse(REGISTRY.render(), media_type=METRICS_CONTENT_TYPE)
+
+@app.get("/health")
+async def health():
+    """Answers as soon as the app is up; `model` tells whether inference is ready yet."""
+    return {"status": "ok", "model": model_registry.status(), "pid": os.getpid(), "error": _model_error}
 
-# Store active video streams
-active_streams = {}
+@app.get("/api/models")
+async def list_models():
+    """Registered model versions, which ones are current and what they hold in memory."""
+    return {"serving": MODEL_NAME, "models": model_registry.stats()}
 
 @app.post("/api/detect")
-async def detect_objects(file: UploadFile = File(...)):
+async def detect_objects(
+    file: UploadFile = File(...),
+    response: str = Query("base64", description="json, jpeg (annotated binary) or base64"),
+):
+    if response not in RESPONSE_MODES:
+        raise HTTPException(status_code=422, detail=f"response must be one of {', '.join(RESPONSE_MODES)}")
+
     # Read the image
     contents = await file.read()
-    nparr = np.frombuffer(contents, np.uint8)
-    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-    
-    # Run inference
-    results = model(img)
-    
-    # Process results
-    detections = []
-    for r in results:
-        boxes = r.boxes
-        for box in boxes:
-            x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-            conf = float(box.conf[0].cpu().numpy())
-            cls = int(box.cls[0].cpu().numpy())
-            name = model.names[cls]
-            
-            detections.append({
-                "class": name,
-                "confidence": conf,
-                "bbox": [float(x1), float(y1), float(x2), float(y2)]
-            })
-    
-    # Draw detections on image
-    for det in detections:
-        x1, y1, x2, y2 = map(int, det["bbox"])
-        cv2.rectangle(img, (x1, y1), (x2, y2), (0, 255, 0), 2)
-        cv2.putText(img, f"{det['class']} {det['confidence']:.2f}", 
-                    (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-    
-    # Convert image to base64
-    _, buffer = cv2.imencode('.jpg', img)
-    img_base64 = base64.b64encode(buffer).decode('utf-8')
-    
-    return {
-        "detections": detections,
-        "image": img_base64
-    }
+    try:
+        result = await detect_batcher.submit((contents, response))
+    except ExecutorSaturated:
+        DETECT_REQUESTS.inc('rejected')
+        raise HTTPException(status_code=503, detail="Inference queue is full, retry later",
+                            headers={"Retry-After": "1"})
+    except HTTPException:
+        DETECT_REQUESTS.inc('bad_request')
+        raise
+    DETECT_REQUESTS.inc('ok')
+    return result
 
 @app.websocket("/ws/video/{stream_id}")
 async def video_stream(websocket: WebSocket, stream_id: str):
     await websocket.accept()
     logger.info(f"WebSocket connection accepted for stream {stream_id}")
+    subscriber = None
     
     try:
-        # Wait for the stream URL from the client
-        stream_url = await websocket.receive_text()
-        logger.info(f"Received stream URL: {stream_url}")
-        
-        # Initialize video capture
-        if stream_url.startswith('rtsp://') or stream_url.startswith('http://'):
-            cap = cv2.VideoCapture(stream_url)
-        else:
-            # Default to webcam if no valid URL provided
-            cap = cv2.VideoCapture(0)
-        
-        if not cap.isOpened():
-            error_msg = "Failed to open video stream"
-            logger.error(error_msg)
-            await websocket.send_json({"error": error_msg})
+        # Wait for the stream URL (or JSON stream options) from the client
+        options = parse_stream_options(await websocket.receive_text())
+        binary = options["protocol"] == "binary"
+        logger.info(f"Received stream URL: {options['url']} ({options['protocol']} protocol)")
+
+        try:
+            subscriber = await stream_hub.subscribe(options)
+        except IOError as e:
+            logger.error(str(e))
+            await websocket.send_json({"error": str(e)})
             return
-        
-        active_streams[stream_id] = cap
-        logger.info(f"Video capture initialized for stream {stream_id}")
-        
+        logger.info(f"Stream {stream_id} subscribed to {subscriber.producer.source}")
+
+        if binary:
+            # Class names are sent once so per-frame messages can use class ids
+            # Off the event loop: the model may still be loading
+            classes = await asyncio.get_running_loop().run_in_executor(None, model_registry.names)
+            await websocket.send_json({"type": "meta", "classes": classes})
+
         while True:
-            try:
-                ret, frame = cap.read()
-                if not ret:
-                    logger.error("Failed to read frame from video stream")
-                    break
-                
-                # Run inference
-                results = model(frame)
-                
-                # Process results
-                detections = []
-                for r in results:
-                    boxes = r.boxes
-                    for box in boxes:
-                        x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                        conf = float(box.conf[0].cpu().numpy())
-                        cls = int(box.cls[0].cpu().numpy())
-                        name = model.names[cls]
-                        
-                        detections.append({
-                            "class": name,
-                            "confidence": conf,
-                            "bbox": [float(x1), float(y1), float(x2), float(y2)]
-                        })
-                        
-                        # Draw bounding box
-                        cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), (0, 255, 0), 2)
-                        cv2.putText(frame, f"{name} {conf:.2f}", 
-                                  (int(x1), int(y1) - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-                
-                # Convert frame to base64
-                _, buffer = cv2.imencode('.jpg', frame)
-                frame_base64 = base64.b64encode(buffer).decode('utf-8')
-                
+            packet = await subscriber.queue.get()
+            if packet is None:
+                await websocket.send_json({"error": "Video stream ended"})
+                break
+
+            jpeg, scale = packet.encoded[subscriber.profile]
+            if binary:
+                # Detections first, then the raw JPEG it belongs to
+                await websocket.send_json({
+                    "seq": packet.seq,
+                    "d": compact_detections(packet.detections, packet.class_ids, scale)
+                })
+                await websocket.send_bytes(jpeg)
+            else:
                 # Send frame and detections
                 await websocket.send_json({
-                    "frame": frame_base64,
-                    "detections": detections
+                    "frame": base64.b64encode(jpeg).decode('utf-8'),
+                    "detections": scale_detections(packet.detections, scale)
                 })
-                
-                # Add small delay to control frame rate
-                await asyncio.sleep(0.1)
-                
-            except Exception as e:
-                logger.error(f"Error processing frame: {str(e)}")
-                await websocket.send_json({"error": f"Error processing frame: {str(e)}"})
-                break
             
     except Exception as e:
         logger.error(f"Error in video stream: {str(e)}")
@@ -157,23 +277,68 @@ async def video_stream(websocket: WebSocket, stream_id: str):
             pass
     finally:
         logger.info(f"Cleaning up stream {stream_id}")
-        if stream_id in active_streams:
-            active_streams[stream_id].release()
-            del active_streams[stream_id]
+        if subscriber is not None:
+            if subscriber.dropped:
+                logger.info(f"Stream {stream_id} dropped {subscriber.dropped} frames for a slow client")
+            await stream_hub.unsubscribe(subscriber)
         try:
             await websocket.close()
         except:
             pass
 
+@app.on_event("startup")
+async def startup_event():
+    if MODEL_LOADING == 'background':
+        threading.Thread(target=_load_in_background, name='model-preload', daemon=True).start()
+
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Shutting down application")
-    # Release all video captures
-    for stream_id, cap in active_streams.items():
-        logger.info(f"Releasing video capture for stream {stream_id}")
-        cap.release()
-    active_streams.clear()
+    # Stop all stream producers and release their captures
+    await stream_hub.shutdown()
+    await detect_batcher.shutdown()
+    inference_executor.shutdown()
+
+def preload_for_fork():
+    """Load and warm the served model in the parent so forked workers share its weights.
+
+    Warm-up runs single-threaded: a forked copy of an intra-op thread pool is
+    unusable, so no pool may exist yet at fork time. Exported runtimes build
+    their own thread pools when loaded, so they are left to each worker.
+    """
+    if MODEL_OPTIONS['backend'] != 'pytorch':
+        logger.info(f"{MODEL_OPTIONS['backend']} models are loaded per worker, not shared")
+        return
+    import torch
+
+    torch.set_num_threads(1)
+    model_registry.preload(threads=None)
+
+def make_post_fork(workers: int):
+    def post_fork():
+        if MODEL_OPTIONS['backend'] == 'pytorch':
+            import torch
+
+            # Split the cores between workers unless a thread count was configured
+            torch.set_num_threads(MODEL_OPTIONS['threads'] or max(1, (os.cpu_count() or 1) // workers))
+    return post_fork
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Detection API server")
+    parser.add_argument('--host', default="0.0.0.0")
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Preload the model, then fork this many workers sharing its weights")
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        from prefork import serve_preforked
+
+        serve_preforked(app, args.host, args.port, args.workers,
+                        preload=preload_for_fork, post_fork=make_post_fork(args.workers))
+    else:
+        import uvicorn
+
+        uvicorn.run(app, host=args.host, port=args.port)
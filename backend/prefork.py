@@ -0,0 +1,95 @@
+import gc
+import logging
+import os
+import signal
+import socket
+import time
+from typing import Callable, Dict, Optional
+
+import uvicorn
+
+logger = logging.getLogger(__name__)
+
+def _listen(host: str, port: int) -> socket.socket:
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+def _run_worker(app, sock: socket.socket, post_fork: Optional[Callable[[], None]]) -> None:
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    try:
+        if post_fork is not None:
+            post_fork()
+        uvicorn.Server(uvicorn.Config(app, log_level='info')).run(sockets=[sock])
+    finally:
+        os._exit(0)
+
+def serve_preforked(
+    app,
+    host: str,
+    port: int,
+    workers: int,
+    preload: Optional[Callable[[], None]] = None,
+    post_fork: Optional[Callable[[], None]] = None,
+) -> None:
+    """Run `workers` uvicorn processes forked from one parent that loaded the model first.
+
+    Unlike `uvicorn --workers`, which spawns fresh interpreters that each load
+    their own weights, forked workers start with the parent's memory and share
+    the read-only model pages copy-on-write. `preload` runs in the parent before
+    forking; `post_fork` runs in each worker before it starts serving. Workers
+    accept connections from one shared listening socket and are restarted if
+    they die.
+    """
+    if preload is not None:
+        started = time.time()
+        preload()
+        logger.info(f"Preloaded in {time.time() - started:.1f}s, forking {workers} workers")
+    # Objects moved to the permanent generation are never scanned, so the
+    # collector doesn't write to (and un-share) pages holding them
+    gc.collect()
+    gc.freeze()
+
+    sock = _listen(host, port)
+    children: Dict[int, int] = {}  # pid -> worker index
+
+    def spawn(index: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            _run_worker(app, sock, post_fork)
+        children[pid] = index
+
+    for index in range(workers):
+        spawn(index)
+    logger.info(f"Serving on http://{host}:{port} with {workers} preforked workers")
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        index = children.pop(pid, None)
+        if index is not None and not stopping:
+            logger.warning(f"Worker {index} (pid {pid}) exited with status {status}, restarting")
+            time.sleep(1)
+            spawn(index)
+    sock.close()
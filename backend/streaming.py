@@ -0,0 +1,265 @@
+import json
+import asyncio
+import logging
+import threading
+from typing import Callable, Dict, Optional, Set
+
+import cv2
+import numpy as np
+
+from shared.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# capture, decode, inference, postprocess and encode, for uploads and streams
+STAGE_SECONDS = REGISTRY.histogram('api_stage_seconds', 'Seconds spent per pipeline stage (sampled)', ['stage'])
+FRAMES_DROPPED = REGISTRY.counter('api_stream_frames_dropped_total', 'Stream frames replaced before a slow client read them')
+FRAMES_SKIPPED = REGISTRY.counter('api_stream_frames_skipped_total', 'Stream frames skipped because inference was saturated')
+
+# Default per-client stream settings; clients may override them by sending a
+# JSON object instead of a bare URL as their first message, e.g.
+# {"url": "rtsp://...", "protocol": "binary", "quality": 70, "width": 640}
+DEFAULT_STREAM_OPTIONS = {
+    "url": "",
+    "protocol": "json",  # "json" (base64 frame in send_json) or "binary"
+    "quality": 95,  # JPEG quality, 1-100
+    "width": None,  # downscale frames wider than this before encoding
+}
+
+def parse_stream_options(message: str) -> dict:
+    """Parse the client's first message: either a bare stream URL or a JSON object."""
+    options = dict(DEFAULT_STREAM_OPTIONS)
+    message = message.strip()
+    if message.startswith('{'):
+        options.update(json.loads(message))
+    else:
+        options["url"] = message
+
+    if options["protocol"] not in ("json", "binary"):
+        raise ValueError(f"Unsupported protocol: {options['protocol']}")
+    options["quality"] = max(1, min(100, int(options["quality"])))
+    if options["width"] is not None:
+        options["width"] = int(options["width"])
+    return options
+
+def encode_frame(frame: np.ndarray, quality: int = 95, width: Optional[int] = None):
+    """JPEG-encode a frame, optionally downscaled. Returns (jpeg bytes, scale factor)."""
+    scale = 1.0
+    if width and frame.shape[1] > width:
+        scale = width / frame.shape[1]
+        frame = cv2.resize(frame, (width, int(frame.shape[0] * scale)), interpolation=cv2.INTER_AREA)
+    _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return buffer.tobytes(), scale
+
+def compact_detections(detections: list, class_ids: list, scale: float = 1.0) -> list:
+    """Pack detections as [x1, y1, x2, y2, confidence, class_id] rows for the binary protocol."""
+    return [
+        [round(coord * scale, 1) for coord in det["bbox"]] + [round(det["confidence"], 3), cls]
+        for det, cls in zip(detections, class_ids)
+    ]
+
+def scale_detections(detections: list, scale: float) -> list:
+    """Detections with bboxes scaled to a downsized frame, for the JSON protocol."""
+    if scale == 1.0:
+        return detections
+    return [{**det, "bbox": [round(coord * scale, 1) for coord in det["bbox"]]} for det in detections]
+
+def draw_detections(frame: np.ndarray, detections: list) -> None:
+    """Draw bounding boxes and labels onto a frame in place."""
+    for det in detections:
+        x1, y1, x2, y2 = map(int, det["bbox"])
+        cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+        cv2.putText(frame, f"{det['class']} {det['confidence']:.2f}",
+                    (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+
+class FramePacket:
+    """One captured, inferred frame, JPEG-encoded once per distinct client profile."""
+
+    def __init__(self, seq: int, detections: list, class_ids: list, encoded: dict):
+        self.seq = seq
+        self.detections = detections
+        self.class_ids = class_ids
+        self.encoded = encoded  # (quality, width) -> (jpeg bytes, scale)
+
+class Subscriber:
+    """A viewer of a shared stream with a single-slot, latest-frame-wins queue."""
+
+    def __init__(self, options: dict):
+        self.options = options
+        self.profile = (options["quality"], options["width"])
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+        self.dropped = 0
+        self.producer: Optional['StreamProducer'] = None
+
+    def offer(self, packet: Optional[FramePacket]) -> None:
+        """Publish without blocking; a slow client loses its stale frame instead."""
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+            FRAMES_DROPPED.inc()
+        self.queue.put_nowait(packet)
+
+class StreamProducer:
+    """Captures, infers and encodes one stream source once for all its subscribers.
+
+    `detect` is awaited so inference can run off the event loop; it may return
+    None to skip a frame (e.g. when the inference queue is saturated).
+    """
+
+    def __init__(self, source, cap: cv2.VideoCapture, detect: Callable, frame_delay: float = 0.1):
+        self.source = source
+        self.cap = cap
+        self.detect = detect
+        self.frame_delay = frame_delay
+        self.subscribers: Set[Subscriber] = set()
+        self.task: Optional[asyncio.Task] = None
+        self.on_exit: Optional[Callable] = None
+        # A read cancelled on the event loop keeps running in its thread; release waits for it
+        self._cap_lock = threading.Lock()
+
+    @staticmethod
+    def _render(frame: np.ndarray, detections: list, profiles: set) -> dict:
+        with STAGE_SECONDS.time('encode'):
+            draw_detections(frame, detections)
+            return {
+                (quality, width): encode_frame(frame, quality, width)
+                for quality, width in profiles
+            }
+
+    def _read(self):
+        with self._cap_lock, STAGE_SECONDS.time('capture'):
+            return self.cap.read()
+
+    def _release(self):
+        with self._cap_lock:
+            self.cap.release()
+
+    async def run(self) -> None:
+        seq = 0
+        try:
+            while self.subscribers:
+                # Blocking capture and encode work stays off the event loop
+                ret, frame = await asyncio.to_thread(self._read)
+                if not ret:
+                    logger.error(f"Failed to read frame from video stream {self.source}")
+                    break
+
+                result = await self.detect(frame)
+                if result is None:
+                    FRAMES_SKIPPED.inc()
+                    await asyncio.sleep(self.frame_delay)
+                    continue
+                detections, class_ids = result
+
+                profiles = {subscriber.profile for subscriber in self.subscribers}
+                encoded = await asyncio.to_thread(self._render, frame, detections, profiles)
+                packet = FramePacket(seq, detections, class_ids, encoded)
+                for subscriber in list(self.subscribers):
+                    if subscriber.profile in encoded:
+                        subscriber.offer(packet)
+                seq += 1
+
+                # Add small delay to control frame rate
+                await asyncio.sleep(self.frame_delay)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error in stream producer for {self.source}: {e}")
+        finally:
+            # Unregister before awaiting anything, so a new viewer opens a fresh producer
+            if self.on_exit:
+                self.on_exit(self)
+            # Tell remaining viewers the stream has ended
+            for subscriber in list(self.subscribers):
+                subscriber.offer(None)
+            await asyncio.to_thread(self._release)
+
+class StreamHub:
+    """Reference-counted producers keyed by stream source, shared by all viewers.
+
+    `detect(frame)` is a coroutine returning `(detections, class_ids)` for a BGR
+    frame, or None to skip it.
+    """
+
+    def __init__(self, detect: Callable, frame_delay: float = 0.1):
+        self.detect = detect
+        self.frame_delay = frame_delay
+        self.producers: Dict[object, StreamProducer] = {}
+        # Only sources with a subscribe in flight have a lock, counted in _open_waiters
+        self._open_locks: Dict[object, asyncio.Lock] = {}
+        self._open_waiters: Dict[object, int] = {}
+
+    @staticmethod
+    def resolve_source(url: str):
+        if url.startswith('rtsp://') or url.startswith('http://'):
+            return url
+        # Default to webcam if no valid URL provided
+        return 0
+
+    async def _open(self, source) -> StreamProducer:
+        # Opening an RTSP stream can take seconds; don't stall the event loop
+        cap = await asyncio.to_thread(cv2.VideoCapture, source)
+        if not cap.isOpened():
+            cap.release()
+            raise IOError("Failed to open video stream")
+        producer = StreamProducer(source, cap, self.detect, self.frame_delay)
+        producer.on_exit = self._remove
+        self.producers[source] = producer
+        logger.info(f"Started stream producer for {source}")
+        return producer
+
+    def _remove(self, producer: StreamProducer) -> None:
+        if self.producers.get(producer.source) is producer:
+            del self.producers[producer.source]
+            logger.info(f"Stopped stream producer for {producer.source}")
+
+    async def subscribe(self, options: dict) -> Subscriber:
+        """Attach a viewer, starting the stream's producer if it isn't running yet."""
+        source = self.resolve_source(options["url"])
+        # Concurrent first viewers of a source must not open it twice
+        lock = self._open_locks.setdefault(source, asyncio.Lock())
+        self._open_waiters[source] = self._open_waiters.get(source, 0) + 1
+        try:
+            async with lock:
+                producer = self.producers.get(source)
+                if producer is None:
+                    producer = await self._open(source)
+        finally:
+            self._open_waiters[source] -= 1
+            if not self._open_waiters[source]:
+                del self._open_waiters[source]
+                del self._open_locks[source]
+
+        subscriber = Subscriber(options)
+        subscriber.producer = producer
+        producer.subscribers.add(subscriber)
+        if producer.task is None:
+            producer.task = asyncio.create_task(producer.run())
+        return subscriber
+
+    async def unsubscribe(self, subscriber: Subscriber) -> None:
+        """Detach a viewer; the producer shuts down when its last viewer leaves."""
+        producer = subscriber.producer
+        if producer is None:
+            return
+        producer.subscribers.discard(subscriber)
+        subscriber.producer = None
+        if not producer.subscribers:
+            # Unregistered before cancelling, so a viewer arriving meanwhile starts a new producer
+            self._remove(producer)
+            if producer.task and not producer.task.done():
+                producer.task.cancel()
+                try:
+                    await producer.task
+                except asyncio.CancelledError:
+                    pass
+
+    async def shutdown(self) -> None:
+        for producer in list(self.producers.values()):
+            if producer.task and not producer.task.done():
+                producer.task.cancel()
+                try:
+                    await producer.task
+                except asyncio.CancelledError:
+                    pass
+        self.producers.clear()
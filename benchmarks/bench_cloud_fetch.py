@@ -0,0 +1,91 @@
+"""Sequential CloudCamera polling vs AsyncCloudCameraPool against the local stub.
+
+Usage (from the repository root):
+
+    python benchmarks/bench_cloud_fetch.py --cameras 50 --latency-ms 80 --rounds 5
+
+The stub server (benchmarks/cloud_camera_stub.py) runs in a background thread.
+For each mode the script polls every camera --rounds times and reports
+wall time per round, decoded frames and skipped (304) frames.
+"""
+import argparse
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from aiohttp import web
+
+from camera_connector import AsyncCloudCameraPool, CloudCamera
+from cloud_camera_stub import build_app
+
+def start_stub(port: int, latency_ms: float, change_every: float) -> None:
+    loop = asyncio.new_event_loop()
+    runner = web.AppRunner(build_app(latency_ms, change_every))
+
+    def serve():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(runner.setup())
+        loop.run_until_complete(web.TCPSite(runner, '127.0.0.1', port).start())
+        loop.run_forever()
+
+    threading.Thread(target=serve, daemon=True).start()
+    time.sleep(0.5)
+
+def camera_configs(port: int, count: int) -> dict:
+    return {
+        f"cam{i}": {'api_url': f"http://127.0.0.1:{port}/cam{i}", 'api_key': 'bench'}
+        for i in range(count)
+    }
+
+def bench_sequential(configs: dict, rounds: int, interval: float) -> dict:
+    cameras = [CloudCamera(c['api_url'], c['api_key']) for c in configs.values()]
+    for camera in cameras:
+        camera.connect()
+    times, frames = [], 0
+    for _ in range(rounds):
+        start = time.perf_counter()
+        frames += sum(camera.get_frame() is not None for camera in cameras)
+        times.append(time.perf_counter() - start)
+        time.sleep(max(0.0, interval - times[-1]))
+    return {'round_s': sum(times) / len(times), 'frames': frames, 'skipped': 0}
+
+async def bench_async(configs: dict, rounds: int, interval: float) -> dict:
+    async with AsyncCloudCameraPool(configs) as pool:
+        await pool.connect_all()
+        times = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            await pool.fetch_all()
+            times.append(time.perf_counter() - start)
+            await asyncio.sleep(max(0.0, interval - times[-1]))
+        frames = sum(s['frames'] for s in pool.stats.values())
+        skipped = sum(s['not_modified'] for s in pool.stats.values())
+    return {'round_s': sum(times) / len(times), 'frames': frames, 'skipped': skipped}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cameras', type=int, default=50)
+    parser.add_argument('--latency-ms', type=float, default=80.0)
+    parser.add_argument('--change-every', type=float, default=2.0)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--interval', type=float, default=0.5, help='Target seconds between polling rounds')
+    parser.add_argument('--port', type=int, default=8090)
+    args = parser.parse_args()
+
+    start_stub(args.port, args.latency_ms, args.change_every)
+    configs = camera_configs(args.port, args.cameras)
+
+    results = {
+        'sequential': bench_sequential(configs, args.rounds, args.interval),
+        'async pool': asyncio.run(bench_async(configs, args.rounds, args.interval)),
+    }
+    print(f"{'mode':<12} {'s/round':>9} {'decoded':>8} {'304s':>6}")
+    for name, r in results.items():
+        print(f"{name:<12} {r['round_s']:>9.3f} {r['frames']:>8} {r['skipped']:>6}")
+
+if __name__ == '__main__':
+    main()
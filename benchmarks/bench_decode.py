@@ -0,0 +1,71 @@
+"""Decode CPU per stream for different decoder options (shared.decode).
+
+Usage (from the repository root):
+
+    python benchmarks/bench_decode.py rtsp://cam/Streaming/Channels/101 --seconds 20
+
+Each configuration opens the stream, reads frames for --seconds and reports
+process CPU time (all decoder threads included) as a percentage of one core,
+plus delivered fps and CPU ms per delivered frame. A local video file works as
+well, but then only the ffmpeg options are meaningful.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from shared.decode import DEFAULT_DECODE_OPTIONS, open_capture, read_frame
+
+CONFIGS = [
+    ('ffmpeg default', {'buffer_size': 0}),
+    ('ffmpeg buffer 1', {}),
+    ('ffmpeg substream', {'substream': True}),
+    ('ffmpeg every 5th', {'frame_step': 5}),
+    ('ffmpeg hw', {'hw_accel': True}),
+    ('gstreamer 640x360', {'backend': 'gstreamer', 'width': 640, 'height': 360}),
+    ('gstreamer 640x360 2fps', {'backend': 'gstreamer', 'width': 640, 'height': 360, 'max_fps': 2}),
+]
+
+def measure(url: str, options: dict, seconds: float):
+    decode = {**DEFAULT_DECODE_OPTIONS, **options}
+    cap = open_capture(url, decode)
+    if not cap.isOpened():
+        return None
+    frames = 0
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    while time.perf_counter() - wall_start < seconds:
+        frame = read_frame(cap, decode)
+        if frame is None:
+            break
+        frames += 1
+    cpu = time.process_time() - cpu_start
+    wall = time.perf_counter() - wall_start
+    cap.release()
+    shape = f"{frame.shape[1]}x{frame.shape[0]}" if frames and frame is not None else '-'
+    return frames, cpu, wall, shape
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('url')
+    parser.add_argument('--seconds', type=float, default=15.0)
+    parser.add_argument('--only', nargs='*', help='Run only configs whose name contains one of these')
+    args = parser.parse_args()
+
+    print(f"{'config':<24}{'size':>11}{'fps':>8}{'cpu %':>8}{'cpu ms/frame':>14}")
+    for name, options in CONFIGS:
+        if args.only and not any(term in name for term in args.only):
+            continue
+        result = measure(args.url, options, args.seconds)
+        if result is None:
+            print(f"{name:<24}{'failed to open':>41}")
+            continue
+        frames, cpu, wall, shape = result
+        print(
+            f"{name:<24}{shape:>11}{frames / wall:>8.1f}{cpu / wall * 100:>8.0f}"
+            f"{(cpu / frames * 1000 if frames else 0):>14.1f}"
+        )
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,518 @@
+"""End-to-end benchmark: simulated cameras through the detection service and the backend API.
+
+Serves N synthetic (or recorded) MJPEG cameras from a local camera farm
+(benchmarks/synthetic_cameras.py) and drives, per camera count:
+
+  service  AIDetectionService in a child process, cameras connected over HTTP
+  api      N clients POSTing frames to /api/detect at the camera rate
+  ws       N clients watching /ws/video/<id>, one farm camera each
+
+For each run it reports frames/s (total and per camera), end-to-end latency
+percentiles, and CPU and RSS totals and per camera, then writes everything
+to a JSON file. Service and ws latency is from the camera's capture timestamp
+(stamped into the frame) to the detection result. For api it is the request
+round trip.
+
+Usage (from the repository root):
+
+    python benchmarks/bench_e2e.py --scenarios service --cameras 1 4 8 --model ai-detection/models/yolov8n.pt
+    python benchmarks/bench_e2e.py --scenarios api ws --cameras 1 4 16 --start-backend
+    python benchmarks/bench_e2e.py --cameras 4 --output new.json --compare old.json
+
+Service options go through --service-config as JSON or a file path, e.g.
+--service-config '{"batching": {"enabled": true}, "threaded_capture": true}'.
+Backend CPU/RSS are only reported with --start-backend (otherwise its pid is unknown).
+"""
+import argparse
+import http.client
+import json
+import multiprocessing as mp
+import os
+import platform
+import queue
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlparse
+
+import cv2
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from synthetic_cameras import CameraFarm, latency, synthetic_frames
+
+ROOT = Path(__file__).resolve().parent.parent
+SCENARIOS = ('service', 'api', 'ws')
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def process_usage(pid):
+    """(CPU seconds, RSS bytes) of a process, from /proc or psutil; (None, None) if unavailable."""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        cpu = (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+        with open(f'/proc/{pid}/statm') as f:
+            rss = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        return cpu, rss
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import psutil
+
+        process = psutil.Process(pid)
+        times = process.cpu_times()
+        return times.user + times.system, process.memory_info().rss
+    except Exception:
+        return None, None
+
+class Recorder:
+    """Thread-safe frame counts and latencies for one measurement window."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.latencies = []
+            self.frames = {}
+            self.unstamped = 0
+            self.errors = {}
+
+    def record(self, key, seconds):
+        with self._lock:
+            self.frames[key] = self.frames.get(key, 0) + 1
+            if seconds is None:
+                self.unstamped += 1
+            else:
+                self.latencies.append(seconds)
+
+    def fail(self, reason):
+        with self._lock:
+            self.errors[reason] = self.errors.get(reason, 0) + 1
+
+    def result(self, elapsed, cameras):
+        with self._lock:
+            latencies = [seconds * 1000 for seconds in self.latencies]
+            frames = sum(self.frames.values())
+            per_camera = [self.frames.get(key, 0) / elapsed for key in sorted(self.frames)]
+            return {
+                'frames': frames,
+                'fps': round(frames / elapsed, 2),
+                'fps_per_camera': round(frames / elapsed / cameras, 2),
+                'fps_min_camera': round(min(per_camera), 2) if len(per_camera) == cameras else 0.0,
+                'latency_ms': {
+                    'p50': round(percentile(latencies, 50), 1),
+                    'p90': round(percentile(latencies, 90), 1),
+                    'p99': round(percentile(latencies, 99), 1),
+                    'max': round(max(latencies), 1) if latencies else 0.0,
+                },
+                'unstamped_frames': self.unstamped,
+                'errors': dict(self.errors),
+            }
+
+class UsageWindow:
+    """CPU and RSS of one process over a measurement window, relative to a baseline."""
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.baseline_rss = process_usage(pid)[1] if pid else None
+
+    def start(self):
+        self.started = time.time()
+        self.cpu_start, self.peak_rss = process_usage(self.pid) if self.pid else (None, None)
+
+    def sample(self):
+        if self.pid:
+            rss = process_usage(self.pid)[1]
+            if rss is not None:
+                self.peak_rss = max(self.peak_rss or 0, rss)
+
+    def stop(self, cameras):
+        elapsed = time.time() - self.started
+        cpu, rss = process_usage(self.pid) if self.pid else (None, None)
+        if cpu is None or self.cpu_start is None:
+            return {'cpu_percent': None, 'cpu_percent_per_camera': None,
+                    'rss_mb': None, 'peak_rss_mb': None, 'rss_mb_per_camera': None}
+        cpu_percent = (cpu - self.cpu_start) / elapsed * 100
+        mb = 1024 * 1024
+        return {
+            'cpu_percent': round(cpu_percent, 1),
+            'cpu_percent_per_camera': round(cpu_percent / cameras, 1),
+            'rss_mb': round(rss / mb, 1),
+            'peak_rss_mb': round(max(self.peak_rss or 0, rss) / mb, 1),
+            # Memory the cameras added on top of the loaded model
+            'rss_mb_per_camera': round((rss - self.baseline_rss) / mb / cameras, 1),
+        }
+
+def measure(recorder, usage, warmup, duration, cameras):
+    """Let the pipeline settle, then count a fresh window of `duration` seconds."""
+    time.sleep(warmup)
+    recorder.reset()
+    usage.start()
+    started = time.time()
+    while time.time() - started < duration:
+        time.sleep(max(0.0, min(1.0, duration - (time.time() - started))))
+        usage.sample()
+    elapsed = time.time() - started
+    return {'duration_s': round(elapsed, 1), **recorder.result(elapsed, cameras), **usage.stop(cameras)}
+
+def load_overrides(value):
+    if not value:
+        return {}
+    if value.lstrip().startswith('{'):
+        return json.loads(value)
+    with open(value) as f:
+        return json.load(f)
+
+def merge(base, overrides):
+    merged = dict(base)
+    for key, value in overrides.items():
+        merged[key] = merge(merged[key], value) if isinstance(value, dict) and isinstance(merged.get(key), dict) else value
+    return merged
+
+def alert_sink(port=0):
+    """Accept and discard alert POSTs so the service's dispatcher never spools."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            self.send_response(200)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    threading.Thread(target=server.serve_forever, name='alert-sink', daemon=True).start()
+    return server
+
+# --- service -------------------------------------------------------------------
+
+def _service_run(config, urls, source_width, warmup, duration, results):
+    """Child process: one AIDetectionService with `urls` as its cameras."""
+    sys.path.insert(0, str(ROOT / 'ai-detection' / 'src'))
+    from main import AIDetectionService
+
+    with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+        json.dump(config, f)
+    try:
+        service = AIDetectionService(f.name)
+    finally:
+        os.unlink(f.name)
+
+    usage = UsageWindow(os.getpid())  # baseline: model loaded, no cameras yet
+    recorder = Recorder()
+    process_frame, process_batch, send_alert = service.process_frame, service.process_batch, service.send_alert
+
+    def timed_frame(frame, camera_id):
+        detection = process_frame(frame, camera_id)
+        recorder.record(camera_id, latency(frame, source_width))
+        return detection
+
+    def timed_batch(frames):
+        detections = process_batch(frames)
+        done = time.time()
+        for camera_id, frame in frames.items():
+            recorder.record(camera_id, latency(frame, source_width, done))
+        return detections
+
+    alerts = []
+
+    def counted_alert(detection):
+        alerts.append(1)
+        send_alert(detection)
+
+    service.process_frame, service.process_batch, service.send_alert = timed_frame, timed_batch, counted_alert
+
+    cameras = {f'SIM-{i:03d}': url for i, url in enumerate(urls)}
+    connected = service.connect_cameras(cameras)
+    threading.Thread(target=service.run, name='service', daemon=True).start()
+
+    result = measure(recorder, usage, warmup, duration, len(cameras))
+    result['connected'] = sum(1 for ok in connected.values() if ok)
+    result['alerts'] = len(alerts)
+    result['scheduler_skipped_slots'] = sum(s['skipped_slots'] for s in service.scheduler.stats().values())
+
+    for camera_id in cameras:
+        service.scheduler.remove(camera_id)
+    service.shutdown()
+    results.put(result)
+
+def run_service(args, farm, cameras, sink_url):
+    config = merge({
+        'model_path': args.model,
+        'alert_endpoint': sink_url,
+        'scheduling': {'fps': args.fps},
+        'metrics': {'enabled': False},
+        'cameras': {},
+    }, load_overrides(args.service_config))
+    urls = [farm.url(i % farm.cameras) for i in range(cameras)]
+
+    ctx = mp.get_context('spawn')
+    results = ctx.Queue()
+    child = ctx.Process(target=_service_run, args=(config, urls, farm.width, args.warmup, args.duration, results))
+    child.start()
+    try:
+        deadline = time.time() + args.warmup + args.duration + args.startup_timeout
+        while time.time() < deadline:
+            try:
+                return results.get(timeout=1)
+            except queue.Empty:
+                if not child.is_alive():
+                    raise RuntimeError(f"Service run exited with {child.exitcode}")
+        raise RuntimeError("Service run timed out")
+    finally:
+        child.join(30)
+        if child.is_alive():
+            child.terminate()
+
+# --- backend -------------------------------------------------------------------
+
+def start_backend(url, timeout):
+    """Start the backend under uvicorn and wait until its model is loaded; returns the process.
+
+    /health answers while the model is still loading in the background, so a
+    200 alone would let the baseline RSS be taken before the weights are in.
+    """
+    target = urlparse(url)
+    log = tempfile.NamedTemporaryFile('w', prefix='bench_backend_', suffix='.log', delete=False)
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'main:app', '--host', target.hostname, '--port', str(target.port or 80)],
+        cwd=ROOT / 'backend', stdout=log, stderr=subprocess.STDOUT,
+    )
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Backend exited with {process.returncode}, see {log.name}")
+        try:
+            conn = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=2)
+            conn.request('GET', '/health')
+            response = conn.getresponse()
+            if response.status == 200:
+                health = json.loads(response.read())
+                if health['model'] == 'ready':
+                    return process
+                if health.get('error'):
+                    process.terminate()
+                    raise RuntimeError(f"Backend failed to load its model: {health['error']}")
+        except OSError:
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError(f"Backend did not become ready within {timeout:.0f}s, see {log.name}")
+
+def multipart_body(image: bytes):
+    boundary = 'benche2e' + os.urandom(8).hex()
+    body = (
+        f"--{boundary}\r\n"
+        'Content-Disposition: form-data; name="file"; filename="frame.jpg"\r\n'
+        "Content-Type: image/jpeg\r\n\r\n"
+    ).encode() + image + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+def run_api(args, farm, clients, usage):
+    target = urlparse(args.backend_url)
+    frames = synthetic_frames(20, farm.width, farm.height)
+    bodies = [multipart_body(cv2.imencode('.jpg', frame)[1].tobytes()) for frame in frames]
+    path = f"/api/detect?response={args.response}"
+    recorder = Recorder()
+    stop = threading.Event()
+
+    def client(index):
+        conn = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=60)
+        tick = 0
+        started = time.time()
+        while not stop.is_set():
+            body, content_type = bodies[(index + tick) % len(bodies)]
+            start = time.perf_counter()
+            try:
+                conn.request('POST', path, body=body, headers={'Content-Type': content_type})
+                response = conn.getresponse()
+                response.read()
+                if response.status == 200:
+                    recorder.record(index, time.perf_counter() - start)
+                else:
+                    recorder.fail(f"http_{response.status}")
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=60)
+                recorder.fail('connection')
+            # Pace each client like a camera; a slow server just lowers its rate
+            tick += 1
+            delay = started + tick / args.fps - time.time()
+            if delay > 0:
+                stop.wait(delay)
+            else:
+                tick = int((time.time() - started) * args.fps)
+        conn.close()
+
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    try:
+        return measure(recorder, usage, args.warmup, args.duration, clients)
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join(5)
+
+def run_ws(args, farm, clients, usage):
+    from websockets.sync.client import connect
+
+    target = urlparse(args.backend_url)
+    base = f"ws://{target.hostname}:{target.port or 80}/ws/video"
+    recorder = Recorder()
+    stop = threading.Event()
+
+    def client(index):
+        camera = 0 if args.shared_stream else index % farm.cameras
+        try:
+            with connect(f"{base}/bench-{index}", max_size=None, open_timeout=30) as ws:
+                ws.send(json.dumps({'url': farm.url(camera), 'protocol': 'binary', 'quality': 80}))
+                while not stop.is_set():
+                    try:
+                        message = ws.recv(timeout=1)
+                    except TimeoutError:
+                        continue
+                    if isinstance(message, str):
+                        if 'error' in message:
+                            recorder.fail(json.loads(message).get('error', 'error'))
+                            return
+                        continue
+                    frame = cv2.imdecode(memoryview(message), cv2.IMREAD_COLOR)
+                    recorder.record(index, latency(frame, farm.width))
+        except Exception as e:
+            recorder.fail(type(e).__name__)
+
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    try:
+        return measure(recorder, usage, args.warmup, args.duration, clients)
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join(5)
+
+# --- reporting -----------------------------------------------------------------
+
+def metadata(args):
+    def git(*command):
+        try:
+            return subprocess.run(['git', *command], cwd=ROOT, capture_output=True, text=True, timeout=10).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            return None
+
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'git_commit': git('rev-parse', 'HEAD'),
+        'git_dirty': bool(git('status', '--porcelain', '--untracked-files=no')),
+        'host': platform.node(),
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+        'args': vars(args),
+    }
+
+def print_result(result):
+    cpu = result['cpu_percent_per_camera']
+    rss = result['rss_mb_per_camera']
+    print(
+        f"{result['scenario']:>8} {result['cameras']:>4} cams: {result['fps']:7.1f} fps "
+        f"({result['fps_per_camera']:5.2f}/cam)  latency p50 {result['latency_ms']['p50']:7.1f} "
+        f"p99 {result['latency_ms']['p99']:7.1f} ms  "
+        f"CPU/cam {'-' if cpu is None else f'{cpu:.1f}%':>6}  RSS/cam {'-' if rss is None else f'{rss:.1f} MB':>8}"
+        + (f"  errors {result['errors']}" if result['errors'] else '')
+    )
+
+def compare(results, baseline_path):
+    """Print fps and p99 latency changes against an earlier results file."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    previous = {(r['scenario'], r['cameras']): r for r in baseline['results']}
+    print(f"\nAgainst {baseline_path} ({baseline['meta'].get('git_commit') or 'unknown commit'}):")
+    for result in results:
+        old = previous.get((result['scenario'], result['cameras']))
+        if old is None:
+            continue
+        fps_change = (result['fps'] / old['fps'] - 1) * 100 if old['fps'] else 0.0
+        old_p99, new_p99 = old['latency_ms']['p99'], result['latency_ms']['p99']
+        p99_change = (new_p99 / old_p99 - 1) * 100 if old_p99 else 0.0
+        print(
+            f"{result['scenario']:>8} {result['cameras']:>4} cams: fps {old['fps']:.1f} -> {result['fps']:.1f} "
+            f"({fps_change:+.1f}%), p99 {old_p99:.1f} -> {new_p99:.1f} ms ({p99_change:+.1f}%)"
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--cameras', type=int, nargs='+', default=[1, 4, 8],
+                        help='Simulated cameras (or API/WebSocket clients) per run')
+    parser.add_argument('--duration', type=float, default=30.0, help='Measured seconds per run')
+    parser.add_argument('--warmup', type=float, default=5.0, help='Unmeasured seconds before each run')
+    parser.add_argument('--fps', type=float, default=5.0, help='Target detections (or requests) per second per camera')
+    parser.add_argument('--camera-fps', type=float, default=10.0, help='Frame rate of each simulated camera')
+    parser.add_argument('--width', type=int, default=640)
+    parser.add_argument('--height', type=int, default=480)
+    parser.add_argument('--video', help='Recorded video to loop instead of synthetic frames')
+    parser.add_argument('--farm-port', type=int, default=8554)
+    parser.add_argument('--model', default='yolov8n.pt', help='model_path for the detection service')
+    parser.add_argument('--service-config', help='JSON (or a JSON file) merged into the service config')
+    parser.add_argument('--startup-timeout', type=float, default=120.0)
+    parser.add_argument('--backend-url', default='http://127.0.0.1:8000')
+    parser.add_argument('--start-backend', action='store_true', help='Start the backend under uvicorn for the api/ws runs')
+    parser.add_argument('--response', default='json', help='/api/detect response mode')
+    parser.add_argument('--shared-stream', action='store_true', help='Point every ws client at the same camera')
+    parser.add_argument('--output', default='e2e_results.json')
+    parser.add_argument('--compare', help='Earlier results file to compare against')
+    args = parser.parse_args()
+
+    farm = CameraFarm(max(args.cameras), args.camera_fps, args.width, args.height, args.video, args.farm_port).start()
+    sink = alert_sink()
+    sink_url = f"http://127.0.0.1:{sink.server_address[1]}/api/alerts"
+    backend = None
+    results = []
+    try:
+        if args.start_backend and {'api', 'ws'} & set(args.scenarios):
+            backend = start_backend(args.backend_url, args.startup_timeout)
+        # Baseline RSS is taken once, with the model loaded and no clients
+        backend_usage = UsageWindow(backend.pid if backend else None)
+
+        for scenario in args.scenarios:
+            for cameras in args.cameras:
+                if scenario == 'service':
+                    result = run_service(args, farm, cameras, sink_url)
+                elif scenario == 'api':
+                    result = run_api(args, farm, cameras, backend_usage)
+                else:
+                    result = run_ws(args, farm, cameras, backend_usage)
+                result = {'scenario': scenario, 'cameras': cameras, **result}
+                results.append(result)
+                print_result(result)
+    finally:
+        if backend is not None:
+            backend.terminate()
+            backend.wait(30)
+        sink.shutdown()
+        farm.stop()
+
+    with open(args.output, 'w') as f:
+        json.dump({'meta': metadata(args), 'results': results}, f, indent=2)
+    print(f"Wrote {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == '__main__':
+    main()
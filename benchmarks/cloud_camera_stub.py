@@ -0,0 +1,72 @@
+"""Local stand-in for a cloud camera API, for benchmarking CloudCamera fetches.
+
+Usage (from the repository root):
+
+    python benchmarks/cloud_camera_stub.py --latency-ms 80 --port 8090
+
+Every camera id is served under http://127.0.0.1:<port>/<camera_id>/status and
+/<camera_id>/frame. Frames are JPEGs that change every --change-every seconds
+and carry an ETag, so If-None-Match requests get a 304 in between. The
+artificial latency simulates the round trip to a real provider.
+"""
+import argparse
+import asyncio
+import hashlib
+import time
+
+import cv2
+import numpy as np
+from aiohttp import web
+
+def render_frame(camera_id: str, version: int, width: int, height: int) -> bytes:
+    frame = np.full((height, width, 3), 40, dtype=np.uint8)
+    offset = (version * 37) % max(width - 120, 1)
+    cv2.rectangle(frame, (offset, height // 3), (offset + 120, height // 3 + 200), (0, 180, 255), -1)
+    cv2.putText(frame, f"{camera_id} #{version}", (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+    return cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 80])[1].tobytes()
+
+def build_app(latency_ms: float = 50.0, change_every: float = 1.0, width: int = 1280, height: int = 720) -> web.Application:
+    cache = {}
+    stats = {'status': 0, 'frames': 0, 'not_modified': 0}
+
+    def current(camera_id: str):
+        version = int(time.time() / change_every)
+        key = (camera_id, version)
+        if key not in cache:
+            body = render_frame(camera_id, version, width, height)
+            cache[key] = (body, f'"{hashlib.md5(body).hexdigest()}"')
+        return cache[key]
+
+    async def status(request):
+        await asyncio.sleep(latency_ms / 1000)
+        stats['status'] += 1
+        return web.json_response({'camera_id': request.match_info['camera_id'], 'online': True})
+
+    async def frame(request):
+        await asyncio.sleep(latency_ms / 1000)
+        body, etag = current(request.match_info['camera_id'])
+        if request.headers.get('If-None-Match') == etag:
+            stats['not_modified'] += 1
+            return web.Response(status=304, headers={'ETag': etag})
+        stats['frames'] += 1
+        return web.Response(body=body, content_type='image/jpeg', headers={'ETag': etag})
+
+    async def get_stats(request):
+        return web.json_response(stats)
+
+    app = web.Application()
+    app.router.add_get('/_stats', get_stats)
+    app.router.add_get('/{camera_id}/status', status)
+    app.router.add_get('/{camera_id}/frame', frame)
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--latency-ms', type=float, default=50.0)
+    parser.add_argument('--change-every', type=float, default=1.0)
+    args = parser.parse_args()
+    web.run_app(build_app(args.latency_ms, args.change_every), host='127.0.0.1', port=args.port)
+
+if __name__ == '__main__':
+    main()
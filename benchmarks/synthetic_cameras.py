@@ -0,0 +1,226 @@
+"""Local stand-ins for IP cameras: MJPEG-over-HTTP streams from synthetic or recorded video.
+
+Usage (from the repository root):
+
+    python benchmarks/synthetic_cameras.py --cameras 8 --fps 10 --port 8554
+    python benchmarks/synthetic_cameras.py --cameras 8 --video site.mp4
+
+Camera i is served at http://127.0.0.1:<port>/cam/<i>.mjpg, which
+cv2.VideoCapture (FFmpeg), AIDetectionService and the backend's /ws/video
+open like any other network camera. Every frame carries its capture time as
+a black/white barcode along the top edge, so whoever ends up holding the
+frame can compute end-to-end latency with read_stamp() without sharing
+state with this process.
+"""
+import argparse
+import multiprocessing as mp
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+
+import cv2
+import numpy as np
+
+STAMP_BITS = 24  # milliseconds modulo 2**24 (~4.6 hours)
+CHECK_BITS = 4
+STAMP_CELL = 16  # pixels per barcode cell in the source frame
+STAMP_MODULO = 2 ** STAMP_BITS
+
+def stamp(frame: np.ndarray, now: Optional[float] = None) -> None:
+    """Write the capture time into the frame's top-left corner, in place."""
+    value = int((now if now is not None else time.time()) * 1000) % STAMP_MODULO
+    bits = [(value >> i) & 1 for i in range(STAMP_BITS)]
+    bits += [((value % 13) >> i) & 1 for i in range(CHECK_BITS)]
+    for i, bit in enumerate(bits):
+        frame[:STAMP_CELL, i * STAMP_CELL:(i + 1) * STAMP_CELL] = 255 if bit else 0
+
+def read_stamp(frame: np.ndarray, source_width: int) -> Optional[float]:
+    """Recover a frame's capture time (seconds, modulo ~4.6 h) or None if unreadable.
+
+    `source_width` is the width the frame was stamped at, so frames that were
+    resized on the way (decoder scaling, stream profiles) still read correctly.
+    """
+    if frame is None or frame.ndim != 3:
+        return None
+    scale = frame.shape[1] / source_width
+    cell = STAMP_CELL * scale
+    y = int(cell / 2)
+    bits = [
+        int(frame[y, int((i + 0.5) * cell)].mean() > 127)
+        for i in range(STAMP_BITS + CHECK_BITS)
+    ]
+    value = sum(bit << i for i, bit in enumerate(bits[:STAMP_BITS]))
+    check = sum(bit << i for i, bit in enumerate(bits[STAMP_BITS:]))
+    if value % 13 != check:
+        return None
+    return value / 1000
+
+def latency(frame: np.ndarray, source_width: int, now: Optional[float] = None) -> Optional[float]:
+    """Seconds between a stamped frame's capture and `now`."""
+    stamped = read_stamp(frame, source_width)
+    if stamped is None:
+        return None
+    now_ms = int((now if now is not None else time.time()) * 1000)
+    return ((now_ms - int(stamped * 1000)) % STAMP_MODULO) / 1000
+
+def synthetic_frames(count: int, width: int, height: int, seed: int = 0) -> List[np.ndarray]:
+    """A loop of frames with a textured background and a few moving person-sized boxes."""
+    rng = np.random.default_rng(seed)
+    background = cv2.GaussianBlur(rng.integers(60, 200, (height, width, 3), dtype=np.uint8), (0, 0), 9)
+    movers = [
+        (rng.uniform(0, width), rng.uniform(height * 0.3, height * 0.7), rng.uniform(-6, 6), rng.uniform(-2, 2),
+         tuple(int(c) for c in rng.integers(0, 255, 3)))
+        for _ in range(3)
+    ]
+    frames = []
+    for t in range(count):
+        frame = background.copy()
+        for x, y, dx, dy, color in movers:
+            cx = int((x + dx * t) % width)
+            cy = int(np.clip(y + dy * t, 0, height - 1))
+            cv2.rectangle(frame, (cx - 30, cy - 90), (cx + 30, cy + 90), color, -1)
+            cv2.circle(frame, (cx, cy - 110), 22, color, -1)
+        frames.append(frame)
+    return frames
+
+def video_frames(path: str, width: int, max_frames: int = 300) -> List[np.ndarray]:
+    """Load (and downscale) up to `max_frames` frames of a recorded video to loop over."""
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        if frame.shape[1] != width:
+            frame = cv2.resize(frame, (width, int(frame.shape[0] * width / frame.shape[1])))
+        frames.append(frame)
+    cap.release()
+    if not frames:
+        raise IOError(f"Could not read any frames from {path}")
+    return frames
+
+def build_server(frames: List[np.ndarray], cameras: int, fps: float, port: int,
+                 host: str = '127.0.0.1', quality: int = 80) -> ThreadingHTTPServer:
+    """HTTP server streaming `cameras` MJPEG feeds of the frame loop, each at `fps`."""
+    started = time.time()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            name = self.path.rsplit('/', 1)[-1]
+            if not (self.path.startswith('/cam/') and name.endswith('.mjpg')):
+                self.send_error(404)
+                return
+            try:
+                camera = int(name[:-len('.mjpg')])
+            except ValueError:
+                camera = -1
+            if not 0 <= camera < cameras:
+                self.send_error(404)
+                return
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'multipart/x-mixed-replace; boundary=frame')
+            self.end_headers()
+            # Offset cameras so they don't all show the same frame
+            offset = camera * 7
+            tick = 0
+            try:
+                while True:
+                    due = started + tick / fps
+                    delay = due - time.time()
+                    if delay > 0:
+                        time.sleep(delay)
+                    else:
+                        tick = int((time.time() - started) * fps)  # a slow reader skips frames
+                    frame = frames[(tick + offset) % len(frames)].copy()
+                    stamp(frame)
+                    jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes()
+                    self.wfile.write(
+                        b'--frame\r\nContent-Type: image/jpeg\r\n'
+                        + f'Content-Length: {len(jpeg)}\r\n\r\n'.encode() + jpeg + b'\r\n'
+                    )
+                    tick += 1
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    return server
+
+def _serve(frames, cameras, fps, port, host, quality, ready):
+    server = build_server(frames, cameras, fps, port, host, quality)
+    ready.set()
+    server.serve_forever()
+
+class CameraFarm:
+    """Runs the MJPEG server in a child process so its encoding CPU isn't billed to the caller."""
+
+    def __init__(self, cameras: int, fps: float = 10.0, width: int = 640, height: int = 480,
+                 video: Optional[str] = None, port: int = 8554, host: str = '127.0.0.1', quality: int = 80):
+        self.cameras = cameras
+        self.fps = fps
+        self.width = width
+        self.height = height
+        self.video = video
+        self.port = port
+        self.host = host
+        self.quality = quality
+        self.process: Optional[mp.Process] = None
+
+    def url(self, camera: int) -> str:
+        return f"http://{self.host}:{self.port}/cam/{camera}.mjpg"
+
+    def frames(self) -> List[np.ndarray]:
+        if self.video:
+            return video_frames(self.video, self.width)
+        return synthetic_frames(int(self.fps * 10), self.width, self.height)
+
+    def start(self) -> 'CameraFarm':
+        frames = self.frames()
+        self.width = frames[0].shape[1]
+        ctx = mp.get_context('spawn')
+        ready = ctx.Event()
+        self.process = ctx.Process(
+            target=_serve, args=(frames, self.cameras, self.fps, self.port, self.host, self.quality, ready),
+            name='camera-farm', daemon=True,
+        )
+        self.process.start()
+        if not ready.wait(30):
+            raise RuntimeError("Camera farm did not start")
+        return self
+
+    def stop(self) -> None:
+        if self.process is not None:
+            self.process.terminate()
+            self.process.join(5)
+            self.process = None
+
+    def __enter__(self) -> 'CameraFarm':
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cameras', type=int, default=4)
+    parser.add_argument('--fps', type=float, default=10.0)
+    parser.add_argument('--width', type=int, default=640)
+    parser.add_argument('--height', type=int, default=480)
+    parser.add_argument('--video', help='Recorded video to loop instead of synthetic frames')
+    parser.add_argument('--port', type=int, default=8554)
+    parser.add_argument('--host', default='127.0.0.1')
+    args = parser.parse_args()
+
+    farm = CameraFarm(args.cameras, args.fps, args.width, args.height, args.video, args.port, args.host)
+    frames = farm.frames()
+    print(f"Serving {args.cameras} cameras at {args.fps} fps:")
+    for camera in range(args.cameras):
+        print(f"  {farm.url(camera)}")
+    build_server(frames, args.cameras, args.fps, args.port, args.host).serve_forever()
+
+if __name__ == '__main__':
+    main()
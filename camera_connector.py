@@ -1,9 +1,16 @@
+import asyncio
 import cv2
+import numpy as np
 import requests
 import json
+import threading
+import time
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, Dict, Any
 
+from shared.decode import DEFAULT_DECODE_OPTIONS, open_capture, read_frame
+
 class CameraConnector(ABC):
     @abstractmethod
     def connect(self) -> bool:
@@ -18,10 +25,12 @@ class CameraConnector(ABC):
         pass
 
 class RTSPCamera(CameraConnector):
-    def __init__(self, rtsp_url: str, username: str = None, password: str = None):
+    def __init__(self, rtsp_url: str, username: str = None, password: str = None,
+                 decode: Optional[Dict[str, Any]] = None):
         self.rtsp_url = rtsp_url
         self.username = username
         self.password = password
+        self.decode = {**DEFAULT_DECODE_OPTIONS, **(decode or {})}
         self.cap = None
 
     def connect(self) -> bool:
@@ -29,9 +38,9 @@ class RTSPCamera(CameraConnector):
             if self.username and self.password:
                 # Format: rtsp://username:password@ip:port/stream
                 auth_url = f"rtsp://{self.username}:{self.password}@{self.rtsp_url.split('://')[1]}"
-                self.cap = cv2.VideoCapture(auth_url)
+                self.cap = open_capture(auth_url, self.decode)
             else:
-                self.cap = cv2.VideoCapture(self.rtsp_url)
+                self.cap = open_capture(self.rtsp_url, self.decode)
             return self.cap.isOpened()
         except Exception as e:
             print(f"Error connecting to RTSP camera: {e}")
@@ -39,9 +48,7 @@ class RTSPCamera(CameraConnector):
 
     def get_frame(self) -> Optional[np.ndarray]:
         if self.cap and self.cap.isOpened():
-            ret, frame = self.cap.read()
-            if ret:
-                return frame
+            return read_frame(self.cap, self.decode)
         return None
 
     def disconnect(self) -> None:
@@ -49,18 +56,20 @@ class RTSPCamera(CameraConnector):
             self.cap.release()
 
 class ONVIFCamera(CameraConnector):
-    def __init__(self, ip: str, port: int, username: str, password: str):
+    def __init__(self, ip: str, port: int, username: str, password: str,
+                 decode: Optional[Dict[str, Any]] = None):
         self.ip = ip
         self.port = port
         self.username = username
         self.password = password
+        self.decode = {**DEFAULT_DECODE_OPTIONS, **(decode or {})}
         self.cap = None
 
     def connect(self) -> bool:
         try:
             # ONVIF cameras typically use RTSP for streaming
             rtsp_url = f"rtsp://{self.username}:{self.password}@{self.ip}:{self.port}/stream"
-            self.cap = cv2.VideoCapture(rtsp_url)
+            self.cap = open_capture(rtsp_url, self.decode)
             return self.cap.isOpened()
         except Exception as e:
             print(f"Error connecting to ONVIF camera: {e}")
@@ -68,9 +77,7 @@ class ONVIFCamera(CameraConnector):
 
     def get_frame(self) -> Optional[np.ndarray]:
         if self.cap and self.cap.isOpened():
-            ret, frame = self.cap.read()
-            if ret:
-                return frame
+            return read_frame(self.cap, self.decode)
         return None
 
     def disconnect(self) -> None:
@@ -78,9 +85,10 @@ class ONVIFCamera(CameraConnector):
             self.cap.release()
 
 class CloudCamera(CameraConnector):
-    def __init__(self, api_url: str, api_key: str):
+    def __init__(self, api_url: str, api_key: str, timeout: float = 10.0):
         self.api_url = api_url
         self.api_key = api_key
+        self.timeout = timeout
         self.session = requests.Session()
         self.session.headers.update({
             'Authorization': f'Bearer {self.api_key}',
@@ -90,7 +98,7 @@ class CloudCamera(CameraConnector):
     def connect(self) -> bool:
         try:
             # Test connection by making a simple API call
-            response = self.session.get(f"{self.api_url}/status")
+            response = self.session.get(f"{self.api_url}/status", timeout=self.timeout)
             return response.status_code == 200
         except Exception as e:
             print(f"Error connecting to cloud camera: {e}")
@@ -99,7 +107,7 @@ class CloudCamera(CameraConnector):
     def get_frame(self) -> Optional[np.ndarray]:
         try:
             # Get frame from cloud API
-            response = self.session.get(f"{self.api_url}/frame")
+            response = self.session.get(f"{self.api_url}/frame", timeout=self.timeout)
             if response.status_code == 200:
                 # Convert response to image
                 nparr = np.frombuffer(response.content, np.uint8)
@@ -111,17 +119,192 @@ class CloudCamera(CameraConnector):
     def disconnect(self) -> None:
         self.session.close()
 
+class AsyncCloudCameraPool:
+    """Fetches frames for many cloud cameras concurrently over one pooled HTTP client.
+
+    `cameras` maps camera ids to CloudCamera-style configs ({'api_url', 'api_key'}).
+    Each frame request sends the previous ETag as If-None-Match, so an unchanged
+    frame costs a 304 and no decode. JPEG decoding runs on a small thread pool,
+    off the event loop.
+
+        async with AsyncCloudCameraPool(cameras) as pool:
+            await pool.connect_all()
+            frames = await pool.fetch_all()  # {camera_id: frame or None}
+    """
+
+    def __init__(self, cameras: Dict[str, Dict[str, Any]], timeout: float = 5.0,
+                 max_connections: int = 32, decode_workers: int = 4):
+        self.cameras = cameras
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.session = None
+        self.etags: Dict[str, str] = {}
+        self.stats: Dict[str, Dict[str, float]] = {
+            camera_id: {'frames': 0, 'not_modified': 0, 'errors': 0, 'latency_ms': 0.0}
+            for camera_id in cameras
+        }
+        self._decoder = ThreadPoolExecutor(max_workers=decode_workers, thread_name_prefix='cloud-decode')
+
+    async def __aenter__(self) -> 'AsyncCloudCameraPool':
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    async def start(self) -> None:
+        import aiohttp
+
+        connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=60)
+        self.session = aiohttp.ClientSession(
+            connector=connector, timeout=aiohttp.ClientTimeout(total=self.timeout)
+        )
+
+    def _headers(self, camera_id: str) -> Dict[str, str]:
+        return {'Authorization': f"Bearer {self.cameras[camera_id]['api_key']}"}
+
+    async def connect(self, camera_id: str) -> bool:
+        try:
+            url = f"{self.cameras[camera_id]['api_url']}/status"
+            async with self.session.get(url, headers=self._headers(camera_id)) as response:
+                return response.status == 200
+        except Exception as e:
+            print(f"Error connecting to cloud camera {camera_id}: {e}")
+            return False
+
+    async def connect_all(self) -> Dict[str, bool]:
+        results = await asyncio.gather(*(self.connect(camera_id) for camera_id in self.cameras))
+        return dict(zip(self.cameras, results))
+
+    async def fetch_frame(self, camera_id: str) -> Optional[np.ndarray]:
+        """Fetch one camera's frame; None if unchanged since the last fetch or on error."""
+        stats = self.stats[camera_id]
+        headers = self._headers(camera_id)
+        if camera_id in self.etags:
+            headers['If-None-Match'] = self.etags[camera_id]
+
+        start = time.perf_counter()
+        try:
+            url = f"{self.cameras[camera_id]['api_url']}/frame"
+            async with self.session.get(url, headers=headers) as response:
+                if response.status == 304:
+                    stats['not_modified'] += 1
+                    return None
+                if response.status != 200:
+                    stats['errors'] += 1
+                    return None
+                content = await response.read()
+                if 'ETag' in response.headers:
+                    self.etags[camera_id] = response.headers['ETag']
+        except Exception as e:
+            stats['errors'] += 1
+            print(f"Error getting frame from cloud camera {camera_id}: {e}")
+            return None
+        finally:
+            stats['latency_ms'] = (time.perf_counter() - start) * 1000
+
+        loop = asyncio.get_running_loop()
+        frame = await loop.run_in_executor(
+            self._decoder, cv2.imdecode, np.frombuffer(content, np.uint8), cv2.IMREAD_COLOR
+        )
+        if frame is not None:
+            stats['frames'] += 1
+        return frame
+
+    async def fetch_all(self) -> Dict[str, Optional[np.ndarray]]:
+        """Fetch every camera's frame concurrently."""
+        frames = await asyncio.gather(*(self.fetch_frame(camera_id) for camera_id in self.cameras))
+        return dict(zip(self.cameras, frames))
+
+    async def close(self) -> None:
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+        self._decoder.shutdown(wait=False)
+
+class ThreadedCamera(CameraConnector):
+    """Wraps a connector with a background reader that keeps only the newest frame.
+
+    get_frame() never blocks on network I/O: it returns the latest frame not yet
+    handed out, or None if nothing new has arrived. Frames overwritten before
+    being read are counted in dropped_frames.
+    """
+
+    def __init__(self, camera: CameraConnector, retry_delay: float = 0.1):
+        self.camera = camera
+        self.retry_delay = retry_delay
+        self.frames_read = 0
+        self.dropped_frames = 0
+        self.last_frame_time = 0.0
+        self._lock = threading.Lock()
+        self._frame = None
+        self._fresh = False
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def connect(self) -> bool:
+        if self._thread is not None and self._thread.is_alive():
+            # The previous reader is still blocked in a read and has yet to disconnect
+            return False
+        if not self.camera.connect():
+            return False
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return True
+
+    def _run(self) -> None:
+        try:
+            self._reader()
+        finally:
+            # Disconnected only here, once the last read has returned
+            self.camera.disconnect()
+
+    def _reader(self) -> None:
+        while not self._stopped.is_set():
+            frame = self.camera.get_frame()
+            if frame is None:
+                self._stopped.wait(self.retry_delay)
+                continue
+            with self._lock:
+                if self._fresh:
+                    self.dropped_frames += 1
+                self._frame = frame
+                self._fresh = True
+                self.frames_read += 1
+                self.last_frame_time = time.time()
+
+    def get_frame(self) -> Optional[np.ndarray]:
+        with self._lock:
+            if not self._fresh:
+                return None
+            self._fresh = False
+            return self._frame
+
+    def disconnect(self) -> None:
+        self._stopped.set()
+        if self._thread is None:
+            self.camera.disconnect()
+            return
+        self._thread.join(timeout=2.0)
+        if not self._thread.is_alive():
+            self._thread = None
+
 # Factory to create appropriate camera connector
-def create_camera_connector(camera_type: str, config: Dict[str, Any]) -> CameraConnector:
+def create_camera_connector(camera_type: str, config: Dict[str, Any], threaded: bool = False) -> CameraConnector:
     if camera_type.lower() == 'rtsp':
-        return RTSPCamera(**config)
+        camera = RTSPCamera(**config)
     elif camera_type.lower() == 'onvif':
-        return ONVIFCamera(**config)
+        camera = ONVIFCamera(**config)
     elif camera_type.lower() == 'cloud':
-        return CloudCamera(**config)
+        camera = CloudCamera(**config)
     else:
         raise ValueError(f"Unsupported camera type: {camera_type}")
 
+    if threaded:
+        return ThreadedCamera(camera)
+    return camera
+
 # Example usage:
 if __name__ == "__main__":
     # Example configuration
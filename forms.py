@@ -22,7 +22,8 @@ class WorksiteForm(forms.ModelForm):
 class MilestoneConfigForm(forms.ModelForm):
     class Meta:
         model = CameraSystemConfig
-        fields = ['milestone_server', 'milestone_port']
+        fields = ['milestone_server', 'milestone_port', 'decoder_backend', 'hardware_decoding',
+                  'decode_width', 'decode_height', 'max_decode_fps']
         widgets = {
             'milestone_port': forms.NumberInput(attrs={'min': 1, 'max': 65535}),
         }
@@ -35,7 +36,9 @@ class CloudConfigForm(forms.ModelForm):
 class RTSPConfigForm(forms.ModelForm):
     class Meta:
         model = Camera
-        fields = ['name', 'ip_address', 'port', 'username', 'password']
+        fields = ['name', 'ip_address', 'port', 'username', 'password',
+                  'use_substream', 'substream_url', 'decode_width', 'decode_height',
+                  'frame_step', 'capture_buffer_size']
         widgets = {
             'password': forms.PasswordInput(),
         }
@@ -43,7 +46,9 @@ class RTSPConfigForm(forms.ModelForm):
 class ONVIFConfigForm(forms.ModelForm):
     class Meta:
         model = Camera
-        fields = ['name', 'ip_address', 'port', 'username', 'password']
+        fields = ['name', 'ip_address', 'port', 'username', 'password',
+                  'use_substream', 'substream_url', 'decode_width', 'decode_height',
+                  'frame_step', 'capture_buffer_size']
         widgets = {
             'password': forms.PasswordInput(),
         }
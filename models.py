@@ -43,12 +43,34 @@ class Camera(models.Model):
     password = models.CharField(max_length=100, blank=True, null=True)
     stream_url = models.URLField(blank=True, null=True)
     is_active = models.BooleanField(default=True)
+    # Decoder settings: detection only needs a few fps at ~640 px
+    use_substream = models.BooleanField(default=False)
+    substream_url = models.URLField(blank=True, null=True)
+    decode_width = models.IntegerField(blank=True, null=True)
+    decode_height = models.IntegerField(blank=True, null=True)
+    frame_step = models.PositiveIntegerField(default=1)
+    capture_buffer_size = models.PositiveIntegerField(default=1)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.worksite.name} - {self.name}"
 
+    def decode_options(self):
+        """Decoder options for shared.decode.open_capture, with worksite-wide defaults."""
+        config = getattr(self.worksite, 'camera_config', None)
+        return {
+            'backend': config.decoder_backend if config else 'ffmpeg',
+            'hw_accel': config.hardware_decoding if config else False,
+            'max_fps': config.max_decode_fps if config else None,
+            'substream': self.use_substream,
+            'substream_url': self.substream_url,
+            'width': self.decode_width or (config.decode_width if config else None),
+            'height': self.decode_height or (config.decode_height if config else None),
+            'frame_step': self.frame_step,
+            'buffer_size': self.capture_buffer_size,
+        }
+
 class Worker(models.Model):
     ROLE_CHOICES = [
         ('ADMIN', 'Administrator'),
@@ -70,12 +92,22 @@ class Worker(models.Model):
         return f"{self.user.get_full_name()} - {self.role}"
 
 class CameraSystemConfig(models.Model):
+    DECODER_BACKEND_CHOICES = [
+        ('ffmpeg', 'FFmpeg'),
+        ('gstreamer', 'GStreamer (scales in the decoder)')
+    ]
+
     worksite = models.OneToOneField(Worksite, on_delete=models.CASCADE, related_name='camera_config')
     milestone_server = models.CharField(max_length=255, blank=True, null=True)
     milestone_port = models.IntegerField(blank=True, null=True)
     cloud_provider = models.CharField(max_length=100, blank=True, null=True)
     cloud_region = models.CharField(max_length=100, blank=True, null=True)
     custom_config = models.JSONField(blank=True, null=True)
+    decoder_backend = models.CharField(max_length=20, choices=DECODER_BACKEND_CHOICES, default='ffmpeg')
+    hardware_decoding = models.BooleanField(default=False)
+    decode_width = models.IntegerField(blank=True, null=True)
+    decode_height = models.IntegerField(blank=True, null=True)
+    max_decode_fps = models.FloatField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -0,0 +1,162 @@
+import json
+import random
+import shutil
+import time
+from pathlib import Path
+from typing import Optional
+
+import cv2
+import numpy as np
+from ultralytics import YOLO
+from ultralytics.data.utils import check_det_dataset
+
+# Set quantization parameters
+quantization_args = {
+    'data': 'images-for-yolo/safety.v1i.yolov8/data.yaml',  # Same data config as training
+    'imgsz': 640,  # Must match the training image size
+    'calibration_images': 200,  # Training images sampled for INT8 calibration
+    'max_map_drop': 0.01,  # Largest allowed mAP50-95 drop (absolute) before we refuse to promote
+    'exclude_node_prefixes': ['/model.22/'],  # Keep the YOLOv8 detection head in FP32
+    'promoted_path': 'safety_detection_model_int8.onnx',  # Where an accepted INT8 model is published
+    'report_path': 'quantization_report.json',
+    'seed': 42,
+}
+
+IMAGE_SUFFIXES = {'.jpg', '.jpeg', '.png', '.bmp'}
+
+def sample_training_images(data: str, count: int, seed: int) -> list:
+    """Pick a reproducible random sample of training images from data.yaml."""
+    dataset = check_det_dataset(data)
+    sources = dataset['train'] if isinstance(dataset['train'], list) else [dataset['train']]
+    root = Path(dataset['path'])
+
+    paths = []
+    for source in map(Path, sources):
+        if source.is_dir():
+            paths.extend(p for p in source.rglob('*') if p.suffix.lower() in IMAGE_SUFFIXES)
+        elif source.suffix == '.txt':
+            # Image lists hold paths relative to the dataset root (or absolute ones)
+            paths.extend(root / line.strip() for line in source.read_text().splitlines() if line.strip())
+
+    paths.sort()
+    random.Random(seed).shuffle(paths)
+    return paths[:count]
+
+def preprocess(path: Path, imgsz: int) -> Optional[np.ndarray]:
+    """Letterbox an image the same way the YOLO predictor does and return an NCHW float tensor.
+
+    Returns None if the image can't be read.
+    """
+    img = cv2.imread(str(path))
+    if img is None:
+        return None
+    h, w = img.shape[:2]
+    scale = imgsz / max(h, w)
+    resized = cv2.resize(img, (round(w * scale), round(h * scale)), interpolation=cv2.INTER_LINEAR)
+    canvas = np.full((imgsz, imgsz, 3), 114, dtype=np.uint8)
+    top = (imgsz - resized.shape[0]) // 2
+    left = (imgsz - resized.shape[1]) // 2
+    canvas[top:top + resized.shape[0], left:left + resized.shape[1]] = resized
+    tensor = canvas[:, :, ::-1].transpose(2, 0, 1).astype(np.float32) / 255.0
+    return tensor[np.newaxis]
+
+class CalibrationReader:
+    """Feeds sampled training images to ONNX Runtime's static quantizer."""
+
+    def __init__(self, paths: list, input_name: str, imgsz: int):
+        self.paths = iter(paths)
+        self.input_name = input_name
+        self.imgsz = imgsz
+
+    def get_next(self):
+        for path in self.paths:
+            tensor = preprocess(path, self.imgsz)
+            if tensor is not None:
+                return {self.input_name: tensor}
+            print(f"Skipping unreadable calibration image '{path}'")
+        return None
+
+def quantize_int8(fp32_path: str, int8_path: str, calibration_paths: list, args: dict) -> None:
+    import onnx
+    import onnxruntime as ort
+    from onnxruntime.quantization import QuantFormat, QuantType, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    prepared_path = str(Path(fp32_path).with_suffix('.prep.onnx'))
+    quant_pre_process(fp32_path, prepared_path)
+
+    input_name = ort.InferenceSession(prepared_path, providers=['CPUExecutionProvider']).get_inputs()[0].name
+    excluded = [
+        node.name for node in onnx.load(prepared_path).graph.node
+        if any(node.name.startswith(prefix) for prefix in args['exclude_node_prefixes'])
+    ]
+
+    quantize_static(
+        prepared_path,
+        int8_path,
+        CalibrationReader(calibration_paths, input_name, args['imgsz']),
+        quant_format=QuantFormat.QDQ,
+        per_channel=True,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        nodes_to_exclude=excluded,
+    )
+    Path(prepared_path).unlink(missing_ok=True)
+
+def evaluate(model_path: str, args: dict) -> dict:
+    """Validate a model on the data.yaml val split and time it per image."""
+    metrics = YOLO(model_path, task='detect').val(
+        data=args['data'], imgsz=args['imgsz'], batch=1, device='cpu', plots=False, verbose=False
+    )
+    return {
+        'map50': float(metrics.box.map50),
+        'map50_95': float(metrics.box.map),
+        'latency_ms': {stage: round(ms, 2) for stage, ms in metrics.speed.items()},
+        'size_mb': round(Path(model_path).stat().st_size / 1e6, 2),
+    }
+
+def run_quantization(weights_path: str = 'safety_detection_model.pt', **overrides) -> dict:
+    """Export FP32 ONNX, quantize to INT8, compare both and promote INT8 if accurate enough."""
+    args = {**quantization_args, **overrides}
+    started = time.time()
+
+    fp32_path = YOLO(weights_path).export(format='onnx', imgsz=args['imgsz'], dynamic=True, simplify=True)
+    int8_path = str(Path(fp32_path).with_name(f"{Path(fp32_path).stem}_int8.onnx"))
+
+    calibration_paths = sample_training_images(args['data'], args['calibration_images'], args['seed'])
+    print(f"Calibrating INT8 model on {len(calibration_paths)} training images")
+    quantize_int8(fp32_path, int8_path, calibration_paths, args)
+
+    fp32 = evaluate(fp32_path, args)
+    int8 = evaluate(int8_path, args)
+    map_drop = fp32['map50_95'] - int8['map50_95']
+    promoted = map_drop <= args['max_map_drop']
+    if promoted:
+        shutil.copyfile(int8_path, args['promoted_path'])
+
+    report = {
+        'weights': weights_path,
+        'data': args['data'],
+        'calibration_images': len(calibration_paths),
+        'fp32': {'path': fp32_path, **fp32},
+        'int8': {'path': int8_path, **int8},
+        'map50_95_drop': round(map_drop, 4),
+        'max_map_drop': args['max_map_drop'],
+        'promoted': promoted,
+        'promoted_path': args['promoted_path'] if promoted else None,
+        'duration_s': round(time.time() - started, 1),
+    }
+    with open(args['report_path'], 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"FP32 mAP50-95 {fp32['map50_95']:.4f}, {fp32['latency_ms'].get('inference', 0):.1f} ms/img")
+    print(f"INT8 mAP50-95 {int8['map50_95']:.4f}, {int8['latency_ms'].get('inference', 0):.1f} ms/img")
+    if promoted:
+        print(f"INT8 model promoted to '{args['promoted_path']}' (mAP drop {map_drop:.4f})")
+    else:
+        print(f"INT8 model NOT promoted: mAP drop {map_drop:.4f} exceeds {args['max_map_drop']}")
+    print(f"Report written to '{args['report_path']}'")
+    return report
+
+if __name__ == '__main__':
+    run_quantization()
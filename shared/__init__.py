@@ -0,0 +1,5 @@
+"""Code used by both the detection service (ai-detection/src) and the backend.
+
+Both put the repository root on sys.path at startup and import from here,
+e.g. `from shared.metrics import REGISTRY`.
+"""
@@ -0,0 +1,131 @@
+import os
+import re
+import threading
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, Optional
+
+import cv2
+import numpy as np
+
+# Decoder settings for RTSP/ONVIF streams. We only need ~2 fps at ~640 px for
+# detection, so by default keep the decoder's buffer minimal and let callers
+# opt into substreams, frame skipping and decoder-side scaling.
+DEFAULT_DECODE_OPTIONS = {
+    'backend': 'ffmpeg',  # 'ffmpeg' or 'gstreamer'
+    'substream': False,  # switch to the camera's low-resolution substream
+    'substream_url': None,  # explicit substream URL, if the camera's isn't guessable
+    'width': None,  # target frame size; scaled in the decoder with gstreamer
+    'height': None,
+    'frame_step': 1,  # return every Nth frame, grabbing (not converting) the rest
+    'max_fps': None,  # gstreamer only: drop frames above this rate before decoding output
+    'buffer_size': 1,  # frames queued inside the capture
+    'hw_accel': False,  # use hardware decoding when available
+}
+
+# Main-stream -> substream URL rewrites for common camera vendors
+SUBSTREAM_PATTERNS = [
+    (re.compile(r'(/Streaming/Channels/\d+)01\b'), r'\g<1>02'),  # Hikvision
+    (re.compile(r'subtype=0\b'), 'subtype=1'),  # Dahua / Amcrest
+    (re.compile(r'/stream1\b'), '/stream2'),  # TP-Link, Reolink, generic
+    (re.compile(r'/h264Preview_(\d+)_main\b'), r'/h264Preview_\1_sub'),  # Reolink
+]
+
+FFMPEG_OPTIONS_ENV = 'OPENCV_FFMPEG_CAPTURE_OPTIONS'
+
+_ffmpeg_env = threading.Condition()
+_ffmpeg_opening = 0  # opens in flight with the current FFMPEG_OPTIONS_ENV value
+
+@contextmanager
+def _ffmpeg_capture_options(value: str):
+    """Set OpenCV's FFmpeg options for the opens inside this block.
+
+    OpenCV reads them from the environment when a stream is opened, so the
+    variable is process-wide. Opens that want the value already set run in
+    parallel; one that wants a different value waits for those to finish.
+    """
+    global _ffmpeg_opening
+    with _ffmpeg_env:
+        _ffmpeg_env.wait_for(lambda: _ffmpeg_opening == 0 or os.environ.get(FFMPEG_OPTIONS_ENV) == value)
+        os.environ[FFMPEG_OPTIONS_ENV] = value
+        _ffmpeg_opening += 1
+    try:
+        yield
+    finally:
+        with _ffmpeg_env:
+            _ffmpeg_opening -= 1
+            _ffmpeg_env.notify_all()
+
+def substream_url(url: str, explicit: Optional[str] = None) -> str:
+    """Return the low-resolution substream URL for a main-stream URL, if known."""
+    if explicit:
+        return explicit
+    for pattern, replacement in SUBSTREAM_PATTERNS:
+        if pattern.search(url):
+            return pattern.sub(replacement, url)
+    return url
+
+def gstreamer_pipeline(url: str, options: Dict[str, Any]) -> str:
+    """Build a GStreamer pipeline that scales (and rate-limits) in the decoder.
+
+    decodebin autoplugs hardware decoders (VA-API, NVDEC) when their plugins
+    are installed, so hw_accel needs no extra elements here.
+    """
+    if url.startswith('rtsp://'):
+        stages = [f'rtspsrc location="{url}" latency=0 protocols=tcp', 'decodebin']
+    else:
+        stages = [f'uridecodebin uri="{url}"']
+    if options['max_fps']:
+        stages.append(f"videorate drop-only=true max-rate={int(options['max_fps'])}")
+    stages += ['videoconvert', 'videoscale']
+    caps = 'video/x-raw,format=BGR'
+    if options['width'] and options['height']:
+        caps += f",width={int(options['width'])},height={int(options['height'])}"
+    stages.append(caps)
+    stages.append(f"appsink drop=true max-buffers={max(1, int(options['buffer_size']))} sync=false")
+    return ' ! '.join(stages)
+
+def open_capture(url: str, decode: Optional[Dict[str, Any]] = None) -> cv2.VideoCapture:
+    """Open a video stream with the given decoder options."""
+    options = {**DEFAULT_DECODE_OPTIONS, **(decode or {})}
+    if options['substream']:
+        url = substream_url(url, options['substream_url'])
+
+    if options['backend'] == 'gstreamer':
+        cap = cv2.VideoCapture(gstreamer_pipeline(url, options), cv2.CAP_GSTREAMER)
+    else:
+        params = []
+        if options['hw_accel']:
+            params = [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY]
+        with _ffmpeg_capture_options('rtsp_transport;tcp'):
+            cap = cv2.VideoCapture(url, cv2.CAP_FFMPEG, params)
+
+    if cap.isOpened() and options['buffer_size']:
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, options['buffer_size'])
+    return cap
+
+def read_frame(cap: cv2.VideoCapture, decode: Dict[str, Any], timer=None) -> Optional[np.ndarray]:
+    """Read the next wanted frame, skipping frame_step - 1 frames and resizing if needed.
+
+    `timer` is an optional histogram (see shared.metrics) labelled by stage;
+    packet reads are timed as 'capture' and decoding plus resizing as 'decode'.
+    """
+    def stage(name):
+        return timer.time(name) if timer is not None else nullcontext()
+
+    for _ in range(max(1, int(decode['frame_step'])) - 1):
+        if not cap.grab():
+            return None
+    # grab() pulls and demuxes the packet, retrieve() decodes it
+    with stage('capture'):
+        if not cap.grab():
+            return None
+    with stage('decode'):
+        ret, frame = cap.retrieve()
+        if not ret:
+            return None
+
+        width, height = decode['width'], decode['height']
+        if width and height and decode['backend'] != 'gstreamer' and frame.shape[1] != width:
+            # FFmpeg decodes at full size; downscale here instead
+            frame = cv2.resize(frame, (int(width), int(height)), interpolation=cv2.INTER_AREA)
+    return frame
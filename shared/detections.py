@@ -0,0 +1,21 @@
+from typing import List, Tuple
+
+def extract_detections(result, names) -> Tuple[List[dict], List[int]]:
+    """Convert one Ultralytics result into detection dicts and class ids.
+
+    Boxes, confidences and classes are moved to NumPy once per result instead
+    of once per box.
+    """
+    boxes = result.boxes
+    if boxes is None or len(boxes) == 0:
+        return [], []
+
+    xyxy = boxes.xyxy.cpu().numpy().tolist()
+    conf = boxes.conf.cpu().numpy().tolist()
+    cls = boxes.cls.cpu().numpy().astype(int).tolist()
+
+    detections = [
+        {'class': names[c], 'confidence': p, 'bbox': bbox}
+        for bbox, p, c in zip(xyxy, conf, cls)
+    ]
+    return detections, cls
@@ -0,0 +1,179 @@
+import time
+import bisect
+import itertools
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+# Seconds; spans a fast JPEG decode up to a slow CPU forward pass or HTTP POST
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(names: Sequence[str], values: Tuple, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, description: str, labels: Sequence[str] = (), collect: Optional[Callable] = None):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        # collect() returns {label values tuple: value} (or a bare number without labels)
+        # and is only called at scrape time, so the hot path pays nothing
+        self.collect = collect
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def _samples(self):
+        if self.collect is not None:
+            values = self.collect()
+            return values.items() if isinstance(values, dict) else [((), values)]
+        with self._lock:
+            return list(self._values.items())
+
+    def render(self):
+        yield f"# HELP {self.name} {self.description}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for labels, value in self._samples():
+            yield f"{self.name}{_format_labels(self.labels, labels)} {float(value)}"
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, *labels, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def set(self, value: float, *labels) -> None:
+        self._values[labels] = value
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram; `time()` only measures every Nth call per label set."""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, description: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, registry: 'MetricsRegistry' = None):
+        super().__init__(name, description, labels)
+        self.buckets = tuple(buckets)
+        self.registry = registry
+        self._calls: Dict[Tuple[str, ...], itertools.count] = {}  # per label set, so stages sample independently
+
+    def observe(self, value: float, *labels) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(labels)
+            if counts is None:
+                # one slot per bucket plus +Inf, then the running sum
+                counts = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[index] += 1
+            counts[-1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        sample_every = self.registry.sample_every if self.registry else 1
+        calls = self._calls.get(labels)
+        if calls is None:
+            calls = self._calls.setdefault(labels, itertools.count())
+        if next(calls) % sample_every:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def render(self):
+        yield f"# HELP {self.name} {self.description}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            samples = [(labels, list(counts)) for labels, counts in self._values.items()]
+        for labels, counts in samples:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float('inf') else f'le="{bound!r}"'
+                yield f"{self.name}_bucket{_format_labels(self.labels, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labels, labels)} {counts[-1]}"
+            yield f"{self.name}_count{_format_labels(self.labels, labels)} {cumulative}"
+
+class MetricsRegistry:
+    """Holds a process's metrics and renders them in Prometheus text format.
+
+    Registering a name twice returns the existing metric (a callback metric
+    gets the new callback), so services can be re-created in one process.
+    Histogram timers sample one call in `sample_every` per label set to keep
+    the hot loop cheap; their counts are of sampled observations.
+    """
+
+    def __init__(self, sample_every: int = 1):
+        self.sample_every = max(1, int(sample_every))
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name: str, *args, **kwargs) -> _Metric:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif kwargs.get('collect') is not None:
+                metric.collect = kwargs['collect']
+            return metric
+
+    def counter(self, name: str, description: str, labels: Sequence[str] = (), collect: Optional[Callable] = None) -> Counter:
+        return self._register(Counter, name, description, labels, collect=collect)
+
+    def gauge(self, name: str, description: str, labels: Sequence[str] = (), collect: Optional[Callable] = None) -> Gauge:
+        return self._register(Gauge, name, description, labels, collect=collect)
+
+    def histogram(self, name: str, description: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, description, labels, buckets=buckets, registry=self)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                lines.append(f"# {metric.name} unavailable: {_escape(e)}")
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = MetricsRegistry()
+
+def serve(registry: MetricsRegistry = REGISTRY, host: str = '127.0.0.1', port: int = 9108) -> ThreadingHTTPServer:
+    """Serve GET /metrics on a daemon thread."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # scrapes would otherwise log a line each
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    return server
@@ -0,0 +1,120 @@
+import os
+import logging
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional, Tuple
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from ultralytics import YOLO
+
+# torch and ultralytics take seconds to import, so they are only imported
+# where a model is actually exported or loaded
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_BACKENDS = ('pytorch', 'onnx', 'openvino')
+
+def exported_path(weights_path: str, backend: str) -> Path:
+    """Where Ultralytics writes the exported model for a backend, next to the weights."""
+    weights = Path(weights_path)
+    if backend == 'onnx':
+        return weights.with_suffix('.onnx')
+    if backend == 'openvino':
+        return weights.parent / f"{weights.stem}_openvino_model"
+    return weights
+
+def exported_backend(path: str) -> Optional[str]:
+    """The backend an already-exported model runs on, from its file name."""
+    path = Path(path)
+    if path.suffix == '.onnx':
+        return 'onnx'
+    if path.suffix == '.xml' or path.name.endswith('_openvino_model'):
+        return 'openvino'
+    return None
+
+def export_model(weights_path: str, backend: str, imgsz: int = 640) -> Tuple[str, str]:
+    """Export `.pt` weights for a backend once and reuse the cached export afterwards.
+
+    Returns the model path and the backend it runs on. The export is redone
+    when the weights are newer than the cached copy. Models that are already
+    exported (e.g. a quantized .onnx) run on their own format's backend,
+    whatever was configured.
+    """
+    if backend not in SUPPORTED_BACKENDS:
+        raise ValueError(f"Unsupported inference backend: {backend}")
+    if Path(weights_path).suffix != '.pt':
+        return str(weights_path), exported_backend(weights_path) or backend
+    if backend == 'pytorch':
+        return str(weights_path), backend
+
+    target = exported_path(weights_path, backend)
+    weights = Path(weights_path)
+    if target.exists() and (not weights.exists() or target.stat().st_mtime >= weights.stat().st_mtime):
+        return str(target), backend
+
+    from ultralytics import YOLO
+
+    logger.info(f"Exporting {weights_path} to {backend} (one-time)")
+    # dynamic=True keeps batched inference working on the exported graph
+    exported = YOLO(str(weights_path)).export(format=backend, imgsz=imgsz, dynamic=True)
+    return str(exported), backend
+
+def _apply_thread_count(model: 'YOLO', path: str, backend: str, threads: int) -> None:
+    """Rebuild the exported-graph session with an explicit CPU thread count."""
+    runtime = getattr(model.predictor, 'model', None) if model.predictor else None
+    if backend == 'onnx' and hasattr(runtime, 'session'):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        runtime.session = ort.InferenceSession(
+            path, sess_options=options,
+            providers=runtime.session.get_providers()
+        )
+    elif backend == 'openvino' and hasattr(runtime, 'ov_compiled_model'):
+        import openvino as ov
+
+        core = ov.Core()
+        xml = next(Path(path).glob('*.xml'))
+        runtime.ov_compiled_model = core.compile_model(
+            core.read_model(xml), 'CPU',
+            config={'INFERENCE_NUM_THREADS': threads, 'PERFORMANCE_HINT': 'LATENCY'}
+        )
+    else:
+        logger.warning(f"Could not set thread count for {backend} backend")
+
+def load_model(
+    weights_path: str,
+    backend: str = 'pytorch',
+    threads: Optional[int] = None,
+    imgsz: int = 640,
+    warmup_runs: int = 1,
+) -> 'YOLO':
+    """Load a detection model on the requested backend and warm it up.
+
+    The returned object is always an Ultralytics YOLO, so callers keep the same
+    `model(frames)` / `model.names` interface whatever runtime is underneath.
+    """
+    import torch
+    from ultralytics import YOLO
+
+    if threads:
+        torch.set_num_threads(threads)
+        os.environ.setdefault('OMP_NUM_THREADS', str(threads))
+
+    path, backend = export_model(weights_path, backend, imgsz)
+    model = YOLO(path, task='detect')
+
+    # The first call pays for lazy predictor/runtime setup; do it before serving
+    dummy = np.zeros((imgsz, imgsz, 3), dtype=np.uint8)
+    if threads and backend != 'pytorch':
+        # The runtime session only exists after the first call
+        model(dummy, verbose=False)
+        _apply_thread_count(model, path, backend, threads)
+    for _ in range(warmup_runs):
+        model(dummy, verbose=False)
+
+    logger.info(f"Loaded {path} on {backend} backend (threads={threads or 'default'})")
+    return model
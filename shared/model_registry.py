@@ -0,0 +1,289 @@
+import itertools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
+
+from shared.model_backends import exported_path, load_model
+
+if TYPE_CHECKING:
+    from ultralytics import YOLO
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = 'default'
+
+def model_bytes(model: 'YOLO', path: str, backend: str = 'pytorch') -> int:
+    """Approximate memory held by a loaded model.
+
+    PyTorch models are measured by their parameter and buffer tensors; exported
+    runtimes (ONNX, OpenVINO) by the size of the files they were loaded from.
+    """
+    import torch
+
+    module = getattr(model, 'model', None)
+    if isinstance(module, torch.nn.Module):
+        tensors = itertools.chain(module.parameters(), module.buffers())
+        return sum(t.numel() * t.element_size() for t in tensors)
+
+    target = exported_path(path, backend) if Path(path).suffix == '.pt' else Path(path)
+    if target.is_dir():
+        return sum(f.stat().st_size for f in target.rglob('*') if f.is_file())
+    return target.stat().st_size if target.exists() else 0
+
+class ModelVersion:
+    """One version of a named model and the instances loaded from it."""
+
+    def __init__(self, name: str, version: str, path: str, options: dict):
+        self.name = name
+        self.version = version
+        self.path = path
+        self.options = options
+        self.idle: List['YOLO'] = []
+        self.instances = 0  # loaded, idle or leased
+        self.loading = 0
+        self.size_bytes = 0  # per instance
+        self.names: Optional[dict] = None
+        self.last_used = 0.0
+        self.retired = False
+
+    @property
+    def in_use(self) -> int:
+        return self.instances - len(self.idle)
+
+    @property
+    def memory_bytes(self) -> int:
+        return self.size_bytes * self.instances
+
+class ModelRegistry:
+    """Named, versioned detection models loaded on first use and shared by their callers.
+
+    Callers lease a model with `use(name)` for the duration of a forward pass.
+    Each version keeps at most `max_instances` loaded instances (one by default,
+    shared by every camera that uses the model); callers beyond that wait for a
+    lease to come back, since Ultralytics predictors are not thread-safe.
+
+    When the loaded models exceed `memory_budget_mb`, idle instances of the
+    least recently used models are unloaded; they are reloaded on their next
+    use. `swap()` loads a new version next to the current one and switches
+    over atomically: leases already handed out finish on the old version,
+    which is unloaded once the last of them is returned.
+    """
+
+    def __init__(self, memory_budget_mb: Optional[float] = None, max_instances: int = 1,
+                 default: str = DEFAULT_MODEL, loader: Callable[..., 'YOLO'] = load_model):
+        self.memory_budget = memory_budget_mb * 1024 * 1024 if memory_budget_mb else None
+        self.max_instances = max(1, max_instances)
+        self.default = default
+        self.loader = loader
+        self.loads = 0
+        self.evictions = 0
+        self._versions: Dict[Tuple[str, str], ModelVersion] = {}
+        self._current: Dict[str, str] = {}
+        self._cond = threading.Condition()
+
+    def register(self, name: str, path: str, version: Optional[str] = None, **options) -> str:
+        """Declare a model version without loading it; the first version of a name becomes current."""
+        version = str(version or Path(path).stem)
+        with self._cond:
+            if (name, version) not in self._versions:
+                self._versions[(name, version)] = ModelVersion(name, version, str(path), options)
+            self._current.setdefault(name, version)
+        return version
+
+    def configure(self, models: Dict[str, dict], defaults: Optional[dict] = None) -> None:
+        """Register models from config: {name: path} or {name: {'path', 'version', backend options}}."""
+        for name, spec in models.items():
+            spec = {'path': spec} if isinstance(spec, str) else dict(spec)
+            path = spec.pop('path')
+            version = spec.pop('version', None)
+            self.register(name, path, version, **{**(defaults or {}), **spec})
+
+    def _resolve(self, name: Optional[str], version: Optional[str] = None) -> ModelVersion:
+        name = name or self.default
+        if name not in self._current:
+            raise KeyError(f"Unknown model: {name}")
+        return self._versions[(name, version or self._current[name])]
+
+    def acquire(self, name: Optional[str] = None, version: Optional[str] = None,
+                load_options: Optional[dict] = None) -> Tuple[ModelVersion, 'YOLO']:
+        """Lease an instance of a model, loading it if none is idle; pair with release().
+
+        `load_options` override the registered load options if this call loads an instance.
+        """
+        with self._cond:
+            while True:
+                # Looked up again after every wait so a swap redirects waiting callers
+                entry = self._resolve(name, version)
+                entry.last_used = time.monotonic()
+                if entry.idle:
+                    return entry, entry.idle.pop()
+                if entry.instances + entry.loading < self.max_instances:
+                    entry.loading += 1
+                    break
+                self._cond.wait()
+
+        # Loading takes seconds; other models keep serving meanwhile
+        started = time.time()
+        try:
+            model = self.loader(entry.path, **{**entry.options, **(load_options or {})})
+            size = model_bytes(model, entry.path, entry.options.get('backend', 'pytorch'))
+        except Exception:
+            with self._cond:
+                entry.loading -= 1
+                self._cond.notify_all()
+            raise
+
+        with self._cond:
+            entry.loading -= 1
+            entry.instances += 1
+            entry.size_bytes = max(entry.size_bytes, size)
+            entry.names = model.names
+            self.loads += 1
+            self._evict(keep=entry)
+            self._cond.notify_all()
+            over_budget = self.memory_budget is not None and self.memory_bytes() > self.memory_budget
+        logger.info(
+            f"Loaded model {entry.name}:{entry.version} from {entry.path} "
+            f"({size / 1e6:.1f} MB, {time.time() - started:.1f}s)"
+        )
+        if over_budget:
+            logger.warning(
+                f"Models in use need {self.memory_bytes() / 1e6:.1f} MB, "
+                f"over the {self.memory_budget / 1e6:.1f} MB budget"
+            )
+        return entry, model
+
+    def release(self, entry: ModelVersion, model: 'YOLO') -> None:
+        """Return a leased instance; instances of replaced versions are dropped here."""
+        with self._cond:
+            entry.last_used = time.monotonic()
+            if entry.retired:
+                entry.instances -= 1
+                key = (entry.name, entry.version)
+                # The key may already belong to a newer entry swapped in under the same version
+                if entry.instances == 0 and self._versions.get(key) is entry:
+                    del self._versions[key]
+                    logger.info(f"Unloaded model {entry.name}:{entry.version} (replaced)")
+            else:
+                entry.idle.append(model)
+                self._evict(keep=entry)
+            self._cond.notify_all()
+
+    @contextmanager
+    def use(self, name: Optional[str] = None, version: Optional[str] = None):
+        """Lease a model for one forward pass: `with registry.use('ppe') as model: model(frame)`."""
+        entry, model = self.acquire(name, version)
+        try:
+            yield model
+        finally:
+            self.release(entry, model)
+
+    def preload(self, name: Optional[str] = None, **load_options) -> None:
+        """Load a model now instead of on its first use."""
+        entry, model = self.acquire(name, load_options=load_options)
+        self.release(entry, model)
+
+    def status(self, name: Optional[str] = None) -> str:
+        """'ready', 'loading' or 'unloaded' for a model's current version."""
+        with self._cond:
+            entry = self._resolve(name)
+            if entry.instances:
+                return 'ready'
+            return 'loading' if entry.loading else 'unloaded'
+
+    def names(self, name: Optional[str] = None) -> dict:
+        """Class names of a model's current version, loading it only if it never was."""
+        with self._cond:
+            names = self._resolve(name).names
+        if names is None:
+            with self.use(name) as model:
+                names = model.names
+        return names
+
+    def swap(self, name: str, path: str, version: Optional[str] = None, **options) -> str:
+        """Load a new version of a model and make it current without interrupting inference.
+
+        The new version is loaded before the switch, so frames never wait on it;
+        if it fails to load the current version stays in place. Swapping back to
+        a version that is still registered (e.g. one whose last frames are still
+        running) reuses it, provided it comes from the same path.
+        """
+        with self._cond:
+            previous = self._current.get(name)
+        version = str(version or Path(path).stem)
+        if previous is None:
+            self.register(name, path, version, **options)
+            self.preload(name)
+            return version
+        if version == previous:
+            raise ValueError(f"Model {name} is already at version {version}")
+
+        with self._cond:
+            entry = self._versions.get((name, version))
+            if entry is None:
+                entry = self._versions[(name, version)] = ModelVersion(name, version, str(path), options)
+                created = True
+            elif entry.path != str(path):
+                raise ValueError(f"Model {name} version {version} is already registered from {entry.path}")
+            else:
+                entry.retired = False
+                created = False
+        try:
+            with self.use(name, version):
+                pass
+        except Exception:
+            with self._cond:
+                if created and self._versions.get((name, version)) is entry:
+                    del self._versions[(name, version)]
+            raise
+
+        with self._cond:
+            self._current[name] = version
+            old = self._versions.get((name, previous))
+            if old is not None:
+                old.retired = True
+                old.instances -= len(old.idle)
+                old.idle.clear()
+                if old.instances == 0:
+                    self._versions.pop((name, previous), None)
+            self._cond.notify_all()
+        logger.info(f"Model {name} switched from {previous} to {version}")
+        return version
+
+    def memory_bytes(self) -> int:
+        return sum(entry.memory_bytes for entry in self._versions.values())
+
+    def _evict(self, keep: Optional[ModelVersion] = None) -> None:
+        """Unload idle instances, least recently used first, until back under budget."""
+        if self.memory_budget is None:
+            return
+        candidates = sorted(
+            (entry for entry in self._versions.values() if entry.idle and entry is not keep),
+            key=lambda entry: entry.last_used,
+        )
+        for entry in candidates:
+            if self.memory_bytes() <= self.memory_budget:
+                break
+            entry.instances -= len(entry.idle)
+            entry.idle.clear()
+            self.evictions += 1
+            logger.info(f"Evicted model {entry.name}:{entry.version} to stay within the memory budget")
+
+    def stats(self) -> List[dict]:
+        """Per-version state for logs and metrics."""
+        with self._cond:
+            return [
+                {
+                    'name': entry.name,
+                    'version': entry.version,
+                    'path': entry.path,
+                    'current': self._current.get(entry.name) == entry.version,
+                    'instances': entry.instances,
+                    'in_use': entry.in_use,
+                    'memory_bytes': entry.memory_bytes,
+                }
+                for entry in self._versions.values()
+            ]
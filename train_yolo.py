@@ -1,6 +1,8 @@
 from ultralytics import YOLO
 import os
 
+from quantize_yolo import run_quantization
+
 # Initialize YOLO model
 model = YOLO('yolov8n.pt')  # Load a pretrained YOLOv8n model
 
@@ -21,7 +23,9 @@ training_args = {
     'verbose': True,  # Print verbose output
     'seed': 42,  # Random seed for reproducibility
     'deterministic': True,  # Deterministic training
+    'quantize': True,  # INT8-quantize the trained model afterwards (not a YOLO training argument)
 }
+quantize = training_args.pop('quantize')
 
 # Start training
 results = model.train(**training_args)
@@ -29,4 +33,9 @@ results = model.train(**training_args)
 # Save the trained model
 model.save('safety_detection_model.pt')
 
-print("Training completed! Model saved as 'safety_detection_model.pt'") 
\ No newline at end of file
+print("Training completed! Model saved as 'safety_detection_model.pt'") 
+
+# Post-training INT8 quantization for the CPU inference nodes. The quantized
+# model is only promoted if its mAP stays within the configured tolerance.
+if quantize:
+    run_quantization('safety_detection_model.pt', data=training_args['data'], imgsz=training_args['imgsz'])